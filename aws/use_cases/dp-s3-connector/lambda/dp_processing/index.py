@@ -3,9 +3,15 @@ import os
 import boto3
 import uuid
 import mimetypes
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Tuple
 import logging
 
+try:
+    import fitz  # PyMuPDF (optional, enables page-range sharding of large PDFs)
+except ImportError:
+    fitz = None
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
@@ -13,28 +19,24 @@ s3_client = boto3.client('s3')
 sagemaker_client = boto3.client('sagemaker-runtime')
 
 
-def process_file(bucket: str, file_key: str) -> Dict[str, Any]:
-    """Process a single file using SageMaker endpoint."""
-    # Download file to /tmp
-    local_path = f"/tmp/{os.path.basename(file_key)}"
-    s3_client.download_file(bucket, file_key, local_path)
-    
-    # Determine content type based on file extension
-    content_type = mimetypes.guess_type(local_path)[0] or "application/octet-stream"
-    
-    # Create multipart form data manually
+# PDFs with more pages than this are split into page ranges that are parsed concurrently
+SHARD_PAGE_THRESHOLD = int(os.environ.get('SHARD_PAGE_THRESHOLD', '30'))
+PAGES_PER_SHARD = int(os.environ.get('PAGES_PER_SHARD', '20'))
+MAX_SHARD_WORKERS = int(os.environ.get('MAX_SHARD_WORKERS', '4'))
+
+
+def build_multipart_body(file_name: str, content: bytes, content_type: str) -> Tuple[bytes, str]:
+    """Create the multipart form data of a Document Parse request. Returns (body, boundary)."""
     boundary = str(uuid.uuid4())
     body = bytearray()
     
     # Add document field
     body.extend(f'--{boundary}\r\n'.encode('utf-8'))
-    body.extend(f'Content-Disposition: form-data; name="document"; filename="{os.path.basename(file_key)}"\r\n'.encode('utf-8'))
+    body.extend(f'Content-Disposition: form-data; name="document"; filename="{file_name}"\r\n'.encode('utf-8'))
     body.extend(f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8'))
     
     # Add file content
-    with open(local_path, 'rb') as f:
-        body.extend(f.read())
-    
+    body.extend(content)
     body.extend(b'\r\n')
     
     # Add other fields
@@ -55,17 +57,89 @@ def process_file(bucket: str, file_key: str) -> Dict[str, Any]:
     
     # Add final boundary
     body.extend(f'--{boundary}--\r\n'.encode('utf-8'))
+    return bytes(body), boundary
+
+
+def invoke_document_parse(file_name: str, content: bytes, content_type: str) -> Dict[str, Any]:
+    """Call the SageMaker endpoint with one document."""
+    body, boundary = build_multipart_body(file_name, content, content_type)
+    response = sagemaker_client.invoke_endpoint(
+        EndpointName=os.environ['SAGEMAKER_ENDPOINT'],
+        ContentType=f'multipart/form-data; boundary={boundary}',
+        Body=body
+    )
+    return json.loads(response['Body'].read().decode())
+
+
+def split_pdf_pages(content: bytes) -> List[Tuple[int, bytes]]:
+    """Split a PDF into page ranges. Returns [(page offset, shard bytes)] in page order."""
+    shards = []
+    with fitz.open(stream=content, filetype="pdf") as pdf:
+        for start_page in range(0, pdf.page_count, PAGES_PER_SHARD):
+            end_page = min(start_page + PAGES_PER_SHARD, pdf.page_count) - 1
+            with fitz.open() as shard:
+                shard.insert_pdf(pdf, from_page=start_page, to_page=end_page)
+                shards.append((start_page, shard.tobytes(garbage=3, deflate=True)))
+    return shards
+
+
+def merge_results(shard_results: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Merge shard results: page offsets applied, element ids renumbered in page order, content concatenated."""
+    shard_results = sorted(shard_results, key=lambda item: item[0])
+    merged = {key: value for key, value in shard_results[0][1].items() if key not in ('content', 'elements', 'usage')}
+    content = {}
+    elements = []
+    total_pages = 0
+    
+    for page_offset, result in shard_results:
+        for output_format, value in (result.get('content') or {}).items():
+            if value:
+                content[output_format] = f"{content[output_format]}\n{value}" if content.get(output_format) else value
+        for element in result.get('elements', []):
+            elements.append({**element, 'id': len(elements), 'page': element.get('page', 1) + page_offset})
+        total_pages += (result.get('usage') or {}).get('pages', 0)
+    
+    merged['content'] = content
+    merged['elements'] = elements
+    merged['usage'] = {'pages': total_pages}
+    return merged
+
+
+def parse_document(file_name: str, content: bytes, content_type: str) -> Dict[str, Any]:
+    """Parse a document, sharding large PDFs by page range when PyMuPDF is available."""
+    if fitz is None or content_type != 'application/pdf':
+        return invoke_document_parse(file_name, content, content_type)
+    
+    with fitz.open(stream=content, filetype="pdf") as pdf:
+        page_count = pdf.page_count
+    if page_count <= SHARD_PAGE_THRESHOLD:
+        return invoke_document_parse(file_name, content, content_type)
+    
+    shards = split_pdf_pages(content)
+    logger.info(f"Parsing {file_name} ({page_count} pages) in {len(shards)} shards")
+    stem = os.path.splitext(file_name)[0]
+    with ThreadPoolExecutor(max_workers=MAX_SHARD_WORKERS) as executor:
+        futures = {
+            executor.submit(invoke_document_parse, f"{stem}_p{page_offset + 1}.pdf", shard, content_type): page_offset
+            for page_offset, shard in shards
+        }
+        shard_results = [(futures[future], future.result()) for future in as_completed(futures)]
+    return merge_results(shard_results)
+
+
+def process_file(bucket: str, file_key: str) -> Dict[str, Any]:
+    """Process a single file using SageMaker endpoint."""
+    # Download file to /tmp
+    local_path = f"/tmp/{os.path.basename(file_key)}"
+    s3_client.download_file(bucket, file_key, local_path)
+    
+    # Determine content type based on file extension
+    content_type = mimetypes.guess_type(local_path)[0] or "application/octet-stream"
     
     try:
-        # Call SageMaker endpoint
-        response = sagemaker_client.invoke_endpoint(
-            EndpointName=os.environ['SAGEMAKER_ENDPOINT'],
-            ContentType=f'multipart/form-data; boundary={boundary}',
-            Body=body
-        )
-        
-        # Parse response
-        result = json.loads(response['Body'].read().decode())
+        with open(local_path, 'rb') as f:
+            content = f.read()
+        result = parse_document(os.path.basename(file_key), content, content_type)
     finally:
         # Clean up
         os.remove(local_path)
@@ -84,6 +84,10 @@ export class S3InferenceAutomationStack extends cdk.Stack {
             SAGEMAKER_ENDPOINT: props.endpointName,
             OUTPUT_BUCKET: this.outputBucket.bucketName,
             INPUT_BUCKET: this.inputBucket.bucketName,
+            // Large PDFs are split into page ranges parsed concurrently (requires PyMuPDF in the asset)
+            SHARD_PAGE_THRESHOLD: '30',
+            PAGES_PER_SHARD: '20',
+            MAX_SHARD_WORKERS: '4',
           },
           memorySize: 8192,
         });
@@ -21,10 +21,13 @@ from page.portfolio import show_portfolio
 from page.trade_history import show_trade_history
 from page.api_setting import show_api_settings, init_api_session_state, reset_api_warning, check_api_keys
 from page.trade_strategy import show_trade_strategy
+from page.diagnostics import show_diagnostics
+from util.cache_utils import invalidate_cache_scope
 # Clear all cache after API connection success
 def refresh_all_data():
-    """Initialize all data caches and restart the app."""
-    st.cache_data.clear()
+    """Initialize account-dependent data caches and restart the app."""
+    # Market data does not depend on API keys, so it stays cached
+    invalidate_cache_scope("portfolio", "orders")
     st.rerun()
 
 
@@ -55,8 +58,8 @@ cols = []
 # API Settings tab is always displayed
 if has_api_keys:
     # Display all tabs if API keys exist
-    col1, col2, col3, col4, col5 = st.columns(5)
-    cols = [col1, col2, col3, col4, col5]
+    col1, col2, col3, col4, col5, col6 = st.columns(6)
+    cols = [col1, col2, col3, col4, col5, col6]
     
     with col1:
         if st.button("📊 Exchange", use_container_width=True, 
@@ -84,6 +87,12 @@ if has_api_keys:
             reset_api_warning()
             st.rerun()
     with col5:
+        if st.button("🩺 Diagnostics", use_container_width=True,
+                    type="primary" if st.session_state.selected_tab == "Diagnostics" else "secondary"):
+            st.session_state.selected_tab = "Diagnostics"
+            reset_api_warning()
+            st.rerun()
+    with col6:
         if st.button("🔑 API Settings", use_container_width=True,
                     type="primary" if st.session_state.selected_tab == "API Settings" else "secondary"):
             st.session_state.selected_tab = "API Settings"
@@ -108,6 +117,8 @@ elif st.session_state.selected_tab == "Portfolio":
     show_portfolio()
 elif st.session_state.selected_tab == "Transaction History":
     show_trade_history()
+elif st.session_state.selected_tab == "Diagnostics":
+    show_diagnostics()
 elif st.session_state.selected_tab == "API Settings":
     show_api_settings()
 
@@ -1,5 +1,5 @@
 from page.api_setting import init_api_session_state
-from tools.rag.rag import create_vector_store, update_global_cache
+from tools.rag.rag import create_vector_store, update_global_cache, use_local_backend
 from tools.rag.document_processor import process_all_rag_documents, update_upstage_api_key
 from tools.document_parser.document_parser import update_upstage_api_key as update_parser_api_key
 
@@ -25,7 +25,9 @@ def init_app():
     
     if not st.session_state.get('openai_key'):
         print("OpenAI API key is not set. Vector store and LLM features will be disabled.")
-        return
+        # The local index works without OpenAI (local hashing embeddings)
+        if not use_local_backend():
+            return
 
     # Initialize RAG vector store
     vector_store_id = create_vector_store()
@@ -0,0 +1,150 @@
+import hashlib
+from typing import Dict, List, Tuple
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:
+    # Fall back to a character based estimate when tiktoken is not available
+    _ENCODING = None
+
+# Default token budget for one agent request (instructions + status + history)
+DEFAULT_CONTEXT_TOKEN_BUDGET = 6000
+
+# Approximate tokens of the fixed agent instructions (excluding dynamic sections)
+BASE_INSTRUCTION_TOKENS = 700
+
+# Share of the history budget used for the summary of older turns
+SUMMARY_SHARE = 0.3
+
+# Maximum characters kept per message in the summary of older turns
+DIGEST_CHARS = 160
+
+def count_tokens(text: str) -> int:
+    """
+    Counts tokens of a text.
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Number of tokens (estimated as 4 characters per token without tiktoken)
+    """
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def get_message_tokens(message: Dict) -> int:
+    """
+    Returns the token count of a chat message, cached on the message itself.
+
+    Args:
+        message: Chat message dictionary with 'role' and 'content'
+
+    Returns:
+        Number of tokens of the message content
+    """
+    content = message.get("content", "")
+    cached = message.get("_token_count")
+    if cached and cached[0] == len(content):
+        return cached[1]
+
+    tokens = count_tokens(content)
+    message["_token_count"] = (len(content), tokens)
+    return tokens
+
+def _message_fingerprint(content: str) -> str:
+    """Fingerprint of a message ignoring whitespace differences"""
+    return hashlib.md5(" ".join(content.split()).encode("utf-8")).hexdigest()
+
+def _speaker(message: Dict) -> str:
+    return "User" if message.get("role") == "user" else "AI"
+
+def _digest(content: str) -> str:
+    """One-line digest of a message used in the summary of older turns"""
+    line = " ".join(content.split())
+    if len(line) > DIGEST_CHARS:
+        line = line[:DIGEST_CHARS].rstrip() + "…"
+    return line
+
+def build_conversation_context(messages: List[Dict], token_budget: int) -> Tuple[str, Dict]:
+    """
+    Builds the conversation history section of the agent instructions within a token budget.
+    Recent turns are kept verbatim, repeated messages (e.g. periodic auto-think requests) are
+    collapsed, and older turns that no longer fit are kept as a rolling one-line summary.
+
+    Args:
+        messages: Chat messages (first greeting and the current prompt are excluded)
+        token_budget: Maximum tokens for the history section
+
+    Returns:
+        Tuple of (context text, statistics dictionary)
+    """
+    stats = {'messages': len(messages), 'recent': 0, 'summarized': 0, 'deduplicated': 0, 'tokens': 0}
+    if not messages or token_budget <= 0:
+        return "", stats
+
+    summary_budget = int(token_budget * SUMMARY_SHARE)
+    recent_budget = token_budget - summary_budget
+
+    # Walk from the newest message and keep as many verbatim turns as fit
+    seen_fingerprints = set()
+    recent_lines = []
+    recent_tokens = 0
+    split_index = 0
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        content = message.get("content", "")
+        fingerprint = _message_fingerprint(content)
+
+        if fingerprint in seen_fingerprints:
+            line = f"{_speaker(message)}: (same message as a later turn)"
+            line_tokens = count_tokens(line)
+            stats['deduplicated'] += 1
+        else:
+            line = f"{_speaker(message)}: {content}"
+            line_tokens = get_message_tokens(message) + 2
+
+        if recent_tokens + line_tokens > recent_budget:
+            split_index = index + 1
+            break
+
+        seen_fingerprints.add(fingerprint)
+        recent_lines.append(line)
+        recent_tokens += line_tokens
+
+    recent_lines.reverse()
+    stats['recent'] = len(recent_lines)
+
+    # Older turns become one-line digests; the oldest digests are dropped first
+    summary_lines = []
+    summary_tokens = 0
+    for index in range(split_index - 1, -1, -1):
+        message = messages[index]
+        fingerprint = _message_fingerprint(message.get("content", ""))
+        if fingerprint in seen_fingerprints:
+            stats['deduplicated'] += 1
+            continue
+
+        line = f"- {_speaker(message)}: {_digest(message.get('content', ''))}"
+        line_tokens = count_tokens(line)
+        if summary_tokens + line_tokens > summary_budget:
+            break
+
+        seen_fingerprints.add(fingerprint)
+        summary_lines.append(line)
+        summary_tokens += line_tokens
+
+    summary_lines.reverse()
+    stats['summarized'] = len(summary_lines)
+    stats['tokens'] = recent_tokens + summary_tokens
+
+    context = ""
+    if summary_lines:
+        context += "Summary of earlier conversation:\n" + "\n".join(summary_lines) + "\n\n"
+    if recent_lines:
+        context += "Previous conversation:\n" + "\n".join(recent_lines) + "\n"
+
+    return context, stats
@@ -20,6 +20,10 @@ from tools.information_extract.informaton_extract import information_extract
 from tools.rag.agent_tools import search_rag_documents
 from tools.upbit.upbit_api import get_available_coins_func, get_coin_price_info_func, buy_coin_func, sell_coin_func, check_order_status_func
 from tools.search_X.search_X_tool import search_x_tool
+from model.tool_cache import wrap_agent_tools
+from model.tool_executor import wrap_concurrent_tools
+from util.circuit_breaker import get_breaker, classify_error
+from model.conversation_context import build_conversation_context, count_tokens, DEFAULT_CONTEXT_TOKEN_BUDGET, BASE_INSTRUCTION_TOKENS
 
 def get_model_name(model_options):
     if model_options == "claude 3.7 sonnet":
@@ -84,9 +88,13 @@ def parse_document_tool(file_names: List[str]):
     return parser.parse_document(file_names)
 
 # Function to create Agent object
-def create_agent(model_options):
+def create_agent(model_options, reserved_tokens=0, conversation_id=None):
     """
     Create an Agent object.
+    The conversation history is compacted to fit the context token budget
+    (reserved_tokens: tokens already used by the prompt and status block).
+    Read-only tool results are cached per conversation_id, and independent tool calls
+    run concurrently while buy/sell stay ordered.
     """
     # Set API key from session state
     if 'openai_key' in st.session_state and st.session_state.openai_key:
@@ -139,20 +147,6 @@ def create_agent(model_options):
     except (FileNotFoundError, OSError) as e:
         print(f"Error getting PDF file list: {str(e)}")
     
-    # Get previous messages
-    previous_messages = st.session_state.get('messages', [])
-    context = ""
-    
-    # Add recent conversation history to context (max 5 messages)
-    if len(previous_messages) > 1:  # Skip first message (AI greeting)
-        context = "Previous conversation:\n"
-        for i, msg in enumerate(previous_messages[-6:-1]):  # Only recent 5 messages
-            if msg["role"] == "user":
-                context += f"User: {msg['content']}\n"
-            elif msg["role"] == "assistant":
-                context += f"AI: {msg['content']}\n"
-        context += "\n"
-    
     # Add auto trader agent information
     auto_trader_info = ""
     if 'auto_trader' in st.session_state and st.session_state.auto_trader:
@@ -183,6 +177,17 @@ def create_agent(model_options):
             auto_trader_info += "To start auto trading, click the 'Start Agent' button in the 'Auto Trading' tab.\n"
 
 
+    # Add conversation history within the remaining token budget
+    # (skip first message (AI greeting) and the current prompt)
+    previous_messages = st.session_state.get('messages', [])
+    token_budget = st.session_state.get('context_token_budget', DEFAULT_CONTEXT_TOKEN_BUDGET)
+    history_budget = token_budget - BASE_INSTRUCTION_TOKENS - reserved_tokens - count_tokens(
+        user_requirement + portfolio_info + auto_trader_info + ", ".join(pdf_files_base)
+    )
+    context, context_stats = build_conversation_context(previous_messages[1:-1], history_budget)
+    print(f"Conversation context - Budget: {history_budget} tokens, Used: {context_stats['tokens']}, "
+          f"Recent: {context_stats['recent']}, Summarized: {context_stats['summarized']}, Deduplicated: {context_stats['deduplicated']}")
+    
     # Create Agent
     agent = Agent(
         name="Crypto Trading Assistant",
@@ -219,7 +224,9 @@ def create_agent(model_options):
         Available reference documents: {", ".join(pdf_files_base)}
         """,
         model=get_model_name(model_options),
-        tools=[
+        # Independent tool calls of one step run concurrently (results are cached per conversation)
+        model_settings=ModelSettings(parallel_tool_calls=True),
+        tools=wrap_agent_tools(wrap_concurrent_tools([
             WebSearchTool(search_context_size="high"), 
             parse_document_tool, 
             extract_information_tool, 
@@ -230,7 +237,7 @@ def create_agent(model_options):
             sell_coin_func,
             check_order_status_func,
             search_x_tool
-        ],    
+        ], conversation_id), conversation_id),
     )
     
     return agent
@@ -242,61 +249,68 @@ async def stream_openai_response(prompt, model_options, conversation_id=None):
     """
     print(f"Streaming started - Model: {model_options}, Prompt length: {len(prompt)}")
     
-    # Create Agent
-    agent = create_agent(model_options)
-    if not agent:
-        print("No API key - Response generation stopped")
-        yield "API key setup required."
-        return
-    
     try:
-        # Add auto trader agent information
-        auto_trader_info = ""
+        # Add auto trader agent status (recent trades are already part of the agent instructions)
+        status_info_text = ""
+        trader_portfolio_info = ""
         if 'auto_trader' in st.session_state and st.session_state.auto_trader:
             trader = st.session_state.auto_trader
             
             # Check if auto trader agent is active
             if trader.is_running:
                 status_info = trader.get_status()
-                auto_trader_info += "\n\n## Auto Trading Agent Status\n"
-                auto_trader_info += f"- Status: {status_info['status']} (Running)\n"
-                auto_trader_info += f"- Last Analysis: {status_info['last_check'] or 'None'}\n"
-                auto_trader_info += f"- Next Analysis: {status_info['next_check'] or 'Preparing...'}\n"
-                auto_trader_info += f"- Daily Trade Count: {status_info['daily_trading_count']} / {status_info['max_trading_count']}\n"
-                
-                # Recent trade history
-                if trader.trading_history:
-                    auto_trader_info += "\n### Recent Trade History\n"
-                    recent_trades = trader.trading_history[-3:] if trader.trading_history else []
-                    for trade in reversed(recent_trades):
-                        auto_trader_info += f"- {trade.get('timestamp')}: {trade.get('action')} {trade.get('ticker')} {trade.get('amount')}\n"
+                status_info_text += "\n\n## Auto Trading Agent Status\n"
+                status_info_text += f"- Status: {status_info['status']} (Running)\n"
+                status_info_text += f"- Last Analysis: {status_info['last_check'] or 'None'}\n"
+                status_info_text += f"- Next Analysis: {status_info['next_check'] or 'Preparing...'}\n"
+                status_info_text += f"- Daily Trade Count: {status_info['daily_trading_count']} / {status_info['max_trading_count']}\n"
                 
                 # Portfolio information
                 portfolio = trader.get_portfolio()
                 if portfolio:
-                    auto_trader_info += "\n### Portfolio Information\n"
+                    trader_portfolio_info += "\n### Portfolio Information\n"
                     for item in portfolio:
                         ticker = item["ticker"]
                         amount = item["amount"]
                         value = item["value"]
                         
                         if ticker == "KRW":
-                            auto_trader_info += f"- KRW Balance: {int(amount):,} KRW\n"
+                            trader_portfolio_info += f"- KRW Balance: {int(amount):,} KRW\n"
                         else:
-                            auto_trader_info += f"- {ticker}: {amount:.8f} (Value: {int(value):,} KRW)\n"
+                            trader_portfolio_info += f"- {ticker}: {amount:.8f} (Value: {int(value):,} KRW)\n"
                 
                 # Market information
                 market_info = trader.get_market_info()
                 if market_info:
-                    auto_trader_info += "\n### Market Information\n"
+                    status_info_text += "\n### Market Information\n"
                     for coin, info in market_info.items():
                         price = info["current_price"]
                         change_rate = info["change_rate"]
-                        auto_trader_info += f"- {coin}: Current Price {int(price):,} KRW, Change Rate {change_rate:.2f}%\n"
+                        status_info_text += f"- {coin}: Current Price {int(price):,} KRW, Change Rate {change_rate:.2f}%\n"
             else:
-                auto_trader_info += "\n\n## Auto Trading Agent\n"
-                auto_trader_info += "- Status: Stopped (Auto trading is not running)\n"
-                auto_trader_info += "- To start auto trading, click the 'Start Agent' button in the 'Auto Trading' tab.\n"
+                status_info_text += "\n\n## Auto Trading Agent\n"
+                status_info_text += "- Status: Stopped (Auto trading is not running)\n"
+                status_info_text += "- To start auto trading, click the 'Start Agent' button in the 'Auto Trading' tab.\n"
+    except Exception as e:
+        print(f"Error loading auto trader status: {str(e)}")
+        status_info_text = ""
+        trader_portfolio_info = ""
+    
+    # Create Agent (history is compacted to the budget left after the prompt and status block)
+    reserved_tokens = count_tokens(prompt) + count_tokens(status_info_text) + count_tokens(trader_portfolio_info)
+    agent = create_agent(model_options, reserved_tokens=reserved_tokens, conversation_id=conversation_id)
+    if not agent:
+        print("No API key - Response generation stopped")
+        yield "API key setup required."
+        return
+    
+    openai_breaker = get_breaker("openai")
+    outcome_recorded = False
+    try:
+        # Skip the trader portfolio if the instructions already contain the account portfolio
+        auto_trader_info = status_info_text
+        if trader_portfolio_info and "# User Portfolio Information" not in agent.instructions:
+            auto_trader_info += trader_portfolio_info
         
         # Create RunConfig for conversation history
         run_config = None
@@ -313,6 +327,12 @@ async def stream_openai_response(prompt, model_options, conversation_id=None):
         else:
             full_prompt = f"{prompt}{auto_trader_info}"
         
+        # Fail fast while the OpenAI breaker is open
+        if not openai_breaker.allow_request():
+            outcome_recorded = True
+            yield f"The OpenAI API is temporarily unavailable. Please try again in {openai_breaker.retry_after():.0f} seconds."
+            return
+        
         print(f"Before calling Runner.run_streamed")
         
         # Call run_streamed with appropriate arguments
@@ -339,12 +359,20 @@ async def stream_openai_response(prompt, model_options, conversation_id=None):
                 yield event.data.delta
         
         print(f"Streaming completed - Total {chunk_count} chunks")
+        outcome_recorded = True
+        openai_breaker.record_success()
                 
     except Exception as e:
+        outcome_recorded = True
+        openai_breaker.record_failure(classify_error(e), str(e))
         error_msg = f"Error generating response: {str(e)}"
         print(f"ERROR: {error_msg}")
         st.error(error_msg)
         yield error_msg
+    finally:
+        # Cancelled streams (timeout, rerun: CancelledError/GeneratorExit) must not hold the half-open probe
+        if not outcome_recorded:
+            openai_breaker.release_probe()
 
 def stream_response(prompt, model_options):
     """
@@ -0,0 +1,196 @@
+import dataclasses
+import json
+import threading
+import time
+from typing import Dict, List
+
+# Read-only tools whose results can be reused within a conversation
+# (tool name: (TTL in seconds, invalidated when a trade succeeds))
+CACHEABLE_TOOLS = {
+    "get_coin_price_info_func": (20, True),
+    "get_available_coins_func": (20, True),
+    "search_rag_documents": (300, False),
+}
+
+# Tools returning plain text: prefixes of their successful results (anything else is an error message)
+TEXT_RESULT_PREFIXES = {
+    "search_rag_documents": ("\n\n## Search Results", "No search results found."),
+}
+
+# Mutating tools that invalidate trade-sensitive results when they succeed
+INVALIDATING_TOOLS = {"buy_coin_func", "sell_coin_func"}
+
+# Cached tool results per conversation: {conversation_id: {(tool name, arguments): entry}}
+_TOOL_CACHE = {}
+_TOOL_CACHE_LOCK = threading.Lock()
+
+# Process-wide counters
+_TOOL_CACHE_STATS = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+def _normalize_arguments(input_json: str) -> str:
+    """Normalize tool arguments so that key order and whitespace do not matter"""
+    try:
+        return json.dumps(json.loads(input_json or "{}"), sort_keys=True, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return input_json or ""
+
+def _is_failed_result(result) -> bool:
+    """Check whether a tool result reports failure ('success': False)"""
+    try:
+        data = json.loads(result) if isinstance(result, str) else result
+    except (TypeError, ValueError):
+        return False
+    return isinstance(data, dict) and data.get('success') is False
+
+def _is_cacheable_result(tool_name: str, result) -> bool:
+    """
+    Check whether a tool result is a confirmed success: a JSON object with 'success': True, or
+    for plain-text tools a text with a known success prefix. Error texts (including the SDK's
+    "An error occurred while running the tool..." for raised exceptions) are never cached.
+    """
+    if isinstance(result, str) and tool_name in TEXT_RESULT_PREFIXES:
+        return result.startswith(TEXT_RESULT_PREFIXES[tool_name])
+    try:
+        data = json.loads(result) if isinstance(result, str) else result
+    except (TypeError, ValueError):
+        return False
+    return isinstance(data, dict) and data.get('success') is True
+
+def _get_cached_result(conversation_id: str, key):
+    """Return a fresh cached result or None"""
+    now = time.time()
+    with _TOOL_CACHE_LOCK:
+        entries = _TOOL_CACHE.get(conversation_id, {})
+        entry = entries.get(key)
+        if entry and entry['expires_at'] > now:
+            _TOOL_CACHE_STATS['hits'] += 1
+            return entry['result']
+
+        # Drop expired entry
+        if entry:
+            del entries[key]
+        _TOOL_CACHE_STATS['misses'] += 1
+        return None
+
+def _store_result(conversation_id: str, key, result, ttl: int, invalidate_on_trade: bool):
+    """Store a tool result for the conversation"""
+    now = time.time()
+    with _TOOL_CACHE_LOCK:
+        # Prune expired entries (conversations left behind after a reset disappear here)
+        for cached_conversation_id in list(_TOOL_CACHE.keys()):
+            cached_entries = _TOOL_CACHE[cached_conversation_id]
+            for expired_key in [k for k, v in cached_entries.items() if v['expires_at'] <= now]:
+                del cached_entries[expired_key]
+            if not cached_entries:
+                del _TOOL_CACHE[cached_conversation_id]
+        
+        entries = _TOOL_CACHE.setdefault(conversation_id, {})
+        entries[key] = {
+            'result': result,
+            'expires_at': now + ttl,
+            'invalidate_on_trade': invalidate_on_trade
+        }
+
+def invalidate_trade_sensitive_results(conversation_id: str):
+    """
+    Remove cached results that depend on balances or prices.
+
+    Args:
+        conversation_id: Conversation whose cached results are invalidated
+    """
+    with _TOOL_CACHE_LOCK:
+        entries = _TOOL_CACHE.get(conversation_id, {})
+        for key in [k for k, v in entries.items() if v['invalidate_on_trade']]:
+            del entries[key]
+        _TOOL_CACHE_STATS['invalidations'] += 1
+    print(f"Tool cache invalidated after trade - Conversation ID: {conversation_id}")
+
+def clear_tool_cache(conversation_id: str = None):
+    """
+    Clear cached tool results.
+
+    Args:
+        conversation_id: Conversation to clear (all conversations if None)
+    """
+    with _TOOL_CACHE_LOCK:
+        if conversation_id is None:
+            _TOOL_CACHE.clear()
+        else:
+            _TOOL_CACHE.pop(conversation_id, None)
+
+def get_tool_cache_stats() -> Dict:
+    """
+    Returns tool cache statistics.
+
+    Returns:
+        Dictionary with hit/miss/invalidation counts and live entries per tool
+    """
+    now = time.time()
+    with _TOOL_CACHE_LOCK:
+        entries_per_tool = {}
+        for entries in _TOOL_CACHE.values():
+            for (tool_name, _), entry in entries.items():
+                if entry['expires_at'] > now:
+                    entries_per_tool[tool_name] = entries_per_tool.get(tool_name, 0) + 1
+        return {
+            **_TOOL_CACHE_STATS,
+            'conversations': len(_TOOL_CACHE),
+            'entries_per_tool': entries_per_tool
+        }
+
+def _cached_tool(tool, conversation_id: str, ttl: int, invalidate_on_trade: bool):
+    """Wrap a read-only FunctionTool so repeated calls with the same arguments reuse the result"""
+    invoke_tool = tool.on_invoke_tool
+
+    async def on_invoke_tool(ctx, input_json):
+        key = (tool.name, _normalize_arguments(input_json))
+        cached_result = _get_cached_result(conversation_id, key)
+        if cached_result is not None:
+            print(f"Tool cache hit: {tool.name} {key[1]}")
+            return cached_result
+
+        result = await invoke_tool(ctx, input_json)
+        # Only confirmed successes are cached so the next call retries after any failure
+        if _is_cacheable_result(tool.name, result):
+            _store_result(conversation_id, key, result, ttl, invalidate_on_trade)
+        return result
+
+    return dataclasses.replace(tool, on_invoke_tool=on_invoke_tool)
+
+def _invalidating_tool(tool, conversation_id: str):
+    """Wrap a mutating FunctionTool so a successful call invalidates trade-sensitive results"""
+    invoke_tool = tool.on_invoke_tool
+
+    async def on_invoke_tool(ctx, input_json):
+        result = await invoke_tool(ctx, input_json)
+        if not _is_failed_result(result):
+            invalidate_trade_sensitive_results(conversation_id)
+        return result
+
+    return dataclasses.replace(tool, on_invoke_tool=on_invoke_tool)
+
+def wrap_agent_tools(tools: List, conversation_id: str = None) -> List:
+    """
+    Apply per-conversation result caching to the allow-listed read-only tools.
+
+    Args:
+        tools: Agent tools
+        conversation_id: Conversation the cache is scoped to (no caching if None)
+
+    Returns:
+        List of tools with caching applied
+    """
+    if not conversation_id:
+        return tools
+
+    wrapped_tools = []
+    for tool in tools:
+        tool_name = getattr(tool, 'name', None)
+        if tool_name in CACHEABLE_TOOLS and hasattr(tool, 'on_invoke_tool'):
+            ttl, invalidate_on_trade = CACHEABLE_TOOLS[tool_name]
+            wrapped_tools.append(_cached_tool(tool, conversation_id, ttl, invalidate_on_trade))
+        elif tool_name in INVALIDATING_TOOLS and hasattr(tool, 'on_invoke_tool'):
+            wrapped_tools.append(_invalidating_tool(tool, conversation_id))
+        else:
+            wrapped_tools.append(tool)
+    return wrapped_tools
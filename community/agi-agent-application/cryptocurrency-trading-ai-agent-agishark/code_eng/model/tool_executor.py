@@ -0,0 +1,292 @@
+import asyncio
+import contextvars
+import dataclasses
+import json
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from util.circuit_breaker import get_breaker, classify_error, backoff_delay, RETRYABLE_ERRORS
+
+# Maximum number of tool calls executed at the same time (process-wide)
+MAX_CONCURRENT_TOOLS = 4
+
+# Timed-out or cancelled calls keep running on their thread (threads cannot be stopped); they give
+# their slot back and are counted as abandoned until they return. At this many abandoned calls new
+# calls fail fast instead of queueing behind stuck workers
+MAX_ABANDONED_TOOLS = 4
+
+# Threads that wait for a free tool slot on behalf of the event loop (the loop never blocks on the semaphore)
+SLOT_WAIT_WORKERS = 16
+
+# Timeout per tool in seconds
+TOOL_TIMEOUTS = {
+    "get_coin_price_info_func": 20,
+    "get_available_coins_func": 30,
+    "check_order_status_func": 20,
+    "search_rag_documents": 40,
+    "search_x_tool": 40,
+    "parse_document_tool": 180,
+    "extract_information_tool": 180,
+}
+DEFAULT_TOOL_TIMEOUT = 60
+
+# Upstream used by each tool (circuit breaker scope)
+TOOL_UPSTREAMS = {
+    "get_coin_price_info_func": "upbit_quotation",
+    "get_available_coins_func": "upbit_exchange",
+    "check_order_status_func": "upbit_exchange",
+    "buy_coin_func": "upbit_exchange",
+    "sell_coin_func": "upbit_exchange",
+    "search_rag_documents": "openai",
+    "search_x_tool": "x",
+    "parse_document_tool": "upstage",
+    "extract_information_tool": "upstage",
+}
+
+# Retries of read-only tools for rate limit/network/server errors (timeouts are not retried)
+READ_ONLY_RETRIES = 1
+
+# Mutating tools: executed one at a time per conversation in the order the model issued them,
+# and never timed out (an order may already be submitted)
+ORDERED_TOOLS = {"buy_coin_func", "sell_coin_func"}
+
+# Tools block on HTTP calls inside their coroutines, so they run on worker threads
+# with their own event loop instead of blocking the shared loop
+# (extra threads for abandoned calls so they never take the threads of live calls)
+_TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_TOOLS + MAX_ABANDONED_TOOLS, thread_name_prefix="agent-tool")
+_WORKER_STATE = threading.local()
+
+# Tool slots (released when a call finishes or is abandoned) and live/abandoned call counts
+_TOOL_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENT_TOOLS)
+_SLOT_WAIT_EXECUTOR = ThreadPoolExecutor(max_workers=SLOT_WAIT_WORKERS, thread_name_prefix="agent-tool-slot")
+_WORKER_COUNTS = {'active': 0, 'abandoned': 0}
+_WORKER_COUNTS_GUARD = threading.Lock()
+
+# Ordering locks of mutating tools per conversation (dropped once no call of the conversation holds them)
+_ORDERED_LOCKS = weakref.WeakValueDictionary()
+_ORDERED_LOCKS_GUARD = threading.Lock()
+
+class ToolWorkersBusyError(Exception):
+    """Raised when too many timed-out tool calls are still occupying worker threads"""
+
+def _get_worker_loop():
+    """Event loop of the current worker thread (created once per thread)"""
+    loop = getattr(_WORKER_STATE, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _WORKER_STATE.loop = loop
+    return loop
+
+def _run_tool_in_worker(invoke_tool, run_ctx, input_json, script_ctx, context):
+    """Worker thread body: runs one tool coroutine with the session's script context attached"""
+    thread = threading.current_thread()
+    add_script_run_ctx(thread, script_ctx)
+    try:
+        loop = _get_worker_loop()
+        return context.run(loop.run_until_complete, invoke_tool(run_ctx, input_json))
+    finally:
+        add_script_run_ctx(thread, None)
+
+def _get_ordered_lock(conversation_id: str) -> asyncio.Lock:
+    """Per-conversation lock that keeps mutating tool calls in order"""
+    with _ORDERED_LOCKS_GUARD:
+        lock = _ORDERED_LOCKS.get(conversation_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            _ORDERED_LOCKS[conversation_id] = lock
+        return lock
+
+def _finish_call(call: dict):
+    """Done callback of a worker future: free the slot (or the abandoned count) of the call"""
+    with _WORKER_COUNTS_GUARD:
+        if call['state'] == 'active':
+            _WORKER_COUNTS['active'] -= 1
+            _TOOL_SLOTS.release()
+        elif call['state'] == 'abandoned':
+            _WORKER_COUNTS['abandoned'] -= 1
+        call['state'] = 'done'
+
+def _abandon_call(call: dict):
+    """Give the slot of a timed-out/cancelled call back while its thread keeps running"""
+    with _WORKER_COUNTS_GUARD:
+        if call['state'] == 'active':
+            _WORKER_COUNTS['active'] -= 1
+            _WORKER_COUNTS['abandoned'] += 1
+            _TOOL_SLOTS.release()
+            call['state'] = 'abandoned'
+
+def _check_abandoned():
+    """Fail fast while MAX_ABANDONED_TOOLS calls are stuck"""
+    with _WORKER_COUNTS_GUARD:
+        if _WORKER_COUNTS['abandoned'] >= MAX_ABANDONED_TOOLS:
+            raise ToolWorkersBusyError(f"{_WORKER_COUNTS['abandoned']} timed-out tool calls are still running")
+
+async def _acquire_slot():
+    """Wait for a tool slot on a helper thread; a slot acquired after the caller was cancelled is released"""
+    acquire_future = asyncio.get_running_loop().run_in_executor(_SLOT_WAIT_EXECUTOR, _TOOL_SLOTS.acquire)
+    try:
+        await asyncio.shield(acquire_future)
+    except asyncio.CancelledError:
+        acquire_future.add_done_callback(lambda f: _TOOL_SLOTS.release() if not f.cancelled() and f.exception() is None else None)
+        raise
+
+async def _run_on_worker(func, *args, timeout: float = None):
+    """
+    Run func(*args) on the tool pool once a slot is free.
+
+    Raises:
+        ToolWorkersBusyError: If MAX_ABANDONED_TOOLS calls are stuck
+        asyncio.TimeoutError: If the call did not finish within timeout (the call is abandoned)
+    """
+    _check_abandoned()
+    await _acquire_slot()
+    with _WORKER_COUNTS_GUARD:
+        abandoned = _WORKER_COUNTS['abandoned']
+        if abandoned < MAX_ABANDONED_TOOLS:
+            _WORKER_COUNTS['active'] += 1
+    if abandoned >= MAX_ABANDONED_TOOLS:
+        # Calls timed out while this one was waiting
+        _TOOL_SLOTS.release()
+        raise ToolWorkersBusyError(f"{abandoned} timed-out tool calls are still running")
+
+    call = {'state': 'active'}
+    try:
+        future = _TOOL_EXECUTOR.submit(func, *args)
+    except BaseException:
+        _finish_call(call)
+        raise
+    future.add_done_callback(lambda _: _finish_call(call))
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+    except BaseException:
+        if not future.done():
+            _abandon_call(call)
+        raise
+
+def get_tool_worker_counts() -> dict:
+    """Live and abandoned (timed out, still running) tool calls"""
+    with _WORKER_COUNTS_GUARD:
+        return dict(_WORKER_COUNTS)
+
+def _result_error_class(result):
+    """Classify a tool result that reports failure (None if the call succeeded)"""
+    try:
+        data = json.loads(result) if isinstance(result, str) else result
+    except (TypeError, ValueError):
+        return None
+    if isinstance(data, dict) and data.get('success') is False:
+        return data.get('error_type') or classify_error(str(data.get('message') or data.get('error') or ""))
+    return None
+
+def _fast_fail_result(tool_name: str, breaker) -> str:
+    """Result returned without calling the tool while its upstream breaker is open"""
+    return json.dumps({
+        'success': False,
+        'message': f"{tool_name} is skipped because the upstream is failing (retry in {breaker.retry_after():.0f} seconds). Continue without this result.",
+        'error': 'circuit_open'
+    }, ensure_ascii=False)
+
+def _concurrent_tool(tool, conversation_id: str):
+    """
+    Wrap a FunctionTool so it runs on the worker pool with a timeout (or in order if mutating),
+    guarded by the circuit breaker of its upstream
+    """
+    invoke_tool = tool.on_invoke_tool
+    ordered = tool.name in ORDERED_TOOLS
+    timeout = TOOL_TIMEOUTS.get(tool.name, DEFAULT_TOOL_TIMEOUT)
+    breaker = get_breaker(TOOL_UPSTREAMS[tool.name]) if tool.name in TOOL_UPSTREAMS else None
+
+    async def on_invoke_tool(run_ctx, input_json):
+        script_ctx = get_script_run_ctx(suppress_warning=True)
+        start_time = time.time()
+
+        def submit(call_timeout=None):
+            return _run_on_worker(
+                _run_tool_in_worker,
+                invoke_tool, run_ctx, input_json, script_ctx, contextvars.copy_context(),
+                timeout=call_timeout
+            )
+
+        async def run_once():
+            if breaker and not breaker.allow_request():
+                print(f"Tool rejected by open circuit breaker: {tool.name}")
+                return _fast_fail_result(tool.name, breaker), "circuit_open"
+
+            try:
+                if ordered:
+                    async with _get_ordered_lock(conversation_id or "default"):
+                        result = await submit()
+                else:
+                    try:
+                        result = await submit(timeout)
+                    except asyncio.TimeoutError:
+                        print(f"Tool timed out: {tool.name} ({timeout} seconds)")
+                        if breaker:
+                            breaker.record_failure("timeout", f"{tool.name} timed out after {timeout} seconds")
+                        return json.dumps({
+                            'success': False,
+                            'message': f"{tool.name} did not respond within {timeout} seconds. Try again or continue without this result."
+                        }, ensure_ascii=False), "timeout"
+            except ToolWorkersBusyError as e:
+                print(f"Tool rejected, workers busy: {tool.name} ({str(e)})")
+                if breaker:
+                    breaker.release_probe()
+                return json.dumps({
+                    'success': False,
+                    'message': f"{tool.name} is skipped because earlier tool calls are still stuck. Continue without this result.",
+                    'error': 'workers_busy'
+                }, ensure_ascii=False), "workers_busy"
+            except BaseException:
+                # Cancelled or failed without a result: free the half-open probe slot
+                if breaker:
+                    breaker.release_probe()
+                raise
+
+            error_class = _result_error_class(result)
+            if breaker:
+                if error_class is None:
+                    breaker.record_success()
+                else:
+                    breaker.record_failure(error_class, str(result)[:200])
+            return result, error_class
+
+        result, error_class = await run_once()
+
+        # Read-only tools get one more attempt for transient upstream errors
+        attempt = 0
+        while not ordered and error_class in RETRYABLE_ERRORS and error_class != "timeout" and attempt < READ_ONLY_RETRIES:
+            delay = backoff_delay(attempt, error_class)
+            print(f"Tool retry: {tool.name} ({error_class}, {delay:.2f} seconds)")
+            await asyncio.sleep(delay)
+            result, error_class = await run_once()
+            attempt += 1
+
+        print(f"Tool completed: {tool.name} ({time.time() - start_time:.2f} seconds)")
+        return result
+
+    return dataclasses.replace(tool, on_invoke_tool=on_invoke_tool)
+
+def wrap_concurrent_tools(tools: List, conversation_id: str = None) -> List:
+    """
+    Make function tools safe to run concurrently when the model issues several calls in one step.
+    Read-only tools run in parallel on a bounded worker pool with per-tool timeouts,
+    mutating tools (buy/sell) are serialized in issue order and never retried.
+    Calls fail fast while the breaker of the tool's upstream is open.
+
+    Args:
+        tools: Agent tools
+        conversation_id: Conversation used to scope the ordering of mutating tools
+
+    Returns:
+        List of wrapped tools (hosted tools are returned unchanged)
+    """
+    wrapped_tools = []
+    for tool in tools:
+        if hasattr(tool, 'on_invoke_tool'):
+            wrapped_tools.append(_concurrent_tool(tool, conversation_id))
+        else:
+            wrapped_tools.append(tool)
+    return wrapped_tools
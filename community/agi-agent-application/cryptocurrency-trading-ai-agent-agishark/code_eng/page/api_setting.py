@@ -8,6 +8,7 @@ import tweepy
 import json
 import sys
 from UPBIT import Trade
+from util.cache_utils import invalidate_cache_scope
 
 # API key storage file path
 API_KEY_STORE_FILE = "data/api_key_store.json"
@@ -201,8 +202,8 @@ def show_api_settings():
             # Clear cache immediately upon successful API connection
             if api_success:
                 st.info("Refreshing all data...")
-                # Clear cache
-                st.cache_data.clear()
+                # Clear account-dependent caches (market data does not depend on API keys)
+                invalidate_cache_scope("portfolio", "orders")
                 # Show connection complete status
                 st.success("API connection completed. Real data will be displayed on all pages.")
                 st.balloons()  # Celebration effect
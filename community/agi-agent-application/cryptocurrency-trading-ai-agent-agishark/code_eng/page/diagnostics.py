@@ -0,0 +1,268 @@
+import streamlit as st
+import pandas as pd
+from util.cache_utils import get_cache_stats, invalidate_cache_entry
+from model.tool_cache import get_tool_cache_stats, clear_tool_cache
+from util.circuit_breaker import get_breaker_states, reset_breaker
+from model.tool_executor import get_tool_worker_counts, MAX_CONCURRENT_TOOLS, MAX_ABANDONED_TOOLS
+from tools.rag.rag import reconcile_file_index
+from tools.rag.query_cache import get_query_cache_stats, clear_query_cache
+from tools.document_parser.parse_cache import get_parse_cache_stats, clear_parse_cache
+from tools.web2pdf.url_cache import get_url_cache_stats, clear_url_cache
+from tools.web2pdf.browser_pool import get_browser_pool_stats, MAX_RENDER_CONCURRENCY
+from tools.rag.ingestion_manifest import get_manifest_entries
+
+def format_bytes(size_bytes: int) -> str:
+    """Format byte size in a human readable unit"""
+    for unit in ["B", "KB", "MB"]:
+        if size_bytes < 1024:
+            return f"{size_bytes:,.0f} {unit}"
+        size_bytes /= 1024
+    return f"{size_bytes:,.1f} GB"
+
+def format_seconds(seconds) -> str:
+    """Format elapsed seconds"""
+    if seconds is None:
+        return "-"
+    if seconds < 1:
+        return f"{seconds * 1000:,.0f} ms"
+    if seconds < 60:
+        return f"{seconds:,.1f} s"
+    return f"{seconds / 60:,.1f} min"
+
+def show_cache_summary(cache_stats):
+    """Display summary table of every cached function"""
+    summary_rows = []
+    for stats in cache_stats:
+        summary_rows.append({
+            'Function': stats['name'],
+            'Scope': stats['scope'],
+            'TTL': format_seconds(stats['ttl']),
+            'Hits': stats['hits'],
+            'Misses': stats['misses'],
+            'Hit Rate': f"{stats['hit_rate']:.1f}%",
+            'Errors': stats['errors'],
+            'Last Refresh Latency': format_seconds(stats['last_latency']),
+            'Last Refresh': f"{format_seconds(stats['last_refresh_age'])} ago" if stats['last_refresh_age'] is not None else "-",
+            'Entries': len(stats['entries']),
+            'Size (est.)': format_bytes(stats['total_size_bytes'])
+        })
+
+    st.dataframe(pd.DataFrame(summary_rows), use_container_width=True, hide_index=True)
+
+def show_cache_entries(stats):
+    """Display cache entries of one function with per-entry invalidate buttons"""
+    label = f"{stats['name']} ({len(stats['entries'])} entries, {format_bytes(stats['total_size_bytes'])})"
+    with st.expander(label):
+        if not stats['entries']:
+            st.info("No cached entries.")
+            return
+
+        for entry in stats['entries']:
+            col1, col2, col3, col4, col5 = st.columns([4, 2, 2, 2, 2])
+            with col1:
+                st.code(entry['key'], language=None)
+            with col2:
+                age_text = format_seconds(entry['age'])
+                st.markdown(f"Age: **{age_text}**" + (" (expired)" if entry['expired'] else ""))
+            with col3:
+                st.markdown(f"Size: **{format_bytes(entry['size_bytes'])}**")
+            with col4:
+                st.markdown(f"Latency: **{format_seconds(entry['latency'])}**")
+            with col5:
+                if st.button("Invalidate", key=f"invalidate_{stats['name']}_{entry['key']}", use_container_width=True):
+                    invalidate_cache_entry(stats['name'], entry['key'])
+                    st.rerun()
+
+        if st.button(f"Invalidate all {stats['name']} entries", key=f"invalidate_all_{stats['name']}"):
+            invalidate_cache_entry(stats['name'])
+            st.rerun()
+
+def show_circuit_breakers():
+    """Display circuit breaker state of each upstream"""
+    st.subheader("🔌 Upstream Circuit Breakers")
+    st.markdown("Calls to an upstream fail fast while its breaker is open. One probe call is allowed after the recovery timeout.")
+
+    state_labels = {
+        "closed": "🟢 Closed",
+        "half_open": "🟡 Half-open",
+        "open": "🔴 Open"
+    }
+
+    breaker_rows = []
+    for breaker in get_breaker_states():
+        breaker_rows.append({
+            'Upstream': breaker['label'],
+            'State': state_labels.get(breaker['state'], breaker['state']),
+            'Consecutive Failures': breaker['consecutive_failures'],
+            'Failures': breaker['total_failures'],
+            'Successes': breaker['total_successes'],
+            'Rejected': breaker['rejected_calls'],
+            'Retry In': format_seconds(breaker['retry_after']) if breaker['state'] == "open" else "-",
+            'Last Error': f"[{breaker['last_error_class']}] {breaker['last_error'][:80]}" if breaker['last_error'] else "-",
+            'Last Failure': f"{format_seconds(breaker['last_failure_age'])} ago" if breaker['last_failure_age'] is not None else "-"
+        })
+
+    st.dataframe(pd.DataFrame(breaker_rows), use_container_width=True, hide_index=True)
+
+    # Abandoned calls are timed-out tools still holding a thread; at the limit new tool calls fail fast
+    worker_counts = get_tool_worker_counts()
+    col1, col2 = st.columns(2)
+    col1.metric("Running Tool Calls", f"{worker_counts['active']} / {MAX_CONCURRENT_TOOLS}")
+    col2.metric("Abandoned Tool Calls", f"{worker_counts['abandoned']} / {MAX_ABANDONED_TOOLS}")
+
+    if st.button("Reset All Breakers", key="reset_breakers"):
+        reset_breaker()
+        st.rerun()
+
+def show_tool_cache():
+    """Display agent tool result cache statistics"""
+    st.subheader("🧰 Agent Tool Cache")
+    st.markdown("Read-only tool results are reused within a conversation and invalidated after a successful buy or sell.")
+
+    tool_stats = get_tool_cache_stats()
+    total_lookups = tool_stats['hits'] + tool_stats['misses']
+    hit_rate = tool_stats['hits'] / total_lookups * 100 if total_lookups else 0.0
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hits", tool_stats['hits'])
+    col2.metric("Misses", tool_stats['misses'])
+    col3.metric("Hit Rate", f"{hit_rate:.1f}%")
+    col4.metric("Trade Invalidations", tool_stats['invalidations'])
+
+    if tool_stats['entries_per_tool']:
+        st.dataframe(
+            pd.DataFrame(
+                [{'Tool': name, 'Live Entries': count} for name, count in tool_stats['entries_per_tool'].items()]
+            ),
+            use_container_width=True,
+            hide_index=True
+        )
+
+    if st.button("Clear Tool Cache", key="clear_tool_cache"):
+        clear_tool_cache()
+        st.rerun()
+
+def show_query_cache():
+    """Display semantic RAG query cache statistics"""
+    st.subheader("🔎 Document Search Cache")
+    st.markdown("Searches reuse the results of a recent query with the same meaning. The cache is cleared whenever documents are added or removed.")
+
+    query_stats = get_query_cache_stats()
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hits", query_stats['hits'])
+    col2.metric("Misses", query_stats['misses'])
+    col3.metric("Hit Rate", f"{query_stats['hit_rate'] * 100:.1f}%")
+    col4.metric("Latency Saved", format_seconds(query_stats['saved_seconds']))
+
+    if query_stats['entries']:
+        st.dataframe(
+            pd.DataFrame([{
+                'Query': entry['query'],
+                'Hits': entry['hits'],
+                'Results': entry['results'],
+                'Age': format_seconds(entry['age'])
+            } for entry in query_stats['entries']]),
+            use_container_width=True,
+            hide_index=True
+        )
+
+    if st.button("Clear Search Cache", key="clear_query_cache"):
+        clear_query_cache()
+        st.rerun()
+
+def show_parse_cache():
+    """Display Document Parse response cache statistics"""
+    st.subheader("📄 Document Parse Cache")
+    st.markdown("Parse responses are stored compressed on disk, keyed by file content and request options. Parsing the same file again costs nothing.")
+
+    parse_stats = get_parse_cache_stats()
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hits", parse_stats['hits'])
+    col2.metric("Misses", parse_stats['misses'])
+    col3.metric("Entries", parse_stats['entries'])
+    col4.metric("Size", f"{format_bytes(parse_stats['size_bytes'])} / {format_bytes(parse_stats['max_bytes'])}")
+
+    if st.button("Clear Parse Cache", key="clear_parse_cache"):
+        clear_parse_cache()
+        st.rerun()
+
+def show_url_cache():
+    """Display web page cache statistics"""
+    st.subheader("🌐 Web Page Cache")
+    st.markdown("Fetched HTML, rendered PDFs and extracted text are kept per URL. Stale pages are revalidated with ETag/Last-Modified, so unchanged pages are not rendered or parsed again.")
+
+    url_stats = get_url_cache_stats()
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Fresh Hits", url_stats['fresh_hits'])
+    col2.metric("Revalidated", url_stats['revalidated'])
+    col3.metric("Misses", url_stats['misses'])
+    col4.metric("Pages", url_stats['entries'])
+    col5.metric("Size", f"{format_bytes(url_stats['size_bytes'])} / {format_bytes(url_stats['max_bytes'])}")
+
+    if st.button("Clear Web Page Cache", key="clear_url_cache"):
+        clear_url_cache()
+        st.rerun()
+
+def show_browser_pool():
+    """Display headless browser pool statistics"""
+    st.subheader("🖨️ Browser Pool")
+    st.markdown(f"Pages that need rendering share one headless browser with {MAX_RENDER_CONCURRENCY} reusable contexts. Contexts are replaced after a number of pages, and the browser is relaunched if it crashes.")
+
+    pool_stats = get_browser_pool_stats()
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Pages Rendered", pool_stats['pages'])
+    col2.metric("Contexts Created", pool_stats['contexts_created'])
+    col3.metric("Browser Launches", pool_stats['browser_launches'])
+
+def show_rag_file_index():
+    """Display the RAG file index (file name -> vector store file ID)"""
+    st.subheader("🗂️ RAG File Index")
+    st.markdown("Maps document names and content hashes to vector store file IDs so deletes need a single API call.")
+
+    entries = get_manifest_entries()
+    st.metric("Indexed Documents", len(entries))
+
+    if st.button("Rebuild From Vector Store", key="reconcile_file_index"):
+        result = reconcile_file_index(st.session_state.get('vector_store_id', ''))
+        if result['success']:
+            st.success(f"Indexed {result['indexed']} documents, removed {result['removed']} stale entries, found {result['duplicates']} duplicates and {result['untracked']} untracked files.")
+        else:
+            st.error(result['error'])
+
+def show_diagnostics():
+    """Display cache and data source diagnostics"""
+    st.title("🩺 Diagnostics")
+
+    if st.button("🔄 Reload Statistics", key="diagnostics_reload"):
+        st.rerun()
+
+    show_circuit_breakers()
+
+    show_tool_cache()
+
+    show_query_cache()
+
+    show_parse_cache()
+
+    show_url_cache()
+
+    show_browser_pool()
+
+    show_rag_file_index()
+
+    st.subheader("💾 Data Caches")
+    st.markdown("Statistics are collected per server process since startup. Invalidating an entry only refetches that entry on next use.")
+
+    cache_stats = get_cache_stats()
+    if not cache_stats:
+        st.info("No cached functions have been used yet. Open the Exchange, Portfolio or Transaction History tab first.")
+        return
+
+    show_cache_summary(cache_stats)
+
+    for stats in cache_stats:
+        show_cache_entries(stats)
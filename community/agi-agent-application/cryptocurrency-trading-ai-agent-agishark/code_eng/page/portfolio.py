@@ -9,12 +9,14 @@ import numpy as np
 sys.path.append("tools/upbit")
 from UPBIT import Trade
 from page.api_setting import check_api_keys, get_upbit_instance, get_upbit_trade_instance
+from util.cache_utils import tracked_cache_data, invalidate_cache_scope
+from util.ui_components import get_page_window, render_pagination_controls
 
 def format_number(number: float) -> str:
     """Number formatting"""
     return f"{number:,.2f}"
 
-@st.cache_data(ttl=300)  # Increased to 5 minute cache
+@tracked_cache_data(ttl=300, scope="portfolio")  # Increased to 5 minute cache
 def get_portfolio_info():
     try:
         upbit = get_upbit_instance()
@@ -154,7 +156,7 @@ def calculate_daily_profit_rate(_upbit_trade):
     except Exception as e:
         return 0  # Return default value on error (display as 0% in UI)
 
-@st.cache_data(ttl=300)  # Increased to 5 minute cache
+@tracked_cache_data(ttl=300, scope="portfolio")  # Increased to 5 minute cache
 def get_portfolio_info_from_trade(_upbit_trade):
     """Get portfolio information using Trade class"""
     try:
@@ -276,7 +278,8 @@ def show_portfolio():
     
     # Refresh button
     if st.button("🔄 Refresh", key="portfolio_refresh", use_container_width=True):
-        st.cache_data.clear()
+        # Only portfolio data is refreshed (market and order caches stay warm)
+        invalidate_cache_scope("portfolio")
         st.rerun()
     
     # Get portfolio information
@@ -352,29 +355,12 @@ def show_portfolio():
     # Display coin holdings by coin
     st.markdown("### 💰 Coin Holdings")
     
-    # Pagination handling
+    # Pagination handling (only the visible window is formatted and styled)
     page_size = 5  # Number of coins to display per page
-    if 'portfolio_page' not in st.session_state:
-        st.session_state.portfolio_page = 0
-    
-    total_pages = (len(coin_balances) + page_size - 1) // page_size if not coin_balances.empty else 1
-    start_idx = st.session_state.portfolio_page * page_size
-    end_idx = min(start_idx + page_size, len(coin_balances))
+    start_idx, end_idx, total_pages = get_page_window(len(coin_balances), page_size, "portfolio")
     
     # Page selection
-    if total_pages > 1:
-        col1, col2, col3 = st.columns([1, 4, 1])
-        with col1:
-            if st.button("Previous", key="prev_page", disabled=st.session_state.portfolio_page <= 0):
-                st.session_state.portfolio_page -= 1
-                st.rerun()
-        with col2:
-            pagination_info = f"<div style='text-align: center'>Page {st.session_state.portfolio_page + 1}/{total_pages}</div>"
-            st.write(pagination_info, unsafe_allow_html=True)
-        with col3:
-            if st.button("Next", key="next_page", disabled=st.session_state.portfolio_page >= total_pages - 1):
-                st.session_state.portfolio_page += 1
-                st.rerun()
+    render_pagination_controls(total_pages, "portfolio")
     
     # Display current page's coin list
     if not coin_balances.empty:
@@ -455,7 +441,7 @@ def show_portfolio():
         
         # Show detailed information (provided in collapsible section if needed)
         with st.expander("View Detailed Coin Information"):
-            for idx, row in page_data.iterrows():
+            for row in page_data.to_dict('records'):
                 # Display coin details in card format
                 profit_rate = row['Rate of Return']
                 profit_color = "#28a745" if profit_rate >= 0 else "#dc3545"
@@ -1,5 +1,4 @@
 import streamlit as st
-import asyncio
 import uuid
 import threading
 import time
@@ -8,7 +7,9 @@ import os
 from datetime import datetime, timedelta
 
 from model.open_ai_agent import stream_openai_response
+from model.conversation_context import DEFAULT_CONTEXT_TOKEN_BUDGET
 from tools.auto_trader.auto_trader import AutoTrader
+from util.async_loop import iter_background_stream
 
 def perform_periodic_task(work_freq, time_str):
     """Function that periodically generates automated dialogue"""
@@ -28,6 +29,26 @@ def perform_periodic_task(work_freq, time_str):
     
     return auto_messages
 
+def stream_response_to_placeholder(prompt, placeholder, timeout=60):
+    """
+    Stream agent response into a placeholder.
+    The response is generated on the shared background event loop and chunks are received here.
+    """
+    full_response = ""
+    for chunk in iter_background_stream(
+        stream_openai_response(
+            prompt,
+            st.session_state.model_options,
+            st.session_state.conversation_id
+        ),
+        timeout=timeout
+    ):
+        print(f"Chunk received: {len(chunk)} bytes")
+        full_response += chunk
+        placeholder.markdown(full_response + "▌")
+
+    placeholder.markdown(full_response)
+    return full_response
 
 def show_sidebar():
     st.title("Cryptocurrency Trading AI Agent")
@@ -163,58 +184,17 @@ def show_sidebar():
                         
                     with st.chat_message("assistant"):
                         response_placeholder = st.empty()
-                        # Process streaming response
-                        # Changed event loop creation and management method
+                        # Process streaming response (runs on the shared background event loop)
                         full_response = ""
                         sent_data = f"Input: {user_prompt_text[:50]}..., Model: {st.session_state.model_options}"
                         print(f"Request data: {sent_data}")
 
                         try:
-                            # Try to get existing event loop
-                            try:
-                                loop = asyncio.get_event_loop()
-                            except RuntimeError:
-                                # Create new loop if none exists
-                                loop = asyncio.new_event_loop()
-                                asyncio.set_event_loop(loop)
-                            
-                            # Async coroutine function
-                            async def process_chunks():
-                                nonlocal full_response
-                                full_response = ""
-                                try:
-                                    async for chunk in stream_openai_response(
-                                        user_prompt_text,
-                                        st.session_state.model_options,
-                                        st.session_state.conversation_id
-                                    ):
-                                        print(f"Chunk received: {len(chunk)} bytes")
-                                        full_response += chunk
-                                        response_placeholder.markdown(full_response + "▌")
-                                    
-                                    response_placeholder.markdown(full_response)
-                                    return full_response
-                                except Exception as e:
-                                    error_msg = f"Error during response generation: {str(e)}"
-                                    print(error_msg)
-                                    response_placeholder.markdown(error_msg)
-                                    return error_msg
-                            
-                            # Run in existing loop or new loop
-                            if loop.is_running():
-                                print("Using existing event loop")
-                                task = asyncio.create_task(process_chunks())
-                                full_response = st.session_state.get("_temp_response", "")
-                                st.session_state["_temp_task"] = task
-                            else:
-                                print("Running new event loop")
-                                full_response = loop.run_until_complete(
-                                    asyncio.wait_for(process_chunks(), timeout=60)
-                                )
+                            full_response = stream_response_to_placeholder(user_prompt_text, response_placeholder, timeout=60)
                             
                             print(f"Response complete: {len(full_response)} characters")
                             
-                        except asyncio.TimeoutError:
+                        except TimeoutError:
                             full_response = "Response generation timed out. Please try again."
                             response_placeholder.markdown(full_response)
                             print("Timeout occurred")
@@ -318,44 +298,8 @@ def show_sidebar():
                                     # Generate AI response
                                     print("Starting AI response generation")
                                     
-                                    full_response = ""
-                                    
-                                    # Process completely in main thread (don't use threads)
-                                    try:
-                                        loop = asyncio.get_event_loop()
-                                    except RuntimeError:
-                                        loop = asyncio.new_event_loop()
-                                        asyncio.set_event_loop(loop)
-                                    
-                                    async def get_full_response():
-                                        nonlocal full_response
-                                        try:
-                                            async for chunk in stream_openai_response(
-                                                auto_message,
-                                                st.session_state.model_options,
-                                                st.session_state.conversation_id
-                                            ):
-                                                full_response += chunk
-                                                progress_placeholder.markdown(full_response + "▌")
-                                            
-                                            progress_placeholder.markdown(full_response)
-                                            return full_response
-                                        except Exception as e:
-                                            error_msg = f"Error during response generation: {str(e)}"
-                                            print(error_msg)
-                                            progress_placeholder.markdown(error_msg)
-                                            return error_msg
-                                    
-                                    # Execute async function synchronously
-                                    if loop.is_running():
-                                        print("Using existing event loop")
-                                        task = asyncio.create_task(get_full_response())
-                                        st.session_state["_temp_task"] = task
-                                    else:
-                                        print("Running new event loop")
-                                        full_response = loop.run_until_complete(
-                                            asyncio.wait_for(get_full_response(), timeout=60)
-                                        )
+                                    # Same background event loop as the chat input
+                                    full_response = stream_response_to_placeholder(auto_message, progress_placeholder, timeout=60)
                                     
                                     print(f"Response complete: {len(full_response)} characters")
                                     
@@ -379,6 +323,16 @@ def show_sidebar():
                     print(f"Error processing work interval: {str(e)}")
 
             st.session_state.model_options = st.selectbox("LLM Model Selection", ("gpt 4o", "gpt 4o mini"))
+            
+            # Token budget per request (older turns are summarized to fit)
+            st.session_state.context_token_budget = st.number_input(
+                "Context Token Budget",
+                min_value=2000,
+                max_value=100000,
+                value=DEFAULT_CONTEXT_TOKEN_BUDGET,
+                step=1000,
+                help="Maximum tokens per agent request. Older conversation turns are summarized to stay within this budget."
+            )
 
 
         with st.expander("User Requirements", expanded=True):
@@ -7,6 +7,8 @@ import sys
 sys.path.append("tools/upbit")
 from UPBIT import Trade
 from page.api_setting import check_api_keys, get_upbit_trade_instance
+from util.cache_utils import tracked_cache_data, invalidate_cache_scope, get_versioned_view
+from util.ui_components import get_page_window, render_pagination_controls, windowed_dataframe
 import requests
 import hashlib
 import jwt
@@ -114,7 +116,7 @@ def format_date(date_string: str) -> str:
                 # Return original if date format is changed or incorrect
                 return date_string
 
-@st.cache_data(ttl=300)
+@tracked_cache_data(ttl=300, scope="orders")
 def get_user_orders(_upbit_trade, max_pages=5) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """Retrieve user's order history and transaction history (multiple pages, restructured code)"""
     orders_columns = ["Order Time", "Coin", "Type", "Order Method", "Order Price", "Order Amount", "Executed Amount", "Unfilled Amount", "Total Order Value", "Status", "Order ID"]
@@ -343,6 +345,77 @@ def generate_sample_order_data() -> Tuple[pd.DataFrame, pd.DataFrame]:
     
     return orders_df, transactions_df
 
+def build_transactions_base(transactions_df: pd.DataFrame) -> Dict:
+    """Precompute filter options of the transaction history (once per data version)"""
+    coin_options = ["All"]
+    type_options = ["All"]
+    if not transactions_df.empty:
+        if "Coin" in transactions_df.columns:
+            coin_options.extend(sorted(transactions_df["Coin"].unique()))
+        if "Type" in transactions_df.columns:
+            type_options.extend(sorted(transactions_df["Type"].unique()))
+
+    return {
+        'transactions': transactions_df,
+        'coin_options': coin_options,
+        'type_options': type_options
+    }
+
+def build_filtered_transactions(transactions_df: pd.DataFrame, tx_coin: str, tx_type: str) -> Dict:
+    """Apply filters and precompute statistics (once per data version and filter combination)"""
+    mask = pd.Series(True, index=transactions_df.index)
+    if tx_coin != "All" and "Coin" in transactions_df.columns:
+        mask &= transactions_df["Coin"] == tx_coin
+    if tx_type != "All" and "Type" in transactions_df.columns:
+        mask &= transactions_df["Type"] == tx_type
+    filtered_tx = transactions_df[mask]
+
+    coin_totals = filtered_tx.groupby("Coin")["Trade Amount"].sum().reset_index()
+    type_counts = filtered_tx["Type"].value_counts()
+
+    return {
+        'filtered': filtered_tx,
+        'coin_totals': coin_totals.to_dict('records'),
+        'buy_count': int(type_counts.get("Buy", 0)),
+        'sell_count': int(type_counts.get("Sell", 0)),
+        'total_fee': float(filtered_tx["Fee"].sum()) if not filtered_tx.empty else 0.0
+    }
+
+def format_transactions_page(page_tx: pd.DataFrame) -> pd.DataFrame:
+    """Format the visible transaction rows for table display"""
+    display_columns = ["Execution Time", "Coin", "Type", "Trade Volume", "Trade Price", "Trade Amount", "Fee", "Order Time"]
+
+    if "Trade Price" in page_tx.columns: page_tx["Trade Price"] = page_tx["Trade Price"].map(lambda x: f"{x:,.0f} KRW")
+    if "Trade Amount" in page_tx.columns: page_tx["Trade Amount"] = page_tx["Trade Amount"].map(lambda x: f"{x:,.0f} KRW")
+    if "Fee" in page_tx.columns: page_tx["Fee"] = page_tx["Fee"].map(lambda x: f"{x:,.4f} KRW")
+    if "Trade Volume" in page_tx.columns: page_tx["Trade Volume"] = page_tx["Trade Volume"].map(lambda x: f"{x:.8f}")
+
+    return page_tx[display_columns]
+
+def highlight_tx_type(s):
+    """Cell style by transaction type"""
+    if s == "Buy": return 'background-color: rgba(255, 0, 0, 0.1); color: darkred; font-weight: bold'
+    else: return 'background-color: rgba(0, 0, 255, 0.1); color: darkblue; font-weight: bold'
+
+def load_transactions_view(upbit_trade) -> Dict:
+    """
+    Load the transaction history view.
+    While the cached order history is still fresh, the derived view stored in the session is reused
+    without touching the cache, so page changes and filter changes do not reload the data.
+    """
+    version = get_user_orders.cache_version(upbit_trade)
+    transactions_df = None
+    if version is None:
+        with st.spinner("Loading actual transaction history..."):
+            _, transactions_df = get_user_orders(upbit_trade)
+        version = get_user_orders.cache_version(upbit_trade)
+
+    def build_view():
+        source_df = transactions_df if transactions_df is not None else get_user_orders(upbit_trade)[1]
+        return build_transactions_base(source_df)
+
+    return get_versioned_view("tx_base", version, build_view), version
+
 def show_trade_history():
     """Display transaction history screen (including partially executed canceled orders)"""
     st.title("📝 Transaction History")
@@ -357,7 +430,8 @@ def show_trade_history():
     col1, col2, col3 = st.columns([1, 1, 1])
     with col1:
         if st.button("🔄 Refresh", key="history_refresh", use_container_width=True):
-            st.cache_data.clear()
+            # Only order data is refreshed (market and portfolio caches stay warm)
+            invalidate_cache_scope("orders")
             st.rerun()
     
     with col2:
@@ -390,9 +464,9 @@ def show_trade_history():
         """, unsafe_allow_html=True)
         return
     
-    # Get order history (all statuses) and transaction history (executed amount > 0)
-    with st.spinner("Loading actual transaction history..."):
-        orders_df, transactions_df = get_user_orders(upbit_trade)
+    # Get transaction history (executed amount > 0), reused per data version
+    tx_base, data_version = load_transactions_view(upbit_trade)
+    transactions_df = tx_base['transactions']
 
     # Header change: Display transaction history
     st.subheader("💰 Transaction History")
@@ -408,68 +482,45 @@ def show_trade_history():
     col1, col2 = st.columns(2) # Restored to 2 columns
 
     with col1:
-        # Coin filter (based on transactions_df)
-        coin_options = ["All"]
-        if not transactions_df.empty and "Coin" in transactions_df.columns:
-            coin_options.extend(sorted(transactions_df["Coin"].unique()))
         # Key recovery: order_coin_filter -> tx_coin_filter
-        tx_coin = st.selectbox("Coin", options=coin_options, key="tx_coin_filter")
+        tx_coin = st.selectbox("Coin", options=tx_base['coin_options'], key="tx_coin_filter")
 
     with col2:
-        # Type filter (Buy/Sell) (based on transactions_df)
-        type_options = ["All"]
-        if not transactions_df.empty and "Type" in transactions_df.columns:
-            type_options.extend(sorted(transactions_df["Type"].unique()))
         # Key recovery: order_type_filter -> tx_type_filter
-        tx_type = st.selectbox("Type", options=type_options, key="tx_type_filter")
+        tx_type = st.selectbox("Type", options=tx_base['type_options'], key="tx_type_filter")
 
-    # Apply filtering (target: transactions_df)
-    filtered_tx = transactions_df.copy()
-    if tx_coin != "All" and "Coin" in filtered_tx.columns:
-        filtered_tx = filtered_tx[filtered_tx["Coin"] == tx_coin]
-    if tx_type != "All" and "Type" in filtered_tx.columns:
-        filtered_tx = filtered_tx[filtered_tx["Type"] == tx_type]
+    # Apply filtering (filtered frame and statistics are rebuilt only when data or filters change)
+    tx_view = get_versioned_view(
+        f"tx_filtered:{tx_coin}:{tx_type}",
+        data_version,
+        lambda: build_filtered_transactions(transactions_df, tx_coin, tx_type)
+    )
+    filtered_tx = tx_view['filtered']
 
     if filtered_tx.empty:
         st.info("No transaction history matching the filter criteria.")
     else:
-        # Pagination (variable name recovery: orders -> tx)
+        # Only the visible window is formatted and rendered
         tx_per_page = 10 if display_mode == "Table" else 5
-        if 'tx_page' not in st.session_state: # Key recovery
-            st.session_state.tx_page = 0
-        total_pages = max(1, (len(filtered_tx) + tx_per_page - 1) // tx_per_page)
-        if st.session_state.tx_page >= total_pages:
-            st.session_state.tx_page = 0
-        start_idx = st.session_state.tx_page * tx_per_page
-        end_idx = min(start_idx + tx_per_page, len(filtered_tx))
-        page_tx = filtered_tx.iloc[start_idx:end_idx]
+        paging_caption = f"Total {len(filtered_tx)} transactions"
 
         if display_mode == "Table":
-            # Restore table columns (focused on transaction info)
-            display_columns = ["Execution Time", "Coin", "Type", "Trade Volume", "Trade Price", "Trade Amount", "Fee", "Order Time"]
-            formatted_tx = page_tx.copy()
-
-            # Data formatting (based on transaction info)
-            if "Trade Price" in formatted_tx.columns: formatted_tx["Trade Price"] = formatted_tx["Trade Price"].apply(lambda x: f"{x:,.0f} KRW")
-            if "Trade Amount" in formatted_tx.columns: formatted_tx["Trade Amount"] = formatted_tx["Trade Amount"].apply(lambda x: f"{x:,.0f} KRW")
-            if "Fee" in formatted_tx.columns: formatted_tx["Fee"] = formatted_tx["Fee"].apply(lambda x: f"{x:,.4f} KRW")
-            if "Trade Volume" in formatted_tx.columns: formatted_tx["Trade Volume"] = formatted_tx["Trade Volume"].apply(lambda x: f"{x:.8f}")
-
-            # Styling (type)
-            def highlight_tx_type(s):
-                if s == "Buy": return 'background-color: rgba(255, 0, 0, 0.1); color: darkred; font-weight: bold'
-                else: return 'background-color: rgba(0, 0, 255, 0.1); color: darkblue; font-weight: bold'
-
-            st.dataframe(
-                formatted_tx[display_columns].style
-                .applymap(highlight_tx_type, subset=["Type"]),
-                use_container_width=True,
-                height=400
+            windowed_dataframe(
+                filtered_tx,
+                items_per_page=tx_per_page,
+                key_prefix="tx",
+                format_page=format_transactions_page,
+                style_page=lambda page_df: page_df.style.applymap(highlight_tx_type, subset=["Type"]),
+                height=400,
+                caption=paging_caption
             )
 
         else: # Card format
+            start_idx, end_idx, total_pages = get_page_window(len(filtered_tx), tx_per_page, "tx")
+            page_records = filtered_tx.iloc[start_idx:end_idx].to_dict('records')
+
             st.markdown('<div class="trade-cards-container">', unsafe_allow_html=True)
-            for idx, (_, tx) in enumerate(page_tx.iterrows()):
+            for idx, tx in enumerate(page_records):
                 # Determine text and color based on type
                 if tx["Type"] == "Buy":
                     tx_type_text = "Bought"
@@ -512,32 +563,18 @@ def show_trade_history():
                 st.markdown(tx_card, unsafe_allow_html=True)
             st.markdown('</div>', unsafe_allow_html=True)
 
-        # Pagination controls (key recovery: tx_page)
-        if total_pages > 1:
-            col1, col2, col3 = st.columns([1, 4, 1])
-            with col1:
-                if st.button("◀️ Previous", key="prev_tx", disabled=st.session_state.tx_page <= 0):
-                    st.session_state.tx_page -= 1
-                    st.rerun()
-            with col2:
-                paging_info = f"<div style='text-align:center'>Page {st.session_state.tx_page + 1} / {total_pages} (Total {len(filtered_tx)} transactions)</div>"
-                st.markdown(paging_info, unsafe_allow_html=True)
-            with col3:
-                if st.button("Next ▶️", key="next_tx", disabled=st.session_state.tx_page >= total_pages - 1):
-                    st.session_state.tx_page += 1
-                    st.rerun()
-
-    # Restore transaction history statistics section
+            # Pagination controls (key recovery: tx_page)
+            render_pagination_controls(total_pages, "tx", paging_caption)
+
+    # Restore transaction history statistics section (precomputed with the filtered view)
     with st.expander("📊 Transaction History Statistics"):
          if not filtered_tx.empty:
-             # Recover statistics calculation and display logic (based on transactions_df)
-             coin_totals = filtered_tx.groupby("Coin")["Trade Amount"].sum().reset_index()
              st.markdown("##### Total Trading Amount by Coin")
-             for _, row in coin_totals.iterrows():
+             for row in tx_view['coin_totals']:
                  st.markdown(f"**{row['Coin']}**: {row['Trade Amount']:.0f} KRW")
 
-             buy_count = len(filtered_tx[filtered_tx["Type"] == "Buy"])
-             sell_count = len(filtered_tx[filtered_tx["Type"] == "Sell"])
+             buy_count = tx_view['buy_count']
+             sell_count = tx_view['sell_count']
              if (buy_count + sell_count) > 0:
                  st.markdown("##### Buy/Sell Ratio")
                  st.markdown(f"Buy: {buy_count} transactions ({buy_count/(buy_count+sell_count)*100:.1f}%)")
@@ -545,7 +582,6 @@ def show_trade_history():
              else:
                  st.markdown("##### Buy/Sell Ratio: No information")
 
-             total_fee = filtered_tx["Fee"].sum()
-             st.markdown(f"##### Total Fees Paid: {total_fee:.4f}")
+             st.markdown(f"##### Total Fees Paid: {tx_view['total_fee']:.4f}")
          else:
              st.info("No statistics information to display.")
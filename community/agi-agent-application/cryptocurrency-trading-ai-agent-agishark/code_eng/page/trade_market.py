@@ -10,9 +10,11 @@ import sys
 sys.path.append("tools/upbit")
 from UPBIT import Trade
 from page.api_setting import check_api_keys, get_upbit_trade_instance, get_upbit_instance
+from util.cache_utils import tracked_cache_data, invalidate_cache_scope
+from util.chart_utils import CHART_RANGES, MAX_CHART_POINTS, select_interval, downsample_ohlcv
 import random
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
+@tracked_cache_data(ttl=300, scope="market")  # Cache for 5 minutes
 def get_market_info():
     """Get all cryptocurrency market information"""
     try:
@@ -98,7 +100,7 @@ def generate_sample_market_data():
     ]
     return pd.DataFrame(sample_data)
 
-@st.cache_data(ttl=600)  # Cache for 10 minutes
+@tracked_cache_data(ttl=600, scope="market")  # Cache for 10 minutes
 def get_coin_chart_data(coin_ticker: str, interval: str = "minute60", count: int = 168):
     """Get chart data for a coin"""
     try:
@@ -173,6 +175,9 @@ def draw_price_chart(df: pd.DataFrame, coin_name: str):
         return
         
     try:
+        # Aggregate candles so only a bounded number of points is sent to the browser
+        df, _ = downsample_ohlcv(df, MAX_CHART_POINTS)
+        
         fig = go.Figure()
         
         # Candlestick chart
@@ -229,7 +234,7 @@ def execute_order(upbit, coin_ticker, trade_type, amount, amount_type, current_p
         st.error(f"Error executing order: {str(e)}")
         return None
 
-@st.cache_data(ttl=60)  # 1 minute cache
+@tracked_cache_data(ttl=60, scope="orders")  # 1 minute cache
 def get_order_history():
     try:
         upbit = get_upbit_instance()
@@ -314,7 +319,7 @@ def get_order_history():
         st.error(f"Error retrieving order history: {str(e)}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=60)  # 1 minute caching
+@tracked_cache_data(ttl=60, scope="market")  # 1 minute caching
 def get_important_coins() -> pd.DataFrame:
     """Get current information for major and noteworthy coins."""
     try:
@@ -389,19 +394,32 @@ def get_important_coins() -> pd.DataFrame:
         st.error(f"Error loading coin information: {str(e)}")
         return generate_sample_market_data()
 
-def draw_candle_chart(data, coin_name, interval):
-    """Draw candle chart"""
+def draw_candle_chart(data, coin_name, interval, max_points=MAX_CHART_POINTS):
+    """Draw candle chart (downsampled to at most max_points candles)"""
     if data is None or data.empty:
         st.error(f"Failed to load chart data for {coin_name}.")
         return
     
     # Set chart title
     interval_name = {
+        "minute1": "1-Minute",
+        "minute3": "3-Minute",
+        "minute5": "5-Minute",
+        "minute10": "10-Minute",
+        "minute15": "15-Minute",
+        "minute30": "30-Minute",
+        "minute60": "Hourly",
+        "minute240": "4-Hour",
         "day": "Daily",
         "week": "Weekly",
         "month": "Monthly"
     }.get(interval, "")
     
+    # Aggregate candles into OHLC buckets (price extremes are preserved)
+    data, bucket_size = downsample_ohlcv(data, max_points)
+    if bucket_size > 1:
+        interval_name = f"{interval_name} ×{bucket_size}"
+    
     fig = go.Figure(data=[go.Candlestick(
         x=data.index,
         open=data['open'],
@@ -504,31 +522,19 @@ def show_coin_details(_upbit_trade, coin_ticker: str):
             unsafe_allow_html=True
         )
         
-        # Chart period selection
-        chart_interval = st.radio(
-            "Chart Period",
-            options=["Daily", "Weekly", "Monthly"],
+        # Chart range selection (each zoom level fetches the finest interval within the candle limit)
+        chart_range = st.radio(
+            "Chart Range",
+            options=list(CHART_RANGES.keys()),
+            index=2,
             horizontal=True,
-            key=f"{coin_name}_chart_interval"
+            key=f"{coin_name}_chart_range"
         )
         
-        # Get chart data based on selected period
-        interval_map = {
-            "Daily": "day",
-            "Weekly": "week",
-            "Monthly": "month"
-        }
-        
-        interval = interval_map.get(chart_interval, "day")
+        interval, count = select_interval(CHART_RANGES.get(chart_range, CHART_RANGES["1 Month"]))
         
-        try:
-            chart_data = pyupbit.get_ohlcv(coin_ticker, interval=interval, count=30)
-            if chart_data is None or chart_data.empty:
-                # Generate sample chart data if no data is available
-                chart_data = generate_sample_chart_data(coin_ticker, interval)
-        except Exception as e:
-            # Use sample data if API call fails
-            chart_data = generate_sample_chart_data(coin_ticker, interval)
+        # Cached per (ticker, interval, count), falls back to sample data on failure
+        chart_data = get_coin_chart_data(coin_ticker, interval, count)
         
         # Draw chart
         draw_candle_chart(chart_data, coin_name, interval)
@@ -629,7 +635,8 @@ def show_trade_market():
     
     # Refresh button
     if st.button("🔄 Refresh", key="market_refresh"):
-        st.cache_data.clear()
+        # Only market data is refreshed (portfolio and order caches stay warm)
+        invalidate_cache_scope("market")
         st.rerun()
     
     # Get coin information
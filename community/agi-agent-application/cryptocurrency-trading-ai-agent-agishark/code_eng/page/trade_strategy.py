@@ -5,7 +5,9 @@ from PIL import Image
 import io
 import base64
 from tools.rag.document_processor import process_uploaded_file
-from tools.rag.rag import delete_from_vector_store, async_process
+from tools.rag.ingestion_queue import get_ingestion_status, retry_failed_jobs
+from tools.rag.rag import delete_from_vector_store, async_process, stream_synthesized_response
+from tools.rag.hybrid_search import hybrid_search
 
 def get_pdf_display(pdf_path):
     """Convert the first page of a PDF file to an image"""
@@ -44,7 +46,7 @@ def delete_pdf(file_path, storage_dir):
         # If RAG storage, also delete from vector store
         if storage_dir == "tools/web2pdf/rag_doc_storage" and 'vector_store_id' in st.session_state:
             # Delete from vector store
-            async_process(delete_from_vector_store, file_name)
+            async_process(delete_from_vector_store, file_name, vector_store_id=st.session_state.vector_store_id)
             print(f"Started request to delete '{file_name}' from vector store")
         
         return True
@@ -112,6 +114,62 @@ def display_pdf_section(title, storage_dir):
                     if delete_pdf(pdf_path, storage_dir):
                         st.rerun()
 
+def show_ingestion_status():
+    """Display RAG document ingestion progress"""
+    status = get_ingestion_status()
+    if not status['total']:
+        return
+    
+    counts = status['counts']
+    completed = counts.get('done', 0) + counts.get('skipped', 0)
+    failed = counts.get('failed', 0)
+    
+    with st.expander(f"📥 Document Ingestion ({completed}/{status['total']} completed, {status['active']} in progress, {failed} failed)", expanded=status['active'] > 0):
+        st.progress((completed + failed) / status['total'])
+        
+        status_labels = {
+            "queued": "⏳ Queued",
+            "waiting_parse": "⏳ Waiting to parse",
+            "parsing": "📄 Parsing",
+            "waiting_upload": "⏳ Waiting to upload",
+            "uploading": "⬆️ Uploading",
+            "retrying": "🔁 Retrying",
+            "done": "✅ Done",
+            "skipped": "✅ Unchanged",
+            "failed": "❌ Failed"
+        }
+        for job in status['jobs'][:20]:
+            line = f"{status_labels.get(job['status'], job['status'])} **{job['file_name']}**"
+            if job['attempts'] > 1:
+                line += f" (attempt {job['attempts']})"
+            if job['error'] and job['status'] in ("retrying", "failed"):
+                line += f" - {job['error'][:100]}"
+            st.markdown(line)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🔄 Refresh Status", key="ingestion_refresh", use_container_width=True):
+                st.rerun()
+        with col2:
+            if failed and st.button("🔁 Retry Failed", key="ingestion_retry", use_container_width=True):
+                retry_failed_jobs()
+                st.rerun()
+
+def show_document_question():
+    """Answer a question from the RAG documents (answer is streamed as it is generated)"""
+    with st.expander("💬 Ask Your Documents", expanded=False):
+        question = st.text_input("Question", key="rag_question", placeholder="e.g. What is the BTC outlook for this quarter?")
+        if st.button("Ask", key="rag_ask") and question:
+            with st.spinner("Searching documents..."):
+                results = hybrid_search(question, 5)
+            
+            if not results:
+                st.info("No related content was found in the RAG documents.")
+                return
+            
+            st.write_stream(stream_synthesized_response(question, results))
+            st.caption("Sources: " + ", ".join(dict.fromkeys(result['filename'] for result in results)))
+
 def show_trade_strategy():
     st.title("✨ AI Investment Strategy")
     
@@ -125,6 +183,13 @@ def show_trade_strategy():
     if not st.session_state.get('openai_key'):
         st.warning("OpenAI API key is not set. To use the RAG document processing feature, please enter your key in the API Settings tab.")
     
+    # RAG ingestion progress
+    show_ingestion_status()
+    
+    # Question answering over RAG documents
+    if st.session_state.get('vector_store_id'):
+        show_document_question()
+    
     # Split into two columns
     col1, col2 = st.columns(2)
     
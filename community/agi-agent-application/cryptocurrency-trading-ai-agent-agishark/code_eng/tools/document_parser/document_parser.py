@@ -1,17 +1,67 @@
 import requests
 import streamlit as st
 import os
-from typing import List, Dict, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterator, Tuple
+from requests.adapters import HTTPAdapter
+from tools.document_parser.parse_cache import get_or_parse
+from tools.document_parser.pdf_sharding import SHARD_PAGE_THRESHOLD, get_pdf_page_count, split_pdf_pages, merge_parse_responses
+from util.circuit_breaker import get_breaker, classify_error, backoff_delay, CircuitOpenError, RETRYABLE_ERRORS
+
+# Maximum Document Parse requests in flight per process
+MAX_PARSE_WORKERS = 4
+
+# Maximum shard requests in flight per process (shards of large PDFs are parsed concurrently)
+MAX_SHARD_WORKERS = 4
+
+# Retries per document for rate limit and transient errors
+PARSE_RETRIES = 3
+
+# Upper bound of a Retry-After wait in seconds
+MAX_RETRY_AFTER = 30
+
+# Timeout of one parse request in seconds
+PARSE_REQUEST_TIMEOUT = 300
 
 # Global variables
 _UPSTAGE_API_KEY = None
 
+# Shared HTTP session (connection pool sized to the worker count) and worker pools
+# (shards run on their own pool so documents waiting for their shards cannot starve them)
+_HTTP_SESSION = None
+_HTTP_SESSION_LOCK = threading.Lock()
+_PARSE_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_PARSE_WORKERS, thread_name_prefix="document-parse")
+_SHARD_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_SHARD_WORKERS, thread_name_prefix="document-parse-shard")
+
 def update_upstage_api_key():
     """Update global Upstage API key"""
     global _UPSTAGE_API_KEY
     _UPSTAGE_API_KEY = st.session_state.get('upstage_api_key', '')
     print(f"Upstage API key updated: {'set' if _UPSTAGE_API_KEY else 'not set'}")
 
+def get_http_session() -> requests.Session:
+    """Returns the pooled HTTP session used for Document Parse requests"""
+    global _HTTP_SESSION
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_PARSE_WORKERS + MAX_SHARD_WORKERS)
+            session.mount("https://", adapter)
+            _HTTP_SESSION = session
+        return _HTTP_SESSION
+
+def _retry_after_seconds(error) -> float:
+    """Retry-After header of a rate limited response (0 if absent)"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return 0.0
+    try:
+        return min(float(response.headers.get('Retry-After', 0)), MAX_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return 0.0
+
 class DocumentParser:
     def __init__(self, api_key=None):
         # API key priority: constructor parameter > global variable > session state
@@ -22,16 +72,28 @@ class DocumentParser:
     def __call__(self, file_names: List[str]) -> Dict[str, Any]:
         """Tool interface required for agents library"""
         return self.parse_document(file_names)
-        
-    def parse_document(self, file_names: List[str]) -> Dict[str, Any]:
+    
+    def _request_data(self, output_formats: str = "['text']") -> Dict[str, Any]:
+        """Form fields of a Document Parse request"""
+        return {
+            "ocr": "force",
+            "coordinates": True,
+            "chart_recognition": True,
+            "output_formats": output_formats,
+            "base64_encoding": "['table']",
+            "model": "document-parse"
+        }
+    
+    def parse_file_content(self, file_content: bytes, file_name: str) -> Dict[str, Any]:
         """
-        Method for parsing documents - processes a list of file names
+        Parse one document from memory and keep the layout elements
         
         Args:
-            file_names: List of PDF file names to parse (without extension)
+            file_content: Document binary data
+            file_name: File name (sent to the API)
             
         Returns:
-            Dict: Dictionary containing parsing results
+            Dict: {'success', 'text', 'elements', 'metadata'} or {'success': False, 'error'}
         """
         if not self.api_key:
             return {
@@ -39,19 +101,327 @@ class DocumentParser:
                 'error': 'Upstage API key is not set. Please enter the API key in the API settings tab.'
             }
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}"
+        try:
+            result = self._post_document(file_name, file_content, "['text', 'markdown']")
+        except CircuitOpenError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        except requests.exceptions.RequestException as e:
+            return {
+                'success': False,
+                'error': f'API request error: {str(e)}'
+            }
+        
+        if 'content' not in result or 'text' not in result['content']:
+            return {
+                'success': False,
+                'error': 'Document parsing result is not in the expected format.'
+            }
+        
+        return {
+            'success': True,
+            'text': result['content']['text'],
+            'elements': result.get('elements', []),
+            'metadata': {
+                'file_name': file_name,
+                'pages': result.get('usage', {}).get('pages', 0),
+                'parse_time': result.get('parse_time', 0)
+            }
         }
         
-        data = {
-            "ocr": "force",
-            "coordinates": True,
-            "chart_recognition": True,
-            "output_formats": "['text']",
-            "base64_encoding": "['table']",
-            "model": "document-parse"
+    def _post_document(self, file_name: str, document, output_formats: str = "['text']") -> Dict[str, Any]:
+        """
+        Parse one document, reusing the cached response of identical bytes and options
+        
+        Args:
+            file_name: File name (sent to the API)
+            document: Document binary data or a binary file object
+            output_formats: Requested output formats
+            
+        Returns:
+            Dict: Parse API response
+        """
+        options = {'url': self.url, **self._request_data(output_formats)}
+        return get_or_parse(document, options, lambda: self._parse_sharded(file_name, document, output_formats))
+    
+    def _parse_sharded(self, file_name: str, document, output_formats: str = "['text']") -> Dict[str, Any]:
+        """
+        Parse a document, splitting PDFs longer than SHARD_PAGE_THRESHOLD pages into page ranges
+        that are parsed concurrently and merged back in page order
+        
+        Args:
+            file_name: File name (sent to the API)
+            document: Document binary data or a binary file object
+            output_formats: Requested output formats
+            
+        Returns:
+            Dict: Parse API response (merged response for sharded PDFs)
+        """
+        if hasattr(document, 'read'):
+            document.seek(0)
+            document_bytes = document.read()
+            document.seek(0)
+        else:
+            document_bytes = document
+        
+        page_count = get_pdf_page_count(document_bytes)
+        if not page_count or page_count <= SHARD_PAGE_THRESHOLD:
+            return self._request_document(file_name, document, output_formats)
+        
+        start_time = time.time()
+        shards = split_pdf_pages(document_bytes)
+        stem = os.path.splitext(file_name)[0]
+        futures = {
+            _SHARD_EXECUTOR.submit(
+                self._request_document, f"{stem}_p{page_offset + 1}.pdf", shard_bytes, output_formats
+            ): page_offset
+            for page_offset, shard_bytes in shards
+        }
+        # A failed shard fails the whole document (a partial merge would be cached as complete)
+        shard_responses = [(futures[future], future.result()) for future in as_completed(futures)]
+        print(f"Parsed '{file_name}' ({page_count} pages) in {len(shards)} shards in {time.time() - start_time:.2f} seconds")
+        return merge_parse_responses(shard_responses)
+    
+    def _request_document(self, file_name: str, document, output_formats: str = "['text']") -> Dict[str, Any]:
+        """
+        Send one document to Document Parse over the pooled session.
+        Rate limits (Retry-After honored), timeouts and server errors are retried with backoff,
+        and calls fail fast while the Upstage circuit breaker is open.
+        
+        Args:
+            file_name: File name (sent to the API)
+            document: Document binary data or a binary file object
+            output_formats: Requested output formats
+            
+        Returns:
+            Dict: Parse API response
+        """
+        breaker = get_breaker("upstage")
+        for attempt in range(PARSE_RETRIES + 1):
+            if not breaker.allow_request():
+                raise CircuitOpenError("upstage", breaker.retry_after())
+            
+            if hasattr(document, 'seek'):
+                document.seek(0)
+            try:
+                response = get_http_session().post(
+                    self.url,
+                    headers={"Authorization": f"Bearer {self.api_key}"},
+                    files={"document": (file_name, document)},
+                    data=self._request_data(output_formats),
+                    timeout=PARSE_REQUEST_TIMEOUT
+                )
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                error_class = classify_error(e)
+                breaker.record_failure(error_class, str(e))
+                if error_class not in RETRYABLE_ERRORS or attempt >= PARSE_RETRIES:
+                    raise
+                delay = _retry_after_seconds(e) or backoff_delay(attempt, error_class)
+                print(f"Document Parse {error_class} error for '{file_name}', retry {attempt + 1}/{PARSE_RETRIES} in {delay:.2f} seconds")
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Ended without an outcome: free the half-open probe slot
+                breaker.release_probe()
+                raise
+            
+            breaker.record_success()
+            return response.json()
+    
+    def _parse_stored_file(self, file_name: str) -> Dict[str, Any]:
+        """Parse one file of the document storage (result shape of parse_document results)"""
+        # Handle extension (.pdf) if it's already there
+        if not file_name.lower().endswith('.pdf'):
+            file_path = os.path.join(self.base_path, f"{file_name}.pdf")
+        else:
+            file_path = os.path.join(self.base_path, file_name)
+        
+        # Check if file exists
+        if not os.path.exists(file_path):
+            return {
+                'success': False,
+                'error': f'File not found: {file_path}',
+                'file_name': file_name
+            }
+        
+        try:
+            # The cache key is hashed in blocks, but PDF page counting (and sharding of long PDFs)
+            # reads the whole file into memory; only the upload of an unsharded document streams from disk
+            with open(file_path, 'rb') as f:
+                result = self._post_document(os.path.basename(file_path), f)
+        except CircuitOpenError as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'file_name': file_name
+            }
+        except requests.exceptions.RequestException as e:
+            return {
+                'success': False,
+                'error': f'API request error: {str(e)}',
+                'file_name': file_name
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'File reading error: {str(e)}',
+                'file_name': file_name
+            }
+        
+        if 'content' in result and 'text' in result['content']:
+            return {
+                'success': True,
+                'text': result['content']['text'],
+                'metadata': {
+                    'file_name': os.path.basename(file_path),
+                    'parse_time': result.get('parse_time', 0)
+                }
+            }
+        return {
+            'success': False,
+            'error': 'Document parsing result is not in the expected format.',
+            'file_name': file_name
         }
+    
+    def iter_parse_documents(self, file_names: List[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Parse files concurrently on the shared worker pool and yield each result as soon as it finishes
+        
+        Args:
+            file_names: List of PDF file names to parse (without extension)
+            
+        Yields:
+            Tuple of (position in file_names, result dictionary)
+        """
+        futures = {
+            _PARSE_EXECUTOR.submit(self._parse_stored_file, file_name): index
+            for index, file_name in enumerate(file_names)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    
+    def parse_binary_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Parse one in-memory document (result shape of parse_binary_data results)"""
+        source_url = item.get('source_url', '')
+        file_name = item.get('file_name') or 'document.pdf'
+        pdf_binary = item.get('pdf_binary')
+        if not pdf_binary:
+            return {
+                'success': False,
+                'error': 'No PDF binary data.',
+                'source_url': source_url,
+                'file_name': file_name
+            }
+        
+        try:
+            # The bytes are sent as the multipart document stream (no temporary file)
+            result = self._post_document(file_name, pdf_binary)
+        except CircuitOpenError as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'source_url': source_url,
+                'file_name': file_name
+            }
+        except requests.exceptions.RequestException as e:
+            return {
+                'success': False,
+                'error': f'API request error: {str(e)}',
+                'source_url': source_url,
+                'file_name': file_name
+            }
+        except Exception as e:
+            # Corrupt PDFs (page count) or non-JSON responses fail only this item, not the whole batch
+            return {
+                'success': False,
+                'error': f'Document parsing error: {str(e)}',
+                'source_url': source_url,
+                'file_name': file_name
+            }
 
+        if 'content' in result and 'text' in result['content']:
+            return {
+                'success': True,
+                'text': result['content']['text'],
+                'metadata': {
+                    'file_name': file_name,
+                    'source_url': source_url,
+                    'pages': result.get('usage', {}).get('pages', 0),
+                    'parse_time': result.get('parse_time', 0)
+                }
+            }
+        return {
+            'success': False,
+            'error': 'Document parsing result is not in the expected format.',
+            'source_url': source_url,
+            'file_name': file_name
+        }
+    
+    def iter_parse_binary_data(self, pdf_binary_list: List[Dict[str, Any]]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Parse in-memory documents concurrently on the shared worker pool and yield each result as soon as it finishes
+        
+        Args:
+            pdf_binary_list: List of {'pdf_binary', 'file_name', 'source_url'} (results of get_webpage_as_pdf_binary)
+            
+        Yields:
+            Tuple of (position in pdf_binary_list, result dictionary)
+        """
+        futures = {
+            _PARSE_EXECUTOR.submit(self.parse_binary_item, item): index
+            for index, item in enumerate(pdf_binary_list)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    
+    def parse_binary_data(self, pdf_binary_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Method for parsing in-memory PDF data (e.g. rendered webpages) without intermediate files
+        
+        Args:
+            pdf_binary_list: List of {'pdf_binary', 'file_name', 'source_url'} (results of get_webpage_as_pdf_binary)
+            
+        Returns:
+            Dict: Dictionary containing parsing results (in the order of pdf_binary_list, source URL in metadata)
+        """
+        if not self.api_key:
+            return {
+                'success': False,
+                'error': 'Upstage API key is not set. Please enter the API key in the API settings tab.'
+            }
+        
+        start_time = time.time()
+        all_results = [None] * len(pdf_binary_list)
+        for index, result in self.iter_parse_binary_data(pdf_binary_list):
+            all_results[index] = result
+        print(f"Parsed {len(pdf_binary_list)} in-memory documents in {time.time() - start_time:.2f} seconds")
+        
+        return {
+            'success': True,
+            'results': all_results,
+            'count': len(all_results),
+            'successful_count': sum(1 for r in all_results if r.get('success', False))
+        }
+    
+    def parse_document(self, file_names: List[str]) -> Dict[str, Any]:
+        """
+        Method for parsing documents - processes a list of file names concurrently
+        
+        Args:
+            file_names: List of PDF file names to parse (without extension)
+            
+        Returns:
+            Dict: Dictionary containing parsing results (in the order of file_names)
+        """
+        if not self.api_key:
+            return {
+                'success': False,
+                'error': 'Upstage API key is not set. Please enter the API key in the API settings tab.'
+            }
+        
         # Convert input to list if it's not already
         if not isinstance(file_names, list):
             if isinstance(file_names, str):
@@ -61,72 +431,15 @@ class DocumentParser:
                     'success': False,
                     'error': 'Please provide a list of file names.'
                 }
-
-        all_results = []
-        for file_name in file_names:
-            # Skip if list contains None or empty string
-            if not file_name:
-                continue
-                
-            # Handle extension (.pdf) if it's already there
-            if not file_name.lower().endswith('.pdf'):
-                file_path = os.path.join(self.base_path, f"{file_name}.pdf")
-            else:
-                file_path = os.path.join(self.base_path, file_name)
-            
-            # Check if file exists
-            if not os.path.exists(file_path):
-                all_results.append({
-                    'success': False,
-                    'error': f'File not found: {file_path}',
-                    'file_name': file_name
-                })
-                continue
-            
-            # Read file
-            try:
-                with open(file_path, 'rb') as f:
-                    file_content = f.read()
-            except Exception as e:
-                all_results.append({
-                    'success': False,
-                    'error': f'File reading error: {str(e)}',
-                    'file_name': file_name
-                })
-                continue
-
-            # API request
-            files = {
-                "document": (os.path.basename(file_path), file_content)
-            }
-            
-            try:
-                response = requests.post(self.url, headers=headers, files=files, data=data)
-                response.raise_for_status()
-                
-                result = response.json()
-                if 'content' in result and 'text' in result['content']:
-                    all_results.append({
-                        'success': True,
-                        'text': result['content']['text'],
-                        'metadata': {
-                            'file_name': os.path.basename(file_path),
-                            'parse_time': result.get('parse_time', 0)
-                        }
-                    })
-                else:
-                    all_results.append({
-                        'success': False,
-                        'error': 'Document parsing result is not in the expected format.',
-                        'file_name': file_name
-                    })
-                    
-            except requests.exceptions.RequestException as e:
-                all_results.append({
-                    'success': False,
-                    'error': f'API request error: {str(e)}',
-                    'file_name': file_name
-                })
+        
+        # Skip if list contains None or empty string
+        file_names = [file_name for file_name in file_names if file_name]
+        
+        start_time = time.time()
+        all_results = [None] * len(file_names)
+        for index, result in self.iter_parse_documents(file_names):
+            all_results[index] = result
+        print(f"Parsed {len(file_names)} documents in {time.time() - start_time:.2f} seconds")
         
         return {
             'success': True,
@@ -0,0 +1,175 @@
+import os
+import gzip
+import json
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Union
+
+# Directory of cached Document Parse responses (gzip-compressed JSON, one file per key)
+PARSE_CACHE_DIR = os.environ.get("PARSE_CACHE_DIR", "data/parse_cache")
+
+# Total size of the cache directory before the least recently used entries are evicted
+MAX_PARSE_CACHE_BYTES = int(os.environ.get("PARSE_CACHE_MAX_BYTES", 500 * 1024 * 1024))
+
+_CACHE_LOCK = threading.Lock()
+_CACHE_SIZE = None
+
+# Process-wide counters
+_PARSE_CACHE_STATS = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+def compute_document_hash(document: Union[bytes, str, Any]) -> str:
+    """
+    SHA-256 of document bytes.
+
+    Args:
+        document: Binary data, file path or binary file object (read from the start, position restored)
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    if isinstance(document, (bytes, bytearray)):
+        digest.update(document)
+    elif isinstance(document, str):
+        with open(document, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    else:
+        document.seek(0)
+        for block in iter(lambda: document.read(1024 * 1024), b""):
+            digest.update(block)
+        document.seek(0)
+    return digest.hexdigest()
+
+def compute_cache_key(document, options: Dict) -> str:
+    """Cache key from document content and request options (ocr, output formats, coordinates, model, endpoint)"""
+    options_json = json.dumps(options, sort_keys=True, default=str)
+    return hashlib.sha256(f"{compute_document_hash(document)}:{options_json}".encode("utf-8")).hexdigest()
+
+def _entry_path(key: str) -> str:
+    return os.path.join(PARSE_CACHE_DIR, key[:2], f"{key}.json.gz")
+
+def _iter_entries():
+    """Yield (path, size, last access time) of every cache entry"""
+    if not os.path.isdir(PARSE_CACHE_DIR):
+        return
+    for directory, _, file_names in os.walk(PARSE_CACHE_DIR):
+        for file_name in file_names:
+            if file_name.endswith(".json.gz"):
+                path = os.path.join(directory, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+def _get_cache_size() -> int:
+    """Total cache size (scanned once, then tracked; caller holds the lock)"""
+    global _CACHE_SIZE
+    if _CACHE_SIZE is None:
+        _CACHE_SIZE = sum(size for _, size, _ in _iter_entries())
+    return _CACHE_SIZE
+
+def _evict(required_bytes: int):
+    """Remove least recently used entries until required_bytes fit (caller holds the lock)"""
+    global _CACHE_SIZE
+    if _get_cache_size() + required_bytes <= MAX_PARSE_CACHE_BYTES:
+        return
+    for path, size, _ in sorted(_iter_entries(), key=lambda entry: entry[2]):
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        _CACHE_SIZE -= size
+        _PARSE_CACHE_STATS['evictions'] += 1
+        if _CACHE_SIZE + required_bytes <= MAX_PARSE_CACHE_BYTES:
+            break
+
+def load_cached_response(key: str):
+    """Cached response or None (a hit refreshes the entry's access time)"""
+    path = _entry_path(key)
+    try:
+        with open(path, "rb") as f:
+            response = json.loads(gzip.decompress(f.read()).decode("utf-8"))
+        os.utime(path)
+        return response
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Parse cache read error ({key[:12]}): {str(e)}")
+        return None
+
+def store_response(key: str, response: Dict):
+    """Store a response compressed (atomic write, evicting old entries if the cache is full)"""
+    global _CACHE_SIZE
+    data = gzip.compress(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+    if len(data) > MAX_PARSE_CACHE_BYTES:
+        return
+
+    path = _entry_path(key)
+    with _CACHE_LOCK:
+        _evict(len(data))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temp_path, path)
+        _CACHE_SIZE = _get_cache_size() - previous_size + len(data)
+
+def get_or_parse(document, options: Dict, parse: Callable[[], Dict]) -> Dict:
+    """
+    Returns the cached Document Parse response of a document, or calls parse and caches its response.
+    Identical bytes with identical options are never sent to the API twice.
+
+    Args:
+        document: Binary data, file path or binary file object
+        options: Request options that affect the response (ocr, output_formats, coordinates, model, endpoint)
+        parse: Function performing the API request; returns the response JSON and raises on failure
+
+    Returns:
+        Parse API response
+    """
+    key = compute_cache_key(document, options)
+    cached_response = load_cached_response(key)
+    if cached_response is not None:
+        with _CACHE_LOCK:
+            _PARSE_CACHE_STATS['hits'] += 1
+        print(f"Parse cache hit: {key[:12]}")
+        return cached_response
+
+    with _CACHE_LOCK:
+        _PARSE_CACHE_STATS['misses'] += 1
+    response = parse()
+    try:
+        store_response(key, response)
+    except Exception as e:
+        print(f"Parse cache write error ({key[:12]}): {str(e)}")
+    return response
+
+def get_parse_cache_stats() -> Dict:
+    """
+    Returns parse cache statistics.
+
+    Returns:
+        Dictionary with hit/miss/eviction counts, entry count and size
+    """
+    with _CACHE_LOCK:
+        entries = list(_iter_entries())
+        return {
+            **_PARSE_CACHE_STATS,
+            'entries': len(entries),
+            'size_bytes': sum(size for _, size, _ in entries),
+            'max_bytes': MAX_PARSE_CACHE_BYTES
+        }
+
+def clear_parse_cache():
+    """Remove every cached response"""
+    global _CACHE_SIZE
+    with _CACHE_LOCK:
+        for path, _, _ in list(_iter_entries()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        _CACHE_SIZE = 0
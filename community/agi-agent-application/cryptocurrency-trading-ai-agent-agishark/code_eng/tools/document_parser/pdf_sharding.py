@@ -0,0 +1,75 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# PDFs with more pages than this are split into shards
+SHARD_PAGE_THRESHOLD = 30
+
+# Pages per shard
+PAGES_PER_SHARD = 20
+
+def get_pdf_page_count(document: bytes) -> Optional[int]:
+    """Page count of PDF bytes (None if the data is not a PDF or PyMuPDF is missing)"""
+    if fitz is None or not document.startswith(b"%PDF"):
+        return None
+    try:
+        with fitz.open(stream=document, filetype="pdf") as pdf:
+            return pdf.page_count
+    except Exception as e:
+        print(f"PDF page count error: {str(e)}")
+        return None
+
+def split_pdf_pages(document: bytes, pages_per_shard: int = PAGES_PER_SHARD) -> List[Tuple[int, bytes]]:
+    """
+    Split PDF bytes into page ranges.
+
+    Args:
+        document: PDF binary data
+        pages_per_shard: Pages per shard
+
+    Returns:
+        List of (page offset, shard PDF bytes) in page order
+    """
+    shards = []
+    with fitz.open(stream=document, filetype="pdf") as pdf:
+        for start_page in range(0, pdf.page_count, pages_per_shard):
+            end_page = min(start_page + pages_per_shard, pdf.page_count) - 1
+            with fitz.open() as shard:
+                shard.insert_pdf(pdf, from_page=start_page, to_page=end_page)
+                shards.append((start_page, shard.tobytes(garbage=3, deflate=True)))
+    return shards
+
+def merge_parse_responses(shard_responses: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Merge Document Parse responses of page shards into one response.
+    Element pages are shifted by the shard offset, element ids are renumbered in page order,
+    and content (text/html/markdown) is concatenated in shard order.
+
+    Args:
+        shard_responses: List of (page offset, shard response)
+
+    Returns:
+        Response in the shape of a single-request response
+    """
+    shard_responses = sorted(shard_responses, key=lambda item: item[0])
+    merged = {key: value for key, value in shard_responses[0][1].items() if key not in ('content', 'elements', 'usage')}
+    content = {}
+    elements = []
+    total_pages = 0
+
+    for page_offset, response in shard_responses:
+        for output_format, value in (response.get('content') or {}).items():
+            if value:
+                content[output_format] = f"{content[output_format]}\n{value}" if content.get(output_format) else value
+        for element in response.get('elements', []):
+            elements.append({**element, 'id': len(elements), 'page': element.get('page', 1) + page_offset})
+        total_pages += (response.get('usage') or {}).get('pages', 0)
+
+    merged['content'] = content
+    merged['elements'] = elements
+    merged['usage'] = {'pages': total_pages}
+    merged['shards'] = len(shard_responses)
+    return merged
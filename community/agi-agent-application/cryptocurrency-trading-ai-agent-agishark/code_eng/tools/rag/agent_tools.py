@@ -1,7 +1,8 @@
 import streamlit as st
 from typing import Dict, List, Any
 from agents import function_tool, RunContextWrapper
-from tools.rag.rag import search_vector_store, get_openai_client
+from tools.rag.rag import get_openai_client, use_local_backend
+from tools.rag.hybrid_search import hybrid_search
 
 @function_tool
 async def search_rag_documents(ctx: RunContextWrapper[Any], query: str, max_results: int = None) -> str:
@@ -22,9 +23,9 @@ async def search_rag_documents(ctx: RunContextWrapper[Any], query: str, max_resu
         print(error_msg)
         return error_msg
     
-    # Check OpenAI client
+    # Check OpenAI client (the local index can search without it)
     client = get_openai_client()
-    if not client:
+    if not client and not use_local_backend():
         error_msg = "OpenAI API key is not set, cannot perform search."
         print(error_msg)
         return error_msg
@@ -34,8 +35,8 @@ async def search_rag_documents(ctx: RunContextWrapper[Any], query: str, max_resu
         if max_results is None:
             max_results = 3
         
-        # Perform search in vector store
-        results = search_vector_store(query, max_results)
+        # Perform hybrid search (vector store + BM25 keyword index)
+        results = hybrid_search(query, max_results)
         
         if not results:
             return "No search results found."
@@ -43,7 +44,9 @@ async def search_rag_documents(ctx: RunContextWrapper[Any], query: str, max_resu
         # Format results
         formatted_results = "\n\n## Search Results\n\n"
         for i, result in enumerate(results, 1):
-            formatted_results += f"### Document {i}: {result['filename']} (Relevance: {result['score']:.2f})\n\n"
+            pages = result.get('metadata', {}).get('pages')
+            page_label = f", pages {pages[0]}-{pages[-1]}" if pages and len(pages) > 1 else f", page {pages[0]}" if pages else ""
+            formatted_results += f"### Document {i}: {result['filename']} (Relevance: {result['score']:.2f}{page_label})\n\n"
             formatted_results += f"{result['content']}\n\n"
         
         print(f"Returned {len(results)} search results")
@@ -1,7 +1,11 @@
 import os
 import streamlit as st
 from tools.document_parser.document_parser import DocumentParser
-from tools.rag.rag import upload_to_vector_store, upload_file_to_vector_store, async_process
+from tools.rag.rag import upload_to_vector_store, upload_file_to_vector_store, delete_vector_store_file, use_local_backend, reconcile_file_index, extract_pdf_text, upload_chunks_to_vector_store
+from tools.rag.lexical_index import get_lexical_index
+from tools.rag.layout_chunker import iter_layout_chunks
+from tools.rag.ingestion_queue import enqueue_ingestion, parse_slot, report_stage
+from tools.rag.ingestion_manifest import compute_file_hash, compute_options_key, plan_ingestion, record_ingestion, remove_entry, get_manifest_entry, get_manifest_entries, get_file_stat, is_unchanged
 
 # Global variables
 _UPSTAGE_API_KEY = None
@@ -12,8 +16,23 @@ def update_upstage_api_key():
     _UPSTAGE_API_KEY = st.session_state.get('upstage_api_key', '')
     print(f"Document processor - Upstage API key updated: {'set' if _UPSTAGE_API_KEY else 'none'}")
 
-def process_file(file_path: str, file_name: str = None, vector_store_id: str = None) -> dict:
-    """Process document file by parsing and uploading to vector store"""
+def index_lexical(file_id: str, file_name: str, text: str = None, file_path: str = None, elements: list = None) -> dict:
+    """Add a document to the BM25 keyword index (layout chunks if parse elements are given, text is extracted locally if not given)"""
+    try:
+        if elements:
+            get_lexical_index().add_chunks(file_id, file_name, iter_layout_chunks(elements))
+            return {'success': True}
+        if text is None:
+            text = extract_pdf_text(file_path)
+        get_lexical_index().add_document(file_id, file_name, text)
+        return {'success': True}
+    except Exception as e:
+        # A missing keyword index only reduces lexical recall, the upload itself succeeded
+        print(f"File '{file_name}' lexical indexing error: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+def process_file(file_path: str, file_name: str = None, vector_store_id: str = None, extra_attributes: dict = None) -> dict:
+    """Process document file by parsing and uploading to vector store (extra_attributes are stored with the file)"""
     if file_name is None:
         file_name = os.path.basename(file_path)
     
@@ -27,7 +46,8 @@ def process_file(file_path: str, file_name: str = None, vector_store_id: str = N
                 
                 # Parse document (directly pass API key)
                 parser = DocumentParser(api_key=_UPSTAGE_API_KEY)
-                parse_result = parser.parse_document(file_content, file_name)
+                with parse_slot():
+                    parse_result = parser.parse_file_content(file_content, file_name)
                 
                 if parse_result['success']:
                     # Output parsing results
@@ -35,25 +55,43 @@ def process_file(file_path: str, file_name: str = None, vector_store_id: str = N
                     print(f"Metadata: {parse_result['metadata']}")
                     print(f"Text content (first 100 chars): {parse_result['text'][:100]}...")
                     
-                    # Upload using text content if parsing successful
-                    upload_success = upload_to_vector_store(
-                        text_content=parse_result['text'],
-                        file_name=file_name,
-                        attributes={
-                            'source': 'rag_storage',
-                            'file_name': file_name,
-                            'original_path': file_path,
-                            'parse_method': 'upstage',
-                            'vector_store_id': vector_store_id
-                        },
-                        vector_store_id=vector_store_id
-                    )
+                    # Upload layout chunks (sections, whole tables, page metadata) if parsing successful
+                    # Upload limits apply per vector store file batch (see upload_batcher)
+                    report_stage("uploading")
+                    attributes = {
+                        'source': 'rag_storage',
+                        'file_name': file_name,
+                        'original_path': file_path,
+                        'parse_method': 'upstage',
+                        'options_key': get_ingestion_options_key(vector_store_id, parser='upstage'),
+                        'vector_store_id': vector_store_id,
+                        **(extra_attributes or {})
+                    }
+                    elements = parse_result.get('elements')
+                    if elements:
+                        # Chunks are generated as a stream while they are uploaded
+                        upload_success = upload_chunks_to_vector_store(
+                            iter_layout_chunks(elements),
+                            file_name,
+                            attributes,
+                            vector_store_id=vector_store_id
+                        )
+                    else:
+                        upload_success = upload_to_vector_store(
+                            text_content=parse_result['text'],
+                            file_name=file_name,
+                            attributes=attributes,
+                            vector_store_id=vector_store_id
+                        )
                     
                     if upload_success:
                         print(f"File '{file_name}' vector store upload successful (Upstage parsing)")
+                        index_lexical(upload_success, file_name, text=parse_result['text'], elements=elements)
                         return {
                             'success': True,
                             'vector_store_upload': True,
+                            'file_id': upload_success,
+                            'parse_method': 'upstage',
                             'text': parse_result['text'][:500] + "..." if len(parse_result['text']) > 500 else parse_result['text'],
                             'metadata': parse_result['metadata']
                         }
@@ -67,6 +105,8 @@ def process_file(file_path: str, file_name: str = None, vector_store_id: str = N
         # Direct file upload if Upstage parsing fails or API key is missing
         print(f"Starting direct file upload (without Upstage parsing)")
         try:
+            # Upload limits apply per vector store file batch (see upload_batcher)
+            report_stage("uploading")
             upload_result, error_message = upload_file_to_vector_store(
                 file_path=file_path,
                 file_name=file_name,
@@ -75,16 +115,21 @@ def process_file(file_path: str, file_name: str = None, vector_store_id: str = N
                     'file_name': file_name,
                     'original_path': file_path,
                     'parse_method': 'direct',
-                    'vector_store_id': vector_store_id
+                    'options_key': get_ingestion_options_key(vector_store_id, parser='direct'),
+                    'vector_store_id': vector_store_id,
+                    **(extra_attributes or {})
                 },
                 vector_store_id=vector_store_id
             )
             
             if upload_result:
                 print(f"File '{file_name}' direct upload to vector store successful")
+                index_lexical(upload_result, file_name, file_path=file_path)
                 return {
                     'success': True,
                     'vector_store_upload': True,
+                    'file_id': upload_result,
+                    'parse_method': 'direct',
                     'text': f"File '{file_name}' was directly uploaded to the vector store.",
                     'metadata': {
                         'file_name': file_name,
@@ -117,8 +162,64 @@ def process_file(file_path: str, file_name: str = None, vector_store_id: str = N
             'vector_store_upload': False
         }
 
+def get_ingestion_options_key(vector_store_id: str, parser: str = None) -> str:
+    """
+    Key of the options that affect ingestion results (a change re-ingests every file).
+    parser is the path that ran ('upstage' or 'direct'); it defaults to the one that would be tried.
+    """
+    return compute_options_key({
+        'parser': parser or ('upstage' if _UPSTAGE_API_KEY else 'direct'),
+        'backend': 'local' if use_local_backend() else 'openai',
+        'vector_store_id': vector_store_id or ''
+    })
+
+def ingest_file(file_path: str, file_name: str = None, vector_store_id: str = None,
+                content_hash: str = None, options_key: str = None) -> dict:
+    """
+    Ingest one file and record it in the manifest.
+    A previous version of the file is removed from the vector store once the new version is uploaded
+    (a failed re-ingestion keeps the previous version searchable).
+    """
+    if file_name is None:
+        file_name = os.path.basename(file_path)
+    # Stat before hashing so a write during ingestion is detected on the next sync
+    size_bytes, mtime = get_file_stat(file_path)
+    content_hash = content_hash or compute_file_hash(file_path)
+    options_key = options_key or get_ingestion_options_key(vector_store_id)
+    
+    previous_entry = get_manifest_entry(file_name)
+    if is_unchanged(previous_entry, content_hash, options_key):
+        # Same content already ingested (e.g. the uploader re-submits the file on rerun)
+        return {'success': True, 'skipped': True, 'file_id': previous_entry.get('file_id')}
+    
+    # Content hash and options are stored as attributes so the file index can be rebuilt from the vector store
+    # (process_file adds the options key of the path that actually ran)
+    result = process_file(file_path, file_name, vector_store_id=vector_store_id,
+                          extra_attributes={'content_hash': content_hash, 'requested_options_key': options_key})
+    
+    if result.get('success'):
+        record_ingestion(
+            file_name,
+            content_hash,
+            get_ingestion_options_key(vector_store_id, parser=result.get('parse_method')),
+            result.get('file_id'),
+            parse_method=result.get('parse_method'),
+            size_bytes=size_bytes,
+            mtime=mtime,
+            requested_options_key=options_key
+        )
+        previous_file_id = previous_entry.get('file_id') if previous_entry else None
+        if previous_file_id and previous_file_id != result.get('file_id'):
+            print(f"File '{file_name}' changed, removing previous version ({previous_file_id})")
+            delete_vector_store_file(previous_file_id, vector_store_id)
+    return result
+
 def process_all_rag_documents():
-    """Process all documents in RAG storage and upload to vector store"""
+    """
+    Synchronize documents in RAG storage with the vector store.
+    Only new or modified files are uploaded (size/mtime, then content hash manifest), and files
+    deleted from storage are removed from the vector store.
+    """
     rag_storage_path = "tools/web2pdf/rag_doc_storage"
     
     if not os.path.exists(rag_storage_path):
@@ -127,12 +228,6 @@ def process_all_rag_documents():
     
     pdf_files = [f for f in os.listdir(rag_storage_path) if f.endswith('.pdf')]
     
-    if not pdf_files:
-        print("No PDF files in RAG storage.")
-        return True
-    
-    print(f"Starting processing of {len(pdf_files)} PDF files from RAG storage")
-    
     # Save necessary values before session state is initialized in other files
     from tools.rag.rag import update_global_cache
     update_global_cache()
@@ -145,15 +240,38 @@ def process_all_rag_documents():
     except Exception as e:
         print(f"Session state access error (ignored): {str(e)}")
     
-    for pdf_file in pdf_files:
+    # Rebuild a missing file index from the vector store instead of re-uploading everything
+    if pdf_files and vector_store_id and not get_manifest_entries():
+        reconcile_file_index(vector_store_id)
+    
+    options_key = get_ingestion_options_key(vector_store_id)
+    to_ingest, unchanged, deleted = plan_ingestion(rag_storage_path, pdf_files, options_key)
+    print(f"RAG storage sync - New/modified: {len(to_ingest)}, Unchanged: {len(unchanged)}, Deleted: {len(deleted)}")
+    
+    # Remove files that no longer exist in storage
+    for file_name, entry in deleted:
+        if entry.get('file_id'):
+            delete_vector_store_file(entry['file_id'], vector_store_id)
+        remove_entry(file_name)
+    
+    # Build the keyword index of documents ingested before it existed (local text extraction only)
+    entries = get_manifest_entries()
+    lexical_index = get_lexical_index()
+    for pdf_file in unchanged:
+        file_id = entries[pdf_file].get('file_id')
+        if file_id and not lexical_index.has_file(file_id):
+            enqueue_ingestion(pdf_file, index_lexical, file_id, pdf_file, file_path=os.path.join(rag_storage_path, pdf_file))
+    
+    for pdf_file, content_hash in to_ingest:
         file_path = os.path.join(rag_storage_path, pdf_file)
-        # Process asynchronously while directly passing vector store ID
-        async_process(process_file, file_path, pdf_file, vector_store_id=vector_store_id)
+        # Queue on the bounded ingestion pool while directly passing vector store ID
+        enqueue_ingestion(pdf_file, ingest_file, file_path, pdf_file, vector_store_id=vector_store_id,
+                          content_hash=content_hash, options_key=options_key)
     
     return True
 
 def process_uploaded_file(file_path: str, file_name: str = None):
-    """Process uploaded file asynchronously"""
+    """Process uploaded file asynchronously (returns ingestion job ID)"""
     # Update global cache variables
     from tools.rag.rag import update_global_cache
     from tools.document_parser.document_parser import update_upstage_api_key
@@ -165,5 +283,5 @@ def process_uploaded_file(file_path: str, file_name: str = None):
     # Get vector store ID from session state
     vector_store_id = st.session_state.get('vector_store_id', '')
     
-    # Directly pass vector store ID
-    return async_process(process_file, file_path, file_name, vector_store_id=vector_store_id)
\ No newline at end of file
+    # Queue on the bounded ingestion pool (recorded in the ingestion manifest)
+    return enqueue_ingestion(file_name or os.path.basename(file_path), ingest_file, file_path, file_name, vector_store_id=vector_store_id)
\ No newline at end of file
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Optional
+from tools.rag.rag import search_vector_store, get_openai_client
+from tools.rag.lexical_index import get_lexical_index, tokenize
+
+# Reciprocal rank fusion constant (higher values flatten the rank contribution)
+RRF_K = 60
+
+# Share of word shingles two chunks of the same file must have in common (relative to the shorter
+# chunk) to count as the same passage (vector store and BM25 chunk the same document differently)
+DUPLICATE_OVERLAP = 0.5
+SHINGLE_SIZE = 3
+
+# Candidates fetched from each retriever per requested result
+CANDIDATE_MULTIPLIER = 3
+
+# Optional rerank stage: "none", "llm" (OpenAI chat model) or "cross_encoder" (sentence-transformers)
+RAG_RERANK = os.environ.get("RAG_RERANK", "none")
+
+# Seconds the rerank stage may take before the fused order is returned instead
+RERANK_LATENCY_BUDGET = 2.0
+
+# Model used for LLM reranking
+RERANK_MODEL = "gpt-4o-mini"
+
+# Cross-encoder model (loaded on first use if sentence-transformers is installed)
+CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:
+    CrossEncoder = None
+
+_RERANK_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-rerank")
+_CROSS_ENCODER = None
+
+def _shingles(text: str) -> set:
+    """Word shingles of a chunk (single words for chunks shorter than SHINGLE_SIZE)"""
+    tokens = tokenize(text)
+    if len(tokens) < SHINGLE_SIZE:
+        return {tuple(tokens)} if tokens else set()
+    return {tuple(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+def _same_passage(shingles: set, other_shingles: set) -> bool:
+    """Whether two chunks of the same file overlap by at least DUPLICATE_OVERLAP"""
+    if not shingles or not other_shingles:
+        return False
+    return len(shingles & other_shingles) / min(len(shingles), len(other_shingles)) >= DUPLICATE_OVERLAP
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], k: int = RRF_K) -> List[Dict]:
+    """
+    Fuse ranked result lists with reciprocal rank fusion (score = sum of 1 / (k + rank)).
+    Results of the same file whose text overlaps are one passage: across lists their scores add up,
+    within a list only the best ranked one is kept.
+
+    Args:
+        result_lists: Ranked result lists of the retrievers
+        k: RRF constant
+
+    Returns:
+        Fused results sorted by fused score (scores normalized to the best result)
+    """
+    fused = []
+    for list_index, results in enumerate(result_lists):
+        for rank, result in enumerate(results, 1):
+            file_key = result.get('file_id') or result.get('filename')
+            shingles = _shingles(result['content'])
+            match = next((entry for entry in fused
+                          if entry['file_key'] == file_key and _same_passage(entry['shingles'], shingles)), None)
+            if match is None:
+                fused.append({'file_key': file_key, 'shingles': shingles, 'lists': {list_index},
+                              'result': {**result, 'score': 1.0 / (k + rank)}})
+            elif list_index not in match['lists']:
+                match['lists'].add(list_index)
+                match['result']['score'] += 1.0 / (k + rank)
+            # else: overlapping chunk from the same retriever, already counted at a better rank
+
+    ranked = sorted((entry['result'] for entry in fused), key=lambda result: result['score'], reverse=True)
+    if ranked:
+        best_score = ranked[0]['score']
+        for result in ranked:
+            result['score'] = result['score'] / best_score
+    return ranked
+
+def _llm_rerank(client, query: str, candidates: List[Dict]) -> List[int]:
+    """Ask a small chat model to order the candidates by relevance (returns candidate indices)"""
+    passages = "\n\n".join(
+        f"[{index}] ({candidate['filename']}) {candidate['content'][:500]}"
+        for index, candidate in enumerate(candidates)
+    )
+    completion = client.chat.completions.create(
+        model=RERANK_MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": "Rank the passages by how well they answer the query. Respond with JSON: {\"ranking\": [passage numbers, most relevant first]}"
+            },
+            {
+                "role": "user",
+                "content": f"Query: {query}\n\nPassages:\n{passages}"
+            }
+        ],
+        response_format={"type": "json_object"},
+        timeout=RERANK_LATENCY_BUDGET
+    )
+    ranking = json.loads(completion.choices[0].message.content).get('ranking', [])
+    return [int(index) for index in ranking]
+
+def _cross_encoder_rerank(query: str, candidates: List[Dict]) -> List[int]:
+    """Score query/passage pairs with a local cross-encoder (returns candidate indices)"""
+    global _CROSS_ENCODER
+    if _CROSS_ENCODER is None:
+        _CROSS_ENCODER = CrossEncoder(CROSS_ENCODER_MODEL)
+    scores = _CROSS_ENCODER.predict([(query, candidate['content']) for candidate in candidates])
+    return sorted(range(len(candidates)), key=lambda index: scores[index], reverse=True)
+
+def rerank(query: str, candidates: List[Dict], max_results: int, method: str = None,
+           budget: float = RERANK_LATENCY_BUDGET) -> List[Dict]:
+    """
+    Rerank fused candidates within a latency budget.
+    If the reranker is unavailable, fails or exceeds the budget, the fused order is kept.
+
+    Args:
+        query: Search query
+        candidates: Fused candidates
+        max_results: Number of results to return
+        method: 'none', 'llm' or 'cross_encoder' (defaults to RAG_RERANK)
+        budget: Latency budget in seconds
+
+    Returns:
+        Top results
+    """
+    method = method or RAG_RERANK
+    if method == "none" or len(candidates) <= 1:
+        return candidates[:max_results]
+
+    if method == "llm":
+        # Client is created on the calling thread (session state is not available on worker threads)
+        client = get_openai_client()
+        if not client:
+            return candidates[:max_results]
+        future = _RERANK_EXECUTOR.submit(_llm_rerank, client, query, candidates)
+    elif method == "cross_encoder" and CrossEncoder is not None:
+        future = _RERANK_EXECUTOR.submit(_cross_encoder_rerank, query, candidates)
+    else:
+        print(f"Rerank method not available: {method}")
+        return candidates[:max_results]
+
+    start_time = time.time()
+    try:
+        order = future.result(timeout=budget)
+    except FutureTimeoutError:
+        print(f"Rerank exceeded latency budget ({budget} seconds), using fused order")
+        return candidates[:max_results]
+    except Exception as e:
+        print(f"Rerank error: {str(e)}")
+        return candidates[:max_results]
+
+    # Keep candidates the reranker left out after the ranked ones
+    seen = set()
+    reranked = []
+    for index in order + list(range(len(candidates))):
+        if 0 <= index < len(candidates) and index not in seen:
+            seen.add(index)
+            reranked.append(candidates[index])
+    print(f"Rerank completed: {method} ({time.time() - start_time:.2f} seconds)")
+    return reranked[:max_results]
+
+def hybrid_search(query: str, max_results: int = 5, rerank_method: Optional[str] = None) -> List[Dict]:
+    """
+    Hybrid retrieval: vector store search fused with local BM25 search (reciprocal rank fusion),
+    optionally reranked. The lexical path runs in-process without a network call.
+
+    Args:
+        query: Search query
+        max_results: Maximum number of results
+        rerank_method: 'none', 'llm' or 'cross_encoder' (defaults to RAG_RERANK)
+
+    Returns:
+        List of {'file_id', 'filename', 'score', 'content'} sorted by relevance
+    """
+    candidate_count = max_results * CANDIDATE_MULTIPLIER
+
+    vector_results = search_vector_store(query, candidate_count)
+    try:
+        lexical_results = get_lexical_index().search(query, candidate_count)
+    except Exception as e:
+        print(f"Lexical search error: {str(e)}")
+        lexical_results = []
+
+    print(f"Hybrid search - Vector: {len(vector_results)}, Lexical: {len(lexical_results)}")
+    fused_results = reciprocal_rank_fusion([vector_results, lexical_results])
+    return rerank(query, fused_results, max_results, rerank_method)
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# File path to store the ingestion manifest
+MANIFEST_FILE = "data/rag_manifest.json"
+
+_MANIFEST_LOCK = threading.Lock()
+
+def compute_file_hash(file_path: str) -> str:
+    """Compute SHA-256 hash of file content"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def compute_options_key(options: Dict) -> str:
+    """Compute a stable key for ingestion options (parser, backend, vector store)"""
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def _load_manifest() -> Dict:
+    """Load manifest from file (caller holds the lock)"""
+    try:
+        if os.path.exists(MANIFEST_FILE):
+            with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+                if isinstance(manifest.get('files'), dict):
+                    return manifest
+    except Exception as e:
+        print(f"Error loading ingestion manifest: {str(e)}")
+    return {'version': 1, 'files': {}}
+
+def _save_manifest(manifest: Dict):
+    """Save manifest atomically (caller holds the lock)"""
+    os.makedirs(os.path.dirname(MANIFEST_FILE), exist_ok=True)
+    temp_path = MANIFEST_FILE + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, MANIFEST_FILE)
+
+def get_manifest_entries() -> Dict[str, Dict]:
+    """Returns a copy of all manifest entries keyed by file name"""
+    with _MANIFEST_LOCK:
+        return dict(_load_manifest()['files'])
+
+def get_manifest_entry(file_name: str) -> Optional[Dict]:
+    """Returns the manifest entry of a file or None"""
+    with _MANIFEST_LOCK:
+        return _load_manifest()['files'].get(file_name)
+
+def get_file_id(file_name: str = None, content_hash: str = None) -> Optional[str]:
+    """
+    Look up the vector store file ID of a document (no API call).
+
+    Args:
+        file_name: File name (takes precedence)
+        content_hash: SHA-256 of the file content (e.g. for a renamed file)
+
+    Returns:
+        File ID or None if the document is not indexed
+    """
+    entries = get_manifest_entries()
+    if file_name and file_name in entries:
+        return entries[file_name].get('file_id')
+    if content_hash:
+        for entry in entries.values():
+            if entry.get('content_hash') == content_hash:
+                return entry.get('file_id')
+    return None
+
+def get_file_stat(file_path: str) -> Tuple[int, float]:
+    """Size and modification time of a file (a change triggers rehashing)"""
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime
+
+def record_ingestion(file_name: str, content_hash: str, options_key: str, file_id: Optional[str],
+                     parse_method: str = None, size_bytes: int = None, mtime: float = None,
+                     requested_options_key: str = None):
+    """
+    Record a successfully ingested file.
+
+    Args:
+        file_name: File name
+        content_hash: SHA-256 of the file content
+        options_key: Key of the ingestion path that actually ran
+        file_id: Vector store file ID
+        parse_method: 'upstage' or 'direct'
+        size_bytes: File size when it was hashed
+        mtime: File modification time when it was hashed
+        requested_options_key: Key of the options in effect (differs from options_key after a fallback)
+    """
+    with _MANIFEST_LOCK:
+        manifest = _load_manifest()
+        manifest['files'][file_name] = {
+            'content_hash': content_hash,
+            'options_key': options_key,
+            'requested_options_key': requested_options_key or options_key,
+            'file_id': file_id,
+            'parse_method': parse_method,
+            'size_bytes': size_bytes,
+            'mtime': mtime,
+            'ingested_at': time.time()
+        }
+        _save_manifest(manifest)
+
+def is_unchanged(entry: Optional[Dict], content_hash: str, options_key: str) -> bool:
+    """Whether a manifest entry covers this content under the current options (fallbacks included)"""
+    if not entry or entry.get('content_hash') != content_hash:
+        return False
+    return options_key in (entry.get('options_key'), entry.get('requested_options_key'))
+
+def remove_entry(file_name: str) -> Optional[Dict]:
+    """Remove the manifest entry of a file and return it"""
+    with _MANIFEST_LOCK:
+        manifest = _load_manifest()
+        entry = manifest['files'].pop(file_name, None)
+        if entry is not None:
+            _save_manifest(manifest)
+        return entry
+
+def replace_entries(entries: Dict[str, Dict]):
+    """Replace every manifest entry (used when the index is rebuilt from the vector store)"""
+    with _MANIFEST_LOCK:
+        manifest = _load_manifest()
+        manifest['files'] = entries
+        manifest['reconciled_at'] = time.time()
+        _save_manifest(manifest)
+
+def plan_ingestion(storage_path: str, file_names: List[str], options_key: str) -> Tuple[List[Tuple[str, str]], List[str], List[Tuple[str, Dict]]]:
+    """
+    Compare the storage directory with the manifest.
+    Files are only hashed when their size or modification time differs from the manifest.
+
+    Args:
+        storage_path: Directory containing the documents
+        file_names: Document file names in the directory
+        options_key: Key of the current ingestion options
+
+    Returns:
+        Tuple of (files to ingest as (file name, content hash), unchanged file names,
+        deleted files as (file name, manifest entry))
+    """
+    entries = get_manifest_entries()
+
+    to_ingest = []
+    unchanged = []
+    restamped = {}
+    for file_name in file_names:
+        entry = entries.get(file_name)
+        size_bytes, mtime = get_file_stat(os.path.join(storage_path, file_name))
+        if entry and entry.get('content_hash') and entry.get('size_bytes') == size_bytes and entry.get('mtime') == mtime:
+            content_hash = entry['content_hash']
+        else:
+            content_hash = compute_file_hash(os.path.join(storage_path, file_name))
+            if entry and entry.get('content_hash') == content_hash:
+                # Touched or copied without a content change: remember the new stat to skip hashing next time
+                restamped[file_name] = (size_bytes, mtime)
+        if is_unchanged(entry, content_hash, options_key):
+            unchanged.append(file_name)
+        else:
+            to_ingest.append((file_name, content_hash))
+
+    if restamped:
+        with _MANIFEST_LOCK:
+            manifest = _load_manifest()
+            for file_name, (size_bytes, mtime) in restamped.items():
+                if file_name in manifest['files']:
+                    manifest['files'][file_name].update(size_bytes=size_bytes, mtime=mtime)
+            _save_manifest(manifest)
+
+    present = set(file_names)
+    deleted = [(file_name, entry) for file_name, entry in entries.items() if file_name not in present]
+
+    return to_ingest, unchanged, deleted
@@ -0,0 +1,193 @@
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from util.circuit_breaker import backoff_delay
+
+# Fixed-size worker pool for document ingestion
+INGESTION_WORKERS = 4
+
+# Separate concurrency limits per upstream stage
+PARSE_CONCURRENCY = 2    # Upstage Document Parse
+UPLOAD_CONCURRENCY = 3   # OpenAI vector store upload
+
+# Attempts per document before it is marked as failed
+MAX_ATTEMPTS = 3
+
+# Finished jobs kept for the status view
+MAX_FINISHED_JOBS = 200
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=INGESTION_WORKERS, thread_name_prefix="rag-ingest")
+_PARSE_SLOTS = threading.BoundedSemaphore(PARSE_CONCURRENCY)
+_UPLOAD_SLOTS = threading.BoundedSemaphore(UPLOAD_CONCURRENCY)
+
+# Job registry: {job_id: job}
+_JOBS = {}
+_JOBS_LOCK = threading.Lock()
+
+# Job handled by the current worker thread (used to report the stage)
+_CURRENT_JOB = threading.local()
+
+# Jobs currently running on a worker (upload batches are sized to it)
+_RUNNING = {'count': 0}
+
+ACTIVE_STATUSES = ("queued", "waiting_parse", "parsing", "waiting_upload", "uploading", "retrying")
+
+def _set_status(job_id: str, status: str, **fields):
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id)
+        if job:
+            job['status'] = status
+            job['updated_at'] = time.time()
+            job.update(fields)
+
+def report_stage(status: str):
+    """Report the stage of the ingestion job handled by the current thread (no-op outside a job)"""
+    job_id = getattr(_CURRENT_JOB, 'job_id', None)
+    if job_id:
+        _set_status(job_id, status)
+
+@contextmanager
+def parse_slot():
+    """Limit concurrent document parse calls (reports the stage of the current job)"""
+    report_stage("waiting_parse")
+    with _PARSE_SLOTS:
+        report_stage("parsing")
+        yield
+
+@contextmanager
+def upload_slot():
+    """Limit concurrent vector store uploads (reports the stage of the current job)"""
+    report_stage("waiting_upload")
+    with _UPLOAD_SLOTS:
+        report_stage("uploading")
+        yield
+
+def _prune_finished_jobs():
+    """Drop the oldest finished jobs (caller holds the lock)"""
+    finished = [job for job in _JOBS.values() if job['status'] in ("done", "skipped", "failed")]
+    if len(finished) > MAX_FINISHED_JOBS:
+        finished.sort(key=lambda job: job['updated_at'])
+        for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+            del _JOBS[job['job_id']]
+
+def _run_job(job_id: str):
+    """Worker body: run the ingestion function and retry on failure with backoff"""
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id)
+        if not job:
+            return
+        job['attempts'] += 1
+        job['started_at'] = job['started_at'] or time.time()
+        attempt = job['attempts']
+        func, args, kwargs = job['func'], job['args'], job['kwargs']
+
+    _CURRENT_JOB.job_id = job_id
+    with _JOBS_LOCK:
+        _RUNNING['count'] += 1
+    try:
+        result = func(*args, **kwargs)
+        error = None if result and result.get('success') else (result or {}).get('error', 'Unknown error')
+    except Exception as e:
+        result = None
+        error = str(e)
+    finally:
+        _CURRENT_JOB.job_id = None
+        with _JOBS_LOCK:
+            _RUNNING['count'] -= 1
+
+    if error is None:
+        _set_status(job_id, "skipped" if result.get('skipped') else "done", finished_at=time.time(), error=None)
+        print(f"Ingestion finished: {job['file_name']} (attempt {attempt})")
+    elif attempt < MAX_ATTEMPTS:
+        delay = backoff_delay(attempt, "rate_limit" if "429" in error else None) + 1
+        _set_status(job_id, "retrying", error=error)
+        print(f"Ingestion failed: {job['file_name']} ({error}), retry in {delay:.1f} seconds")
+        # Resubmit after the delay without holding a worker
+        timer = threading.Timer(delay, lambda: _EXECUTOR.submit(_run_job, job_id))
+        timer.daemon = True
+        timer.start()
+    else:
+        _set_status(job_id, "failed", finished_at=time.time(), error=error)
+        print(f"Ingestion failed permanently: {job['file_name']} ({error})")
+
+    with _JOBS_LOCK:
+        _prune_finished_jobs()
+
+def get_running_job_count() -> int:
+    """Number of ingestion jobs currently running on a worker"""
+    with _JOBS_LOCK:
+        return _RUNNING['count']
+
+def enqueue_ingestion(file_name: str, func, *args, **kwargs) -> str:
+    """
+    Queue a document for ingestion on the bounded worker pool.
+    A file that is already queued or running is not queued twice.
+
+    Args:
+        file_name: File name (used for de-duplication and display)
+        func: Ingestion function returning a dict with 'success'
+        *args, **kwargs: Arguments of the ingestion function
+
+    Returns:
+        Job ID
+    """
+    with _JOBS_LOCK:
+        for job in _JOBS.values():
+            if job['file_name'] == file_name and job['status'] in ACTIVE_STATUSES:
+                return job['job_id']
+
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        _JOBS[job_id] = {
+            'job_id': job_id,
+            'file_name': file_name,
+            'status': "queued",
+            'attempts': 0,
+            'error': None,
+            'enqueued_at': now,
+            'started_at': None,
+            'finished_at': None,
+            'updated_at': now,
+            'func': func,
+            'args': args,
+            'kwargs': kwargs
+        }
+
+    _EXECUTOR.submit(_run_job, job_id)
+    return job_id
+
+def retry_failed_jobs() -> int:
+    """Queue failed jobs again and return how many were queued"""
+    with _JOBS_LOCK:
+        failed_ids = [job_id for job_id, job in _JOBS.items() if job['status'] == "failed"]
+        for job_id in failed_ids:
+            _JOBS[job_id].update({'status': "queued", 'attempts': 0, 'error': None, 'finished_at': None, 'updated_at': time.time()})
+
+    for job_id in failed_ids:
+        _EXECUTOR.submit(_run_job, job_id)
+    return len(failed_ids)
+
+def get_ingestion_status() -> Dict:
+    """
+    Returns ingestion progress.
+
+    Returns:
+        Dictionary with counts per status, whether work is pending, and job list (newest first)
+    """
+    with _JOBS_LOCK:
+        jobs = [{key: value for key, value in job.items() if key not in ('func', 'args', 'kwargs')} for job in _JOBS.values()]
+
+    counts = {}
+    for job in jobs:
+        counts[job['status']] = counts.get(job['status'], 0) + 1
+
+    jobs.sort(key=lambda job: job['enqueued_at'], reverse=True)
+    return {
+        'counts': counts,
+        'active': sum(counts.get(status, 0) for status in ACTIVE_STATUSES),
+        'total': len(jobs),
+        'jobs': jobs
+    }
@@ -0,0 +1,163 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+from model.conversation_context import count_tokens
+from tools.rag.local_index import split_text
+
+# Maximum tokens per chunk (a section heading prefix is included)
+LAYOUT_CHUNK_TOKENS = 400
+
+# Document Parse categories
+HEADING_CATEGORIES = {"heading1"}
+ATOMIC_CATEGORIES = {"table", "figure", "chart", "equation"}
+SKIPPED_CATEGORIES = {"header", "footer"}
+
+def element_text(element: Dict) -> str:
+    """Text of a Document Parse element (markdown keeps table structure, HTML tags are stripped as a last resort)"""
+    content = element.get('content') or {}
+    text = content.get('markdown') or content.get('text')
+    if not text and content.get('html'):
+        text = re.sub(r"<[^>]+>", " ", content['html'])
+    return (text or "").strip()
+
+def element_bbox(element: Dict) -> Optional[Dict]:
+    """Bounding box of an element in relative page coordinates"""
+    points = element.get('coordinates') or []
+    if not points:
+        return None
+    xs = [point['x'] for point in points]
+    ys = [point['y'] for point in points]
+    return {
+        'page': element.get('page'),
+        'x0': round(min(xs), 4),
+        'y0': round(min(ys), 4),
+        'x1': round(max(xs), 4),
+        'y1': round(max(ys), 4)
+    }
+
+def _build_chunk(parts: List[Dict], section: Optional[str], chunk_index: int) -> Dict:
+    """Combine buffered element parts into a chunk with page/bbox metadata"""
+    body = "\n\n".join(part['text'] for part in parts)
+    text = f"## {section}\n\n{body}" if section else body
+    pages = sorted({part['page'] for part in parts if part['page'] is not None})
+    return {
+        'text': text,
+        'chunk_index': chunk_index,
+        'token_count': count_tokens(text),
+        'metadata': {
+            'section': section,
+            'pages': pages,
+            'categories': sorted({part['category'] for part in parts}),
+            'bboxes': [part['bbox'] for part in parts if part['bbox']]
+        }
+    }
+
+def _split_table(text: str, max_tokens: int) -> List[str]:
+    """Split a markdown table by rows, repeating the header row in every piece"""
+    lines = text.splitlines()
+    header = lines[:2] if len(lines) > 1 and re.match(r"^\s*\|?\s*:?-{2,}", lines[1]) else lines[:1]
+    header_tokens = count_tokens("\n".join(header))
+
+    pieces = []
+    rows = []
+    rows_tokens = header_tokens
+    for line in lines[len(header):]:
+        line_tokens = count_tokens(line) + 1
+        if rows and rows_tokens + line_tokens > max_tokens:
+            pieces.append("\n".join(header + rows))
+            rows, rows_tokens = [], header_tokens
+        rows.append(line)
+        rows_tokens += line_tokens
+    if rows or not pieces:
+        pieces.append("\n".join(header + rows))
+    return pieces
+
+def iter_layout_chunks(elements: Iterable[Dict], max_tokens: int = LAYOUT_CHUNK_TOKENS) -> Iterator[Dict]:
+    """
+    Build section-aware chunks from Document Parse elements as a stream.
+    Headings start a new section (used as chunk prefix), tables/figures/charts/equations are kept
+    whole (tables that exceed the budget are split by rows with the header repeated), page headers
+    and footers are dropped, and every chunk carries its pages and element bounding boxes.
+
+    Args:
+        elements: Document Parse elements ('category', 'content', 'page', 'coordinates')
+        max_tokens: Maximum tokens per chunk
+
+    Yields:
+        Chunks as {'text', 'chunk_index', 'token_count', 'metadata': {'section', 'pages', 'categories', 'bboxes'}}
+    """
+    section = None
+    parts = []
+    parts_tokens = 0
+    pending_caption = None
+    chunk_index = 0
+
+    for element in elements:
+        category = element.get('category', 'paragraph')
+        if category in SKIPPED_CATEGORIES:
+            continue
+        text = element_text(element)
+        if not text:
+            continue
+        part = {'text': text, 'page': element.get('page'), 'category': category, 'bbox': element_bbox(element)}
+
+        if category == "caption":
+            # Captions are attached to the table/figure that follows them
+            if pending_caption:
+                parts.append(pending_caption)
+                parts_tokens += count_tokens(pending_caption['text'])
+            pending_caption = part
+            continue
+
+        if category in HEADING_CATEGORIES or category in ATOMIC_CATEGORIES:
+            if parts:
+                yield _build_chunk(parts, section, chunk_index)
+                chunk_index += 1
+                parts, parts_tokens = [], 0
+
+        if category in HEADING_CATEGORIES:
+            if pending_caption:
+                parts, parts_tokens = [pending_caption], count_tokens(pending_caption['text'])
+                pending_caption = None
+            section = text.lstrip("# ").strip()
+            continue
+
+        section_tokens = count_tokens(section) + 4 if section else 0
+        budget = max(max_tokens - section_tokens, 50)
+
+        if category in ATOMIC_CATEGORIES:
+            caption = [pending_caption] if pending_caption else []
+            pending_caption = None
+            pieces = _split_table(text, budget) if category == "table" and count_tokens(text) > budget else [text]
+            for piece in pieces:
+                yield _build_chunk(caption + [{**part, 'text': piece}], section, chunk_index)
+                chunk_index += 1
+            continue
+
+        if pending_caption:
+            parts.append(pending_caption)
+            parts_tokens += count_tokens(pending_caption['text'])
+            pending_caption = None
+
+        # Paragraphs longer than the budget are split at sentence boundaries
+        text_tokens = count_tokens(text)
+        pieces = split_text(text, chunk_size=budget * 4, overlap=0) if text_tokens > budget else [text]
+        for piece in pieces:
+            piece_tokens = count_tokens(piece)
+            if parts and parts_tokens + piece_tokens > budget:
+                yield _build_chunk(parts, section, chunk_index)
+                chunk_index += 1
+                parts, parts_tokens = [], 0
+            parts.append({**part, 'text': piece})
+            parts_tokens += piece_tokens
+
+    if pending_caption:
+        parts.append(pending_caption)
+    if parts:
+        yield _build_chunk(parts, section, chunk_index)
+
+def render_chunks(chunks: Iterable[Dict]) -> Iterator[str]:
+    """Render chunks as text blocks with page markers (for backends that chunk uploaded files themselves)"""
+    for chunk in chunks:
+        pages = chunk['metadata']['pages']
+        page_label = f"[Pages {pages[0]}-{pages[-1]}]" if len(pages) > 1 else f"[Page {pages[0]}]" if pages else ""
+        yield f"{page_label}\n{chunk['text']}\n\n"
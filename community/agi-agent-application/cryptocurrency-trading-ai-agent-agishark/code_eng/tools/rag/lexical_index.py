@@ -0,0 +1,250 @@
+import os
+import re
+import json
+import math
+import hashlib
+import threading
+from typing import List, Dict, Iterable
+from tools.rag.local_index import split_text
+
+# Persistent inverted index over ingested chunks: one JSON file per document (chunks with their
+# term frequencies), so adding or removing a document only writes or deletes that document's file
+LEXICAL_INDEX_DIR = "data/rag_lexical_index"
+
+# Single-file index of earlier versions (converted once on load)
+LEGACY_LEXICAL_INDEX_FILE = "data/rag_lexical_index.json"
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens (tickers, numbers and Hangul words are kept as-is)"""
+    return re.findall(r"\w+", text.lower())
+
+class LexicalIndex:
+    """
+    BM25 index over document chunks: postings {term: {chunk_id: term frequency}} and chunk metadata
+    in memory, persisted per document (term frequencies included) so no tokenizing is needed on startup.
+    """
+    def __init__(self, index_dir: str = LEXICAL_INDEX_DIR):
+        self.index_dir = index_dir
+        self._lock = threading.RLock()
+        self._chunks = {}
+        self._postings = {}
+        self._documents = {}
+        self._total_length = 0
+        self._next_chunk_id = 0
+        self._load()
+
+    def _document_path(self, file_name: str) -> str:
+        return os.path.join(self.index_dir, hashlib.sha256(file_name.encode("utf-8")).hexdigest()[:32] + ".json")
+
+    def _load(self):
+        if os.path.exists(LEGACY_LEXICAL_INDEX_FILE):
+            self._convert_legacy_index()
+            return
+        if not os.path.isdir(self.index_dir):
+            return
+        for entry_name in os.listdir(self.index_dir):
+            if not entry_name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.index_dir, entry_name), "r", encoding="utf-8") as f:
+                    document = json.load(f)
+                self._add_to_memory(document['file_id'], document['filename'], document['chunks'])
+            except Exception as e:
+                print(f"Lexical index load error ({entry_name}): {str(e)}")
+
+    def _convert_legacy_index(self):
+        """Split the single-file index of earlier versions into per-document files"""
+        try:
+            with open(LEGACY_LEXICAL_INDEX_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            documents = {}
+            for chunk in sorted(data.get('chunks', {}).values(), key=lambda chunk: chunk['chunk_index']):
+                documents.setdefault(chunk['filename'], (chunk['file_id'], []))[1].append({
+                    **chunk, 'terms': self._term_frequencies(tokenize(chunk['content']))
+                })
+            for file_name, (file_id, chunks) in documents.items():
+                self._add_to_memory(file_id, file_name, chunks)
+                self._save_document(file_name)
+            os.remove(LEGACY_LEXICAL_INDEX_FILE)
+            print(f"Lexical index converted to per-document files ({len(documents)} documents)")
+        except Exception as e:
+            print(f"Lexical index conversion error: {str(e)}")
+
+    @staticmethod
+    def _term_frequencies(tokens: List[str]) -> Dict[str, int]:
+        frequencies = {}
+        for term in tokens:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        return frequencies
+
+    def _add_to_memory(self, file_id: str, file_name: str, chunks: List[Dict]):
+        """Add the chunks of a document (with 'terms') to the in-memory index (caller holds the lock or is loading)"""
+        chunk_ids = []
+        for chunk in chunks:
+            chunk_id = str(self._next_chunk_id)
+            self._next_chunk_id += 1
+            self._chunks[chunk_id] = {**chunk, 'file_id': file_id, 'filename': file_name}
+            self._total_length += chunk['length']
+            for term, frequency in chunk['terms'].items():
+                self._postings.setdefault(term, {})[chunk_id] = frequency
+            chunk_ids.append(chunk_id)
+        self._documents[file_name] = chunk_ids
+
+    def _save_document(self, file_name: str):
+        """Write the file of one document atomically (caller holds the lock)"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        chunks = [self._chunks[chunk_id] for chunk_id in self._documents[file_name]]
+        path = self._document_path(file_name)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                'file_id': chunks[0]['file_id'] if chunks else None,
+                'filename': file_name,
+                'chunks': chunks
+            }, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def _remove_documents(self, file_names: Iterable[str]):
+        """Remove documents from memory and disk (caller holds the lock)"""
+        for file_name in list(file_names):
+            for chunk_id in self._documents.pop(file_name, []):
+                chunk = self._chunks.pop(chunk_id)
+                self._total_length -= chunk['length']
+                for term in chunk['terms']:
+                    postings = self._postings.get(term)
+                    if postings is not None:
+                        postings.pop(chunk_id, None)
+                        if not postings:
+                            del self._postings[term]
+            try:
+                os.remove(self._document_path(file_name))
+            except FileNotFoundError:
+                pass
+
+    def add_document(self, file_id: str, file_name: str, text: str) -> int:
+        """
+        Index the chunks of a document (a previous version with the same file name is replaced).
+
+        Args:
+            file_id: Vector store file ID
+            file_name: File name
+            text: Document text
+
+        Returns:
+            Number of indexed chunks
+        """
+        return self.add_chunks(file_id, file_name, ({'text': chunk} for chunk in split_text(text)))
+
+    def add_chunks(self, file_id: str, file_name: str, chunks: Iterable[Dict]) -> int:
+        """
+        Index pre-built chunks ({'text', 'metadata'}) of a document, consumed as a stream.
+
+        Args:
+            file_id: Vector store file ID
+            file_name: File name
+            chunks: Chunks (e.g. from the layout chunker)
+
+        Returns:
+            Number of indexed chunks
+        """
+        new_chunks = []
+        for position, chunk in enumerate(chunks):
+            tokens = tokenize(chunk['text'])
+            new_chunks.append({
+                'chunk_index': position,
+                'length': len(tokens),
+                'metadata': chunk.get('metadata', {}),
+                'content': chunk['text'],
+                'terms': self._term_frequencies(tokens)
+            })
+
+        with self._lock:
+            self._remove_documents([file_name])
+            self._add_to_memory(file_id, file_name, new_chunks)
+            self._save_document(file_name)
+
+        print(f"Lexical index: '{file_name}' added ({len(new_chunks)} chunks)")
+        return len(new_chunks)
+
+    def remove_document(self, file_id: str = None, file_name: str = None) -> bool:
+        """Remove a document by file ID or file name"""
+        with self._lock:
+            file_names = {chunk['filename'] for chunk in self._chunks.values()
+                          if (file_id and chunk['file_id'] == file_id) or (file_name and chunk['filename'] == file_name)}
+            if not file_names:
+                return False
+            self._remove_documents(file_names)
+        return True
+
+    def retain_files(self, file_ids: Iterable[str]) -> int:
+        """Remove documents whose file ID is not in file_ids (returns number of removed chunks)"""
+        keep = set(file_ids)
+        with self._lock:
+            removed = [chunk['filename'] for chunk in self._chunks.values() if chunk['file_id'] not in keep]
+            self._remove_documents(set(removed))
+        return len(removed)
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        """
+        BM25 search.
+
+        Args:
+            query: Search query
+            max_results: Maximum number of results
+
+        Returns:
+            List of {'file_id', 'filename', 'score', 'content', 'metadata'} sorted by score
+        """
+        with self._lock:
+            chunk_count = len(self._chunks)
+            if not chunk_count:
+                return []
+            average_length = self._total_length / chunk_count
+
+            scores = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (chunk_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    length_norm = 1 - BM25_B + BM25_B * self._chunks[chunk_id]['length'] / average_length
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:max_results]
+            return [{
+                'file_id': self._chunks[chunk_id]['file_id'],
+                'filename': self._chunks[chunk_id]['filename'],
+                'score': score,
+                'content': self._chunks[chunk_id]['content'],
+                'metadata': self._chunks[chunk_id].get('metadata', {})
+            } for chunk_id, score in ranked]
+
+    def has_file(self, file_id: str) -> bool:
+        """Check whether a document is indexed"""
+        with self._lock:
+            return any(chunk['file_id'] == file_id for chunk in self._chunks.values())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'chunks': len(self._chunks),
+                'terms': len(self._postings),
+                'files': len({chunk['file_id'] for chunk in self._chunks.values()})
+            }
+
+# Process-wide lexical index
+_LEXICAL_INDEX = None
+_LEXICAL_INDEX_LOCK = threading.Lock()
+
+def get_lexical_index() -> LexicalIndex:
+    """Returns the shared lexical index (loaded on first use)"""
+    global _LEXICAL_INDEX
+    with _LEXICAL_INDEX_LOCK:
+        if _LEXICAL_INDEX is None:
+            _LEXICAL_INDEX = LexicalIndex()
+        return _LEXICAL_INDEX
@@ -0,0 +1,517 @@
+import os
+import re
+import json
+import uuid
+import hashlib
+import threading
+import numpy as np
+from typing import List, Dict, Callable, Iterable, Optional
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# Local index directory (append-only embedding matrix + chunk records + metadata)
+LOCAL_INDEX_DIR = "data/rag_index"
+EMBEDDINGS_FILE = "embeddings.f32"
+CHUNKS_FILE = "chunks.jsonl"
+METADATA_FILE = "metadata.json"
+LEGACY_EMBEDDINGS_FILE = "embeddings.npy"
+
+# Share of deleted rows that triggers a compaction of the index files
+COMPACT_RATIO = 0.3
+
+# Chunking settings (characters)
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 200
+
+# Chunks embedded per embedding call
+EMBEDDING_BATCH_SIZE = 64
+
+# Dimension of the local hashing embedding
+HASHING_DIMENSION = 512
+
+def hashing_embedding(texts: List[str]) -> np.ndarray:
+    """
+    Local embedding without any API call (hashed bag of words).
+    Used when no OpenAI key is available and as a stub in tests.
+
+    Args:
+        texts: Texts to embed
+
+    Returns:
+        Array of shape (len(texts), HASHING_DIMENSION)
+    """
+    vectors = np.zeros((len(texts), HASHING_DIMENSION), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % HASHING_DIMENSION
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vectors[row, index] += sign
+    return vectors
+
+def openai_embedding(texts: List[str], model: str = "text-embedding-3-small") -> np.ndarray:
+    """
+    Embedding through the OpenAI embeddings API.
+
+    Args:
+        texts: Texts to embed
+        model: Embedding model name
+
+    Returns:
+        Array of shape (len(texts), dimension)
+    """
+    from tools.rag.rag import get_openai_client
+
+    client = get_openai_client()
+    if not client:
+        raise RuntimeError("OpenAI API key is not set, cannot create embeddings.")
+
+    vectors = []
+    # The embeddings API accepts batches of inputs
+    for start in range(0, len(texts), 100):
+        response = client.embeddings.create(model=model, input=texts[start:start + 100])
+        vectors.extend(item.embedding for item in response.data)
+    return np.asarray(vectors, dtype=np.float32)
+
+# Configurable embedding function (name is stored in the index metadata)
+_EMBEDDING_FUNCTION = None
+_EMBEDDING_NAME = None
+
+OPENAI_EMBEDDING_NAME = "openai:text-embedding-3-small"
+HASHING_EMBEDDING_NAME = f"hashing:{HASHING_DIMENSION}"
+
+class EmbeddingMismatchError(RuntimeError):
+    """Raised when the index was built with a different embedding than the one available now"""
+
+def set_embedding_function(func: Callable[[List[str]], np.ndarray], name: str):
+    """
+    Replace the embedding function of the local index (e.g. with a stub in tests).
+
+    Args:
+        func: Function mapping a list of texts to a 2D float array
+        name: Unique name of the embedding (an index built with another embedding must be rebuilt)
+    """
+    global _EMBEDDING_FUNCTION, _EMBEDDING_NAME
+    _EMBEDDING_FUNCTION = func
+    _EMBEDDING_NAME = name
+
+def get_embedding_function():
+    """Returns (embedding function, name); OpenAI if a key is available, local hashing otherwise"""
+    if _EMBEDDING_FUNCTION is not None:
+        return _EMBEDDING_FUNCTION, _EMBEDDING_NAME
+
+    from tools.rag.rag import get_openai_client
+    if get_openai_client():
+        return openai_embedding, OPENAI_EMBEDDING_NAME
+    return hashing_embedding, HASHING_EMBEDDING_NAME
+
+def get_embedding_function_by_name(name: str):
+    """
+    Returns the embedding function an index was built with.
+
+    Raises:
+        EmbeddingMismatchError: If that embedding is not available in this process
+    """
+    if _EMBEDDING_FUNCTION is not None:
+        if name == _EMBEDDING_NAME:
+            return _EMBEDDING_FUNCTION
+    elif name == HASHING_EMBEDDING_NAME:
+        return hashing_embedding
+    elif name == OPENAI_EMBEDDING_NAME:
+        from tools.rag.rag import get_openai_client
+        if get_openai_client():
+            return openai_embedding
+    raise EmbeddingMismatchError(
+        f"The local index was built with '{name}' embeddings, which are not available now "
+        f"(current: '{get_embedding_function()[1]}'). Set the matching API key or rebuild the index."
+    )
+
+def split_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into overlapping chunks, preferring paragraph boundaries"""
+    text = text.strip()
+    if not text:
+        return []
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            # Cut at the last paragraph or sentence break inside the window
+            boundary = max(text.rfind("\n\n", start, end), text.rfind(". ", start, end))
+            if boundary > start + chunk_size // 2:
+                end = boundary + 1
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [chunk for chunk in chunks if chunk]
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+class LocalVectorIndex:
+    """
+    Local vector index: normalized embeddings appended to a raw float32 file (memory-mapped),
+    chunk records (file id, file name, attributes, content) appended as JSON lines, and a small
+    metadata file (embedding, dimension, row count, deleted documents).
+    Adds append only the new rows, deletes only mark the document; the files are compacted
+    once deleted rows make up COMPACT_RATIO of the index.
+    Searches use FAISS if installed, NumPy otherwise.
+    """
+    def __init__(self, index_dir: str = LOCAL_INDEX_DIR):
+        self.index_dir = index_dir
+        self.embeddings_path = os.path.join(index_dir, EMBEDDINGS_FILE)
+        self.chunks_path = os.path.join(index_dir, CHUNKS_FILE)
+        self.metadata_path = os.path.join(index_dir, METADATA_FILE)
+        self._lock = threading.RLock()
+        self._embeddings = None
+        self._chunks = []
+        self._chunks_bytes = 0
+        self._deleted_file_ids = set()
+        self._embedding_name = None
+        self._dimension = None
+        self._live_rows = None
+        self._faiss_index = None
+        self._load()
+
+    def _load(self):
+        """Load chunk records and memory-map the embedding matrix (legacy .npy indexes are converted once)"""
+        metadata = {}
+        if os.path.exists(self.metadata_path):
+            try:
+                with open(self.metadata_path, "r", encoding="utf-8") as f:
+                    metadata = json.load(f)
+            except Exception as e:
+                print(f"Local index metadata load error: {str(e)}")
+
+        if 'chunks' in metadata:
+            self._convert_legacy_index(metadata)
+            return
+
+        self._embedding_name = metadata.get('embedding')
+        self._dimension = metadata.get('dimension')
+        self._deleted_file_ids = set(metadata.get('deleted_file_ids', []))
+        rows = metadata.get('rows', 0)
+        self._chunks_bytes = metadata.get('chunks_bytes', 0)
+
+        self._chunks = []
+        if rows and os.path.exists(self.chunks_path):
+            with open(self.chunks_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if len(self._chunks) >= rows:
+                        break
+                    self._chunks.append(json.loads(line))
+
+        if len(self._chunks) != rows or not self._map_embeddings():
+            print("Local index files are out of sync, the index is reset.")
+            self._chunks, self._deleted_file_ids = [], set()
+            self._rewrite(None)
+
+    def _map_embeddings(self) -> bool:
+        """Memory-map the first len(self._chunks) rows of the embedding file"""
+        self._live_rows = None
+        self._faiss_index = None
+        if not self._chunks:
+            self._embeddings = None
+            return True
+        expected_bytes = len(self._chunks) * self._dimension * 4
+        if not os.path.exists(self.embeddings_path) or os.path.getsize(self.embeddings_path) < expected_bytes:
+            return False
+        self._embeddings = np.memmap(self.embeddings_path, dtype=np.float32, mode="r", shape=(len(self._chunks), self._dimension))
+        return True
+
+    def _convert_legacy_index(self, metadata: Dict):
+        """Convert an index saved as embeddings.npy + chunks inside metadata.json"""
+        legacy_path = os.path.join(self.index_dir, LEGACY_EMBEDDINGS_FILE)
+        self._chunks = metadata.get('chunks', [])
+        self._embedding_name = metadata.get('embedding')
+        self._deleted_file_ids = set()
+        embeddings = np.load(legacy_path) if os.path.exists(legacy_path) and self._chunks else None
+        if embeddings is None or embeddings.shape[0] != len(self._chunks):
+            self._chunks = []
+            embeddings = None
+        self._rewrite(embeddings)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+        print(f"Local index converted to the append-only format ({len(self._chunks)} chunks)")
+
+    def _write_metadata(self):
+        """Write the metadata file atomically (it commits appended rows)"""
+        temp_metadata_path = self.metadata_path + ".tmp"
+        with open(temp_metadata_path, "w", encoding="utf-8") as f:
+            json.dump({
+                'embedding': self._embedding_name,
+                'dimension': self._dimension,
+                'rows': len(self._chunks),
+                'chunks_bytes': self._chunks_bytes,
+                'deleted_file_ids': sorted(self._deleted_file_ids)
+            }, f, ensure_ascii=False)
+        os.replace(temp_metadata_path, self.metadata_path)
+
+    def _rewrite(self, embeddings: Optional[np.ndarray]):
+        """Rewrite all files from scratch (conversion, compaction and rebuilds only)"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._embeddings = None
+        self._faiss_index = None
+
+        temp_embeddings_path = self.embeddings_path + ".tmp"
+        with open(temp_embeddings_path, "wb") as f:
+            if embeddings is not None and len(embeddings):
+                f.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+                self._dimension = int(embeddings.shape[1])
+        temp_chunks_path = self.chunks_path + ".tmp"
+        with open(temp_chunks_path, "wb") as f:
+            for chunk in self._chunks:
+                f.write((json.dumps(chunk, ensure_ascii=False) + "\n").encode("utf-8"))
+            self._chunks_bytes = f.tell()
+        os.replace(temp_embeddings_path, self.embeddings_path)
+        os.replace(temp_chunks_path, self.chunks_path)
+        self._write_metadata()
+        self._map_embeddings()
+
+    def _append(self, new_chunks: List[Dict], new_embeddings: np.ndarray):
+        """Append the rows of one document and commit them with the metadata file"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        if self._dimension is None or not self._chunks:
+            self._dimension = int(new_embeddings.shape[1])
+        elif new_embeddings.shape[1] != self._dimension:
+            raise EmbeddingMismatchError(f"Embedding dimension {new_embeddings.shape[1]} does not match the index ({self._dimension}).")
+
+        # Drop the tail of an append that was never committed
+        self._embeddings = None
+        self._faiss_index = None
+        with open(self.embeddings_path, "ab") as f:
+            f.truncate(len(self._chunks) * self._dimension * 4)
+            f.write(np.ascontiguousarray(new_embeddings, dtype=np.float32).tobytes())
+        with open(self.chunks_path, "ab") as f:
+            f.truncate(self._chunks_bytes)
+            for chunk in new_chunks:
+                f.write((json.dumps(chunk, ensure_ascii=False) + "\n").encode("utf-8"))
+            self._chunks_bytes = f.tell()
+
+        self._chunks.extend(new_chunks)
+        self._write_metadata()
+        self._map_embeddings()
+
+    def _compact(self):
+        """Physically remove deleted documents once they make up COMPACT_RATIO of the rows"""
+        deleted_rows = sum(1 for chunk in self._chunks if chunk['file_id'] in self._deleted_file_ids)
+        if not deleted_rows or deleted_rows < len(self._chunks) * COMPACT_RATIO:
+            self._write_metadata()
+            return
+        keep = [i for i, chunk in enumerate(self._chunks) if chunk['file_id'] not in self._deleted_file_ids]
+        embeddings = np.asarray(self._embeddings[keep]) if keep else None
+        self._chunks = [self._chunks[i] for i in keep]
+        self._deleted_file_ids = set()
+        self._rewrite(embeddings)
+        print(f"Local index compacted ({deleted_rows} deleted chunks removed)")
+
+    def _embedding(self):
+        """Embedding function of this index (the stored one once the index has rows; backends are never mixed)"""
+        if self._embedding_name and self._chunks:
+            return get_embedding_function_by_name(self._embedding_name), self._embedding_name
+        return get_embedding_function()
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        embed, name = self._embedding()
+        self._embedding_name = name
+        return _normalize(np.asarray(embed(texts), dtype=np.float32))
+
+    def rebuild_embeddings(self) -> int:
+        """
+        Re-embed every live chunk with the current embedding function (explicit switch of backend).
+
+        Returns:
+            Number of re-embedded chunks
+        """
+        embed, name = get_embedding_function()
+        with self._lock:
+            self._chunks = [chunk for chunk in self._chunks if chunk['file_id'] not in self._deleted_file_ids]
+            self._deleted_file_ids = set()
+            batches = [
+                _normalize(np.asarray(embed([chunk['content'] for chunk in self._chunks[start:start + EMBEDDING_BATCH_SIZE]]), dtype=np.float32))
+                for start in range(0, len(self._chunks), EMBEDDING_BATCH_SIZE)
+            ]
+            self._embedding_name = name
+            self._rewrite(np.vstack(batches) if batches else None)
+        print(f"Local index rebuilt with '{name}' embeddings ({len(self._chunks)} chunks)")
+        return len(self._chunks)
+
+    def upload(self, text_content: str, file_name: str, attributes: Dict = None) -> Optional[str]:
+        """
+        Chunk, embed and add a document.
+
+        Args:
+            text_content: Document text
+            file_name: File name
+            attributes: Additional attributes stored with each chunk
+
+        Returns:
+            File ID of the document, or None if there was nothing to index
+
+        Raises:
+            EmbeddingMismatchError: If the index was built with an embedding that is not available
+        """
+        return self.upload_chunks(({'text': chunk} for chunk in split_text(text_content)), file_name, attributes)
+
+    def upload_chunks(self, chunks: Iterable[Dict], file_name: str, attributes: Dict = None) -> Optional[str]:
+        """
+        Embed and add pre-built chunks (consumed as a stream, embedded in batches, appended once per document).
+
+        Args:
+            chunks: Chunks as {'text', 'metadata'} (e.g. from the layout chunker)
+            file_name: File name
+            attributes: Additional attributes stored with each chunk
+
+        Returns:
+            File ID of the document, or None if there was nothing to index
+
+        Raises:
+            EmbeddingMismatchError: If the index was built with an embedding that is not available
+        """
+        file_id = f"local-{uuid.uuid4().hex[:16]}"
+        with self._lock:
+            new_chunks = []
+            new_embeddings = []
+            batch = []
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= EMBEDDING_BATCH_SIZE:
+                    self._embed_batch(file_id, file_name, attributes, batch, new_chunks, new_embeddings)
+                    batch = []
+            if batch:
+                self._embed_batch(file_id, file_name, attributes, batch, new_chunks, new_embeddings)
+
+            if not new_chunks:
+                print(f"Local index: no text to index for '{file_name}'")
+                return None
+
+            self._append(new_chunks, np.vstack(new_embeddings))
+
+        print(f"Local index: '{file_name}' added ({len(new_chunks)} chunks, {file_id})")
+        return file_id
+
+    def _embed_batch(self, file_id: str, file_name: str, attributes: Optional[Dict], batch: List[Dict],
+                     new_chunks: List[Dict], new_embeddings: List[np.ndarray]):
+        """Embed a batch of chunks and append their records and vectors (caller holds the lock)"""
+        new_embeddings.append(self._embed([chunk['text'] for chunk in batch]))
+        offset = len(new_chunks)
+        for position, chunk in enumerate(batch):
+            new_chunks.append({
+                'file_id': file_id,
+                'filename': file_name,
+                'chunk_index': offset + position,
+                'attributes': attributes or {},
+                'metadata': chunk.get('metadata', {}),
+                'content': chunk['text']
+            })
+
+    def _get_live_rows(self) -> np.ndarray:
+        """Row numbers of chunks that are not deleted (cached until the index changes)"""
+        if self._live_rows is None:
+            self._live_rows = np.asarray(
+                [i for i, chunk in enumerate(self._chunks) if chunk['file_id'] not in self._deleted_file_ids],
+                dtype=np.int64
+            )
+        return self._live_rows
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        """
+        Search chunks by cosine similarity.
+
+        Args:
+            query: Search query
+            max_results: Maximum number of results
+
+        Returns:
+            List of {'file_id', 'filename', 'score', 'content', 'metadata'} sorted by score
+
+        Raises:
+            EmbeddingMismatchError: If the index was built with an embedding that is not available
+        """
+        with self._lock:
+            if self._embeddings is None or not self._chunks:
+                return []
+            live_rows = self._get_live_rows()
+            if not len(live_rows):
+                return []
+
+            query_vector = self._embed([query])
+            if faiss is not None:
+                if self._faiss_index is None:
+                    self._faiss_index = faiss.IndexFlatIP(self._dimension)
+                    self._faiss_index.add(np.ascontiguousarray(self._embeddings[live_rows], dtype=np.float32))
+                scores, indices = self._faiss_index.search(query_vector, min(max_results, len(live_rows)))
+                ranked = [(int(live_rows[i]), float(s)) for i, s in zip(indices[0], scores[0]) if i >= 0]
+            else:
+                scores = self._embeddings[live_rows] @ query_vector[0]
+                top = np.argsort(-scores)[:max_results]
+                ranked = [(int(live_rows[i]), float(scores[i])) for i in top]
+
+            return [{
+                'file_id': self._chunks[i]['file_id'],
+                'filename': self._chunks[i]['filename'],
+                'score': score,
+                'content': self._chunks[i]['content'],
+                'metadata': self._chunks[i].get('metadata', {})
+            } for i, score in ranked]
+
+    def delete(self, file_name: str = None, file_id: str = None) -> bool:
+        """
+        Delete all chunks of a document (marked as deleted, removed by the next compaction).
+
+        Args:
+            file_name: File name to delete
+            file_id: File ID to delete (takes precedence)
+
+        Returns:
+            True if any chunk was deleted
+        """
+        with self._lock:
+            file_ids = {chunk['file_id'] for chunk in self._chunks
+                        if chunk['file_id'] not in self._deleted_file_ids
+                        and ((file_id and chunk['file_id'] == file_id) or (not file_id and chunk['filename'] == file_name))}
+            if not file_ids:
+                return False
+
+            self._deleted_file_ids |= file_ids
+            self._live_rows = None
+            self._faiss_index = None
+            self._compact()
+
+        print(f"Local index: '{file_id or file_name}' deleted")
+        return True
+
+    def list_files(self) -> List[Dict]:
+        """List indexed documents"""
+        with self._lock:
+            files = {}
+            for chunk in self._chunks:
+                if chunk['file_id'] in self._deleted_file_ids:
+                    continue
+                entry = files.setdefault(chunk['file_id'], {
+                    'file_id': chunk['file_id'],
+                    'filename': chunk['filename'],
+                    'attributes': chunk.get('attributes', {}),
+                    'chunks': 0
+                })
+                entry['chunks'] += 1
+            return list(files.values())
+
+# Process-wide local index
+_LOCAL_INDEX = None
+_LOCAL_INDEX_LOCK = threading.Lock()
+
+def get_local_index() -> LocalVectorIndex:
+    """Returns the shared local index (loaded on first use)"""
+    global _LOCAL_INDEX
+    with _LOCAL_INDEX_LOCK:
+        if _LOCAL_INDEX is None:
+            _LOCAL_INDEX = LocalVectorIndex()
+        return _LOCAL_INDEX
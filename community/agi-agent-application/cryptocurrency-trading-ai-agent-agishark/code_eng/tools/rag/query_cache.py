@@ -0,0 +1,168 @@
+import re
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional
+from tools.rag.local_index import get_embedding_function
+
+# Cosine similarity above which a previous query is considered the same question
+SIMILARITY_THRESHOLD = 0.92
+
+# Seconds a cached search result stays valid
+QUERY_CACHE_TTL = 600
+
+# Maximum number of cached queries (oldest are evicted first)
+MAX_CACHED_QUERIES = 256
+
+# Cached queries: list of entries with normalized query embedding and search results
+_QUERY_CACHE = []
+_QUERY_CACHE_LOCK = threading.Lock()
+
+# Incremented whenever documents are added or removed (cached results become stale)
+_CORPUS_VERSION = 0
+
+# Process-wide counters
+_QUERY_CACHE_STATS = {'hits': 0, 'misses': 0, 'invalidations': 0, 'saved_seconds': 0.0, 'lookup_seconds': 0.0}
+
+def _normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace/punctuation so trivial variations match exactly"""
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+def _embed_query(query: str) -> Optional[np.ndarray]:
+    """Normalized query embedding, or None if embedding failed"""
+    try:
+        embed, _ = get_embedding_function()
+        vector = np.asarray(embed([query]), dtype=np.float32)[0]
+    except Exception as e:
+        print(f"Query cache embedding error: {str(e)}")
+        return None
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+def bump_corpus_version():
+    """Invalidate every cached search result (call after documents are added or removed)"""
+    global _CORPUS_VERSION
+    with _QUERY_CACHE_LOCK:
+        _CORPUS_VERSION += 1
+        if _QUERY_CACHE:
+            _QUERY_CACHE_STATS['invalidations'] += 1
+        _QUERY_CACHE.clear()
+
+def lookup_cached_results(query: str, vector_store_id: str, max_results: int) -> tuple:
+    """
+    Find cached results of the same or a semantically similar query.
+
+    Args:
+        query: Search query
+        vector_store_id: Vector store the results belong to
+        max_results: Requested number of results
+
+    Returns:
+        Tuple of (cached results or None, query embedding to pass to store_cached_results)
+    """
+    start_time = time.time()
+    normalized_query = _normalize_query(query)
+    now = time.time()
+
+    with _QUERY_CACHE_LOCK:
+        _QUERY_CACHE[:] = [entry for entry in _QUERY_CACHE if entry['expires_at'] > now]
+        candidates = [entry for entry in _QUERY_CACHE
+                      if entry['vector_store_id'] == vector_store_id and entry['max_results'] >= max_results]
+        # Exact match needs no embedding call
+        for entry in candidates:
+            if entry['normalized_query'] == normalized_query:
+                return _record_hit(entry, max_results, time.time() - start_time), None
+
+    query_vector = _embed_query(query)
+
+    with _QUERY_CACHE_LOCK:
+        best_entry, best_score = None, SIMILARITY_THRESHOLD
+        if query_vector is not None:
+            for entry in candidates:
+                if entry['vector'] is None or entry['vector'].shape != query_vector.shape:
+                    continue
+                score = float(entry['vector'] @ query_vector)
+                if score >= best_score:
+                    best_entry, best_score = entry, score
+
+        # The entry may have been evicted while the query was embedded
+        if best_entry is not None and any(entry is best_entry for entry in _QUERY_CACHE):
+            print(f"Query cache hit: '{query}' ~ '{best_entry['query']}' (similarity {best_score:.3f})")
+            return _record_hit(best_entry, max_results, time.time() - start_time), None
+
+        _QUERY_CACHE_STATS['misses'] += 1
+        _QUERY_CACHE_STATS['lookup_seconds'] += time.time() - start_time
+        return None, query_vector
+
+def _record_hit(entry: Dict, max_results: int, lookup_seconds: float) -> List[Dict]:
+    """Update hit counters (caller holds the lock) and return the cached results"""
+    _QUERY_CACHE_STATS['hits'] += 1
+    _QUERY_CACHE_STATS['lookup_seconds'] += lookup_seconds
+    _QUERY_CACHE_STATS['saved_seconds'] += max(0.0, entry['search_seconds'] - lookup_seconds)
+    entry['hits'] += 1
+    return entry['results'][:max_results]
+
+def store_cached_results(query: str, query_vector: Optional[np.ndarray], vector_store_id: str,
+                         max_results: int, results: List[Dict], search_seconds: float, corpus_version: int):
+    """
+    Cache the results of a search.
+
+    Args:
+        query: Search query
+        query_vector: Query embedding returned by lookup_cached_results
+        vector_store_id: Vector store the results belong to
+        max_results: Requested number of results
+        results: Search results
+        search_seconds: Duration of the search (used for the latency savings statistic)
+        corpus_version: Corpus version read before the search started
+    """
+    now = time.time()
+    with _QUERY_CACHE_LOCK:
+        # Documents changed while the search was running
+        if corpus_version != _CORPUS_VERSION:
+            return
+        _QUERY_CACHE.append({
+            'query': query,
+            'normalized_query': _normalize_query(query),
+            'vector': query_vector,
+            'vector_store_id': vector_store_id,
+            'max_results': max_results,
+            'results': results,
+            'search_seconds': search_seconds,
+            'created_at': now,
+            'expires_at': now + QUERY_CACHE_TTL,
+            'hits': 0
+        })
+        if len(_QUERY_CACHE) > MAX_CACHED_QUERIES:
+            del _QUERY_CACHE[:len(_QUERY_CACHE) - MAX_CACHED_QUERIES]
+
+def get_corpus_version() -> int:
+    """Current corpus version"""
+    return _CORPUS_VERSION
+
+def clear_query_cache():
+    """Remove every cached query"""
+    with _QUERY_CACHE_LOCK:
+        _QUERY_CACHE.clear()
+
+def get_query_cache_stats() -> Dict:
+    """
+    Returns query cache statistics.
+
+    Returns:
+        Dictionary with hit/miss counts, hit rate, latency saved and cached queries
+    """
+    now = time.time()
+    with _QUERY_CACHE_LOCK:
+        lookups = _QUERY_CACHE_STATS['hits'] + _QUERY_CACHE_STATS['misses']
+        return {
+            **_QUERY_CACHE_STATS,
+            'hit_rate': _QUERY_CACHE_STATS['hits'] / lookups if lookups else 0.0,
+            'corpus_version': _CORPUS_VERSION,
+            'entries': [{
+                'query': entry['query'],
+                'hits': entry['hits'],
+                'results': len(entry['results']),
+                'age': now - entry['created_at']
+            } for entry in _QUERY_CACHE if entry['expires_at'] > now]
+        }
@@ -4,18 +4,39 @@ from openai import OpenAI
 import asyncio
 import threading
 import json
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Iterator, Optional
+from model.conversation_context import count_tokens
+from tools.rag.local_index import get_local_index, EmbeddingMismatchError
+from tools.rag.lexical_index import get_lexical_index
+from tools.rag.upload_batcher import submit_upload
+from tools.rag.layout_chunker import render_chunks
+from tools.rag.query_cache import lookup_cached_results, store_cached_results, bump_corpus_version, get_corpus_version
+from tools.rag.ingestion_manifest import get_manifest_entries, get_file_id, remove_entry, replace_entries
 
 # File path to store Vector Store ID
 VECTOR_STORE_ID_FILE = "data/vector_store_id.json"
 
+# RAG backend: "openai" (hosted vector store) or "local" (embedded index in data/rag_index)
+RAG_BACKEND = os.environ.get("RAG_BACKEND", "openai")
+
+# Vector store ID used for the local backend
+LOCAL_VECTOR_STORE_ID = "local"
+
+# Token budget of the sources passed to the answer model
+SOURCE_TOKEN_BUDGET = 3000
+
+# Smallest excerpt worth adding to the sources
+MIN_SOURCE_TOKENS = 50
+
 # Global cache variables
 _OPENAI_API_KEY = None
 _VECTOR_STORE_ID = None
+_RAG_BACKEND = None
 
 def update_global_cache():
     """Update global cache variables"""
-    global _OPENAI_API_KEY, _VECTOR_STORE_ID
+    global _OPENAI_API_KEY, _VECTOR_STORE_ID, _RAG_BACKEND
     
     # Update API key
     _OPENAI_API_KEY = st.session_state.get('openai_key', '')
@@ -23,7 +44,14 @@ def update_global_cache():
     # Update vector store ID
     _VECTOR_STORE_ID = st.session_state.get('vector_store_id', '')
     
-    print(f"Global cache variables updated - API key: {'set' if _OPENAI_API_KEY else 'none'}, Vector store ID: {_VECTOR_STORE_ID or 'none'}")
+    # Update RAG backend
+    _RAG_BACKEND = st.session_state.get('rag_backend', RAG_BACKEND)
+    
+    print(f"Global cache variables updated - API key: {'set' if _OPENAI_API_KEY else 'none'}, Vector store ID: {_VECTOR_STORE_ID or 'none'}, RAG backend: {_RAG_BACKEND}")
+
+def use_local_backend() -> bool:
+    """Check whether the local embedded index is used instead of the OpenAI vector store"""
+    return (_RAG_BACKEND or RAG_BACKEND) == "local"
 
 def get_openai_client():
     """Get OpenAI client"""
@@ -75,6 +103,12 @@ def load_vector_store_id() -> Optional[str]:
 
 def create_vector_store() -> Optional[str]:
     """Create vector store - called once at app startup"""
+    # Local backend needs no hosted vector store
+    if use_local_backend():
+        st.session_state.vector_store_id = LOCAL_VECTOR_STORE_ID
+        print("Using local vector index")
+        return LOCAL_VECTOR_STORE_ID
+    
     # Check if vector store ID already exists in session
     if 'vector_store_id' in st.session_state:
         print(f"Using vector store from session: {st.session_state.vector_store_id}")
@@ -116,7 +150,15 @@ def create_vector_store() -> Optional[str]:
         return None
 
 def upload_to_vector_store(text_content: str, file_name: str, attributes: Dict = None, 
-                          openai_api_key=None, vector_store_id=None) -> bool:
+                          openai_api_key=None, vector_store_id=None):
+    """Upload text content to vector store (returns vector store file ID on success, False on failure)"""
+    if use_local_backend():
+        try:
+            return get_local_index().upload(text_content, file_name, attributes) or False
+        except EmbeddingMismatchError as e:
+            print(f"Local index upload error: {str(e)}")
+            return False
+    
     # Use provided vector_store_id before accessing session_state
     if vector_store_id is None:
         if 'vector_store_id' not in st.session_state:
@@ -128,34 +170,45 @@ def upload_to_vector_store(text_content: str, file_name: str, attributes: Dict =
     if not client:
         return False
     
-    try:
-        # Create temporary file
-        temp_file_path = f"temp_{file_name}.txt"
-        with open(temp_file_path, "w", encoding="utf-8") as f:
-            f.write(text_content)
-        
-        # Upload file
-        with open(temp_file_path, "rb") as f:
-            print(f"Starting upload of file '{file_name}' to vector store...")
-            upload_result = client.vector_stores.files.upload_and_poll(
-                vector_store_id=vector_store_id,
-                file=f,
-                attributes=attributes or {}
-            )
-        
-        # Delete temporary file
-        os.remove(temp_file_path)
-        print(f"File '{file_name}' upload completed: {upload_result.id}")
-        return True
-    except Exception as e:
-        print(f"Vector store upload error: {str(e)}")
+    # Sent from memory as part of the next vector store file batch
+    print(f"Starting upload of file '{file_name}' to vector store...")
+    file_id, error_message = submit_upload(
+        client,
+        vector_store_id,
+        f"{os.path.splitext(file_name)[0]}.txt",
+        text_content.encode("utf-8"),
+        attributes
+    )
+    if not file_id:
+        print(f"Vector store upload error: {error_message}")
         return False
+    
+    print(f"File '{file_name}' upload completed: {file_id}")
+    return file_id
+
+def upload_chunks_to_vector_store(chunks, file_name: str, attributes: Dict = None, vector_store_id=None):
+    """
+    Upload layout chunks of a document (returns vector store file ID on success, False on failure).
+    The local index stores the chunks as they are with their page/bbox metadata; the OpenAI vector store
+    receives them as one file with page markers and section headings (it chunks uploaded files itself).
+    """
+    if use_local_backend():
+        try:
+            return get_local_index().upload_chunks(chunks, file_name, attributes) or False
+        except EmbeddingMismatchError as e:
+            print(f"Local index upload error: {str(e)}")
+            return False
+    
+    return upload_to_vector_store("".join(render_chunks(chunks)), file_name, attributes, vector_store_id=vector_store_id)
 
 def upload_file_to_vector_store(file_path: str, file_name: str, attributes: Dict = None, 
                                openai_api_key=None, vector_store_id=None) -> tuple:
-    """Directly upload file to vector store"""
+    """Directly upload file to vector store (returns (file ID, None) on success, (False, error) on failure)"""
     global _VECTOR_STORE_ID
     
+    if use_local_backend():
+        return upload_file_to_local_index(file_path, file_name, attributes)
+    
     actual_vector_store_id = vector_store_id or _VECTOR_STORE_ID
     
     print(f"Running upload_file_to_vector_store: ID={actual_vector_store_id}, file={file_name}")
@@ -176,33 +229,57 @@ def upload_file_to_vector_store(file_path: str, file_name: str, attributes: Dict
         return False, "Could not initialize OpenAI client"
     
     try:
-        # Direct file upload - removed 'attributes' argument
         with open(file_path, "rb") as f:
-            print(f"Starting direct upload of file '{file_name}' to vector store ({actual_vector_store_id})...")
-            # First upload the file
-            file_upload = client.vector_stores.files.upload(
-                vector_store_id=actual_vector_store_id,
-                file=f
-            )
-            
-            # Attributes can be set separately if needed
-            # If attributes exist, they can be set in file metadata later
-            
-            # Check upload status
-            file_status = client.vector_stores.files.retrieve(
-                vector_store_id=actual_vector_store_id,
-                file_id=file_upload.id
-            )
-        
-        print(f"Direct upload of file '{file_name}' completed: {file_upload.id}")
-        return True, None
+            file_content = f.read()
     except Exception as e:
-        error_msg = f"Direct vector store upload error: {str(e)}"
+        error_msg = f"File read error: {str(e)}"
         print(error_msg)
         return False, error_msg
+    
+    # Sent as part of the next vector store file batch (attributes are set per file)
+    print(f"Starting direct upload of file '{file_name}' to vector store ({actual_vector_store_id})...")
+    file_id, error_message = submit_upload(client, actual_vector_store_id, file_name, file_content, attributes)
+    if not file_id:
+        error_msg = f"Direct vector store upload error: {error_message}"
+        print(error_msg)
+        return False, error_msg
+    
+    print(f"Direct upload of file '{file_name}' completed: {file_id}")
+    return file_id, None
+
+def extract_pdf_text(file_path: str) -> str:
+    """Extract PDF text locally (PyMuPDF)"""
+    import fitz
+    with fitz.open(file_path) as document:
+        return "\n\n".join(page.get_text() for page in document)
+
+def upload_file_to_local_index(file_path: str, file_name: str, attributes: Dict = None) -> tuple:
+    """Extract PDF text locally (PyMuPDF) and add it to the local index"""
+    try:
+        text_content = extract_pdf_text(file_path)
+    except Exception as e:
+        error_msg = f"Local text extraction error: {str(e)}"
+        print(error_msg)
+        return False, error_msg
+    
+    try:
+        file_id = get_local_index().upload(text_content, file_name, attributes)
+    except EmbeddingMismatchError as e:
+        print(f"Local index upload error: {str(e)}")
+        return False, str(e)
+    if file_id is None:
+        return False, "No text could be extracted from the file"
+    return file_id, None
 
 def search_vector_store(query: str, max_results: int = 5) -> List[Dict]:
     """Perform search in vector store"""
+    if use_local_backend():
+        try:
+            return get_local_index().search(query, max_results)
+        except Exception as e:
+            print(f"Local index search error: {str(e)}")
+            return []
+    
     if 'vector_store_id' not in st.session_state:
         print("Vector store is not initialized.")
         return []
@@ -213,6 +290,14 @@ def search_vector_store(query: str, max_results: int = 5) -> List[Dict]:
     
     vector_store_id = st.session_state.vector_store_id
     
+    # Reuse results of the same or a semantically similar recent query
+    cached_results, query_vector = lookup_cached_results(query, vector_store_id, max_results)
+    if cached_results is not None:
+        return cached_results
+    
+    corpus_version = get_corpus_version()
+    start_time = time.time()
+    
     try:
         results = client.vector_stores.search(
             vector_store_id=vector_store_id,
@@ -232,56 +317,171 @@ def search_vector_store(query: str, max_results: int = 5) -> List[Dict]:
                 'content': content_text
             })
         
+        store_cached_results(query, query_vector, vector_store_id, max_results, formatted_results,
+                             time.time() - start_time, corpus_version)
         return formatted_results
     except Exception as e:
         print(f"Vector store search error: {str(e)}")
         return []
 
-def delete_from_vector_store(file_name: str) -> bool:
-    """Delete file from vector store by file name"""
-    if 'vector_store_id' not in st.session_state:
-        print("Vector store is not initialized.")
-        return False
+def list_vector_store_files(vector_store_id: str = None) -> Optional[List[Dict]]:
+    """
+    List every file in the vector store with its attributes (paginated list calls, no per-file retrieve).
     
-    client = get_openai_client()
-    if not client:
-        return False
+    Args:
+        vector_store_id: Vector store ID (defaults to the current one)
+        
+    Returns:
+        List of {'file_id', 'file_name', 'content_hash', 'options_key', 'requested_options_key', 'created_at'}, or None on error
+    """
+    if use_local_backend():
+        return [{
+            'file_id': file['file_id'],
+            'file_name': file['filename'],
+            'content_hash': file['attributes'].get('content_hash'),
+            'options_key': file['attributes'].get('options_key'),
+            'requested_options_key': file['attributes'].get('requested_options_key'),
+            'created_at': 0
+        } for file in get_local_index().list_files()]
     
-    vector_store_id = st.session_state.vector_store_id
+    actual_vector_store_id = vector_store_id or _VECTOR_STORE_ID
+    client = get_openai_client()
+    if not client or not actual_vector_store_id:
+        return None
     
     try:
-        # Get file list from vector store
-        files = client.vector_stores.files.list(
-            vector_store_id=vector_store_id
-        )
-        
-        # Find file by name
-        target_file = None
-        for file in files.data:
-            # Check file name in file attributes
-            attributes = client.vector_stores.files.retrieve(
-                vector_store_id=vector_store_id,
-                file_id=file.id
-            ).attributes
-            
-            if attributes and attributes.get('file_name') == file_name:
-                target_file = file
-                break
+        files = []
+        # Iterating the page fetches the following pages automatically
+        for file in client.vector_stores.files.list(vector_store_id=actual_vector_store_id, limit=100):
+            attributes = file.attributes or {}
+            files.append({
+                'file_id': file.id,
+                'file_name': attributes.get('file_name'),
+                'content_hash': attributes.get('content_hash'),
+                'options_key': attributes.get('options_key'),
+                'requested_options_key': attributes.get('requested_options_key'),
+                'created_at': file.created_at or 0
+            })
+        return files
+    except Exception as e:
+        print(f"Error listing vector store files: {str(e)}")
+        return None
+
+def reconcile_file_index(vector_store_id: str = None, delete_duplicates: bool = False) -> Dict:
+    """
+    Rebuild the local file name/content hash -> file ID index (ingestion manifest) from the vector store.
+    Run when the index is missing or a lookup misses; entries of files that no longer exist are dropped.
+    
+    Args:
+        vector_store_id: Vector store ID (defaults to the current one)
+        delete_duplicates: Delete older vector store files that share a file name with a newer one
         
-        if not target_file:
-            print(f"Could not find file '{file_name}' in vector store.")
-            return False
+    Returns:
+        Dictionary with reconciliation counts
+    """
+    actual_vector_store_id = vector_store_id or _VECTOR_STORE_ID or (LOCAL_VECTOR_STORE_ID if use_local_backend() else None)
+    remote_files = list_vector_store_files(actual_vector_store_id)
+    if remote_files is None:
+        return {'success': False, 'error': "Could not list vector store files"}
+    
+    # Newest file wins when several files share a name
+    remote_files.sort(key=lambda file: file['created_at'], reverse=True)
+    
+    current_entries = get_manifest_entries()
+    entries = {}
+    duplicates = []
+    untracked = 0
+    for file in remote_files:
+        file_name = file['file_name']
+        if not file_name:
+            # Uploaded without attributes, cannot be mapped to a document
+            untracked += 1
+            continue
+        if file_name in entries:
+            duplicates.append(file['file_id'])
+            continue
         
-        # Delete file
+        current_entry = current_entries.get(file_name)
+        if current_entry and current_entry.get('file_id') == file['file_id']:
+            entries[file_name] = current_entry
+        else:
+            entries[file_name] = {
+                'content_hash': file['content_hash'],
+                'options_key': file['options_key'],
+                'requested_options_key': file['requested_options_key'] or file['options_key'],
+                'file_id': file['file_id'],
+                'parse_method': None,
+                'size_bytes': None,
+                'mtime': None,
+                'ingested_at': file['created_at']
+            }
+    
+    removed = len([name for name in current_entries if name not in entries])
+    replace_entries(entries)
+    get_lexical_index().retain_files(entry['file_id'] for entry in entries.values())
+    
+    if delete_duplicates:
+        for file_id in duplicates:
+            delete_vector_store_file(file_id, actual_vector_store_id)
+    
+    print(f"File index reconciled - Indexed: {len(entries)}, Removed: {removed}, Duplicates: {len(duplicates)}, Untracked: {untracked}")
+    return {
+        'success': True,
+        'indexed': len(entries),
+        'removed': removed,
+        'duplicates': len(duplicates),
+        'untracked': untracked
+    }
+
+def delete_from_vector_store(file_name: str, vector_store_id: str = None, content_hash: str = None) -> bool:
+    """
+    Delete file from vector store by file name.
+    The file ID is looked up in the local file index, so the delete is a single API call;
+    the index is rebuilt from the vector store only if the lookup misses.
+    """
+    if vector_store_id is None:
+        vector_store_id = _VECTOR_STORE_ID or st.session_state.get('vector_store_id', '')
+    
+    file_id = get_file_id(file_name, content_hash)
+    if not file_id:
+        print(f"File '{file_name}' is not in the file index, rebuilding index from vector store")
+        reconcile_file_index(vector_store_id)
+        file_id = get_file_id(file_name, content_hash)
+    
+    if not file_id:
+        print(f"Could not find file '{file_name}' in vector store.")
+        return False
+    
+    if not delete_vector_store_file(file_id, vector_store_id):
+        return False
+    
+    remove_entry(file_name)
+    print(f"File '{file_name}' deleted from vector store")
+    return True
+
+def delete_vector_store_file(file_id: str, vector_store_id: str = None) -> bool:
+    """Delete file from vector store by file ID (single API call)"""
+    # Lexical (BM25) chunks of the file are removed together with its vectors
+    get_lexical_index().remove_document(file_id=file_id)
+    
+    if use_local_backend():
+        return get_local_index().delete(file_id=file_id)
+    
+    actual_vector_store_id = vector_store_id or _VECTOR_STORE_ID
+    client = get_openai_client()
+    if not client or not actual_vector_store_id:
+        return False
+    
+    try:
         client.vector_stores.files.delete(
-            vector_store_id=vector_store_id,
-            file_id=target_file.id
+            vector_store_id=actual_vector_store_id,
+            file_id=file_id
         )
-        
-        print(f"File '{file_name}' deleted from vector store")
+        bump_corpus_version()
+        print(f"File '{file_id}' deleted from vector store")
         return True
     except Exception as e:
-        print(f"Error deleting file from vector store: {str(e)}")
+        print(f"Error deleting file '{file_id}' from vector store: {str(e)}")
         return False
 
 def async_process(func, *args, **kwargs):
@@ -295,44 +495,84 @@ def async_process(func, *args, **kwargs):
     thread.start()
     return thread
 
-def format_results_for_llm(search_results: List[Dict]) -> str:
-    """Format search results for LLM"""
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens tokens at a word boundary"""
+    text_tokens = count_tokens(text)
+    if text_tokens <= max_tokens:
+        return text
+    cut = text[:int(len(text) * max_tokens / text_tokens)]
+    boundary = cut.rfind(" ")
+    return (cut[:boundary] if boundary > len(cut) // 2 else cut) + " ..."
+
+def format_results_for_llm(search_results: List[Dict], token_budget: int = SOURCE_TOKEN_BUDGET) -> str:
+    """Format search results for LLM (best results first, trimmed to the token budget)"""
     if not search_results:
         return "No search results found."
     
     formatted_text = "<sources>\n"
-    for result in search_results:
-        formatted_text += f"<result file_name='{result['filename']}' score='{result['score']:.2f}'>\n"
-        formatted_text += f"<content>{result['content']}</content>\n"
-        formatted_text += "</result>\n"
+    used_tokens = count_tokens(formatted_text) + 2
+    for result in sorted(search_results, key=lambda result: result['score'], reverse=True):
+        header = f"<result file_name='{result['filename']}' score='{result['score']:.2f}'>\n<content>"
+        footer = "</content>\n</result>\n"
+        available_tokens = token_budget - used_tokens - count_tokens(header + footer)
+        # Stop when the remaining budget cannot hold a useful excerpt
+        if available_tokens < MIN_SOURCE_TOKENS:
+            break
+        content = _truncate_to_tokens(result['content'], available_tokens)
+        formatted_text += header + content + footer
+        used_tokens += count_tokens(header + content + footer)
     formatted_text += "</sources>"
     
     return formatted_text
 
-def synthesize_response(query: str, search_results: List[Dict]) -> str:
-    """Generate response based on search results"""
+def _synthesis_messages(query: str, search_results: List[Dict]) -> List[Dict]:
+    """Chat messages of the answer request"""
+    formatted_results = format_results_for_llm(search_results)
+    return [
+        {
+            "role": "system",
+            "content": "Please answer questions about investment strategies and cryptocurrency trading accurately and concisely based on the provided sources."
+        },
+        {
+            "role": "user",
+            "content": f"Source: {formatted_results}\n\nQuestion: '{query}'"
+        }
+    ]
+
+def stream_synthesized_response(query: str, search_results: List[Dict]) -> Iterator[str]:
+    """
+    Generate response based on search results, yielding text deltas as they arrive.
+    
+    Args:
+        query: User question
+        search_results: Search results used as sources
+        
+    Yields:
+        Response text deltas
+    """
     client = get_openai_client()
     if not client:
-        return "Cannot generate response because OpenAI API key is not set."
-    
-    formatted_results = format_results_for_llm(search_results)
+        yield "Cannot generate response because OpenAI API key is not set."
+        return
     
     try:
-        completion = client.chat.completions.create(
+        start_time = time.time()
+        first_token_time = None
+        stream = client.chat.completions.create(
             model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Please answer questions about investment strategies and cryptocurrency trading accurately and concisely based on the provided sources."
-                },
-                {
-                    "role": "user",
-                    "content": f"Source: {formatted_results}\n\nQuestion: '{query}'"
-                }
-            ],
+            messages=_synthesis_messages(query, search_results),
+            stream=True
         )
-        
-        return completion.choices[0].message.content
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token_time is None:
+                    first_token_time = time.time() - start_time
+                    print(f"Response first token: {first_token_time:.2f} seconds")
+                yield chunk.choices[0].delta.content
     except Exception as e:
         print(f"Error generating response: {str(e)}")
-        return f"An error occurred while generating response: {str(e)}"
\ No newline at end of file
+        yield f"An error occurred while generating response: {str(e)}"
+
+def synthesize_response(query: str, search_results: List[Dict]) -> str:
+    """Generate response based on search results"""
+    return "".join(stream_synthesized_response(query, search_results))
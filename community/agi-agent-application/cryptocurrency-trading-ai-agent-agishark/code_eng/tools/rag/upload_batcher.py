@@ -0,0 +1,129 @@
+import io
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from tools.rag.query_cache import bump_corpus_version
+from tools.rag.ingestion_queue import upload_slot, get_running_job_count
+
+# Uploads submitted within this window are sent as one vector store file batch
+BATCH_WINDOW_SECONDS = 1.0
+
+# Maximum files per batch; a batch is also sent as soon as every running ingestion job
+# has submitted its file (no other producer can join it)
+MAX_BATCH_FILES = 20
+
+# Seconds a caller waits for its batch to finish
+BATCH_WAIT_TIMEOUT = 600
+
+# Pending uploads per vector store: {vector_store_id: [item]}
+_PENDING = {}
+_PENDING_LOCK = threading.Lock()
+
+def _upload_batch(vector_store_id: str, items: List[Dict]):
+    """Upload the files of a batch, attach them with their attributes in one file batch and poll it once"""
+    client = items[0]['client']
+    try:
+        with upload_slot():
+            # Upload file contents from memory (no temporary files)
+            for item in items:
+                try:
+                    uploaded_file = client.files.create(
+                        file=(item['upload_name'], io.BytesIO(item['content'])),
+                        purpose="assistants"
+                    )
+                    item['file_id'] = uploaded_file.id
+                except Exception as e:
+                    item['error'] = f"File upload error: {str(e)}"
+
+            file_ids = [item['file_id'] for item in items if item.get('file_id')]
+            if file_ids:
+                start_time = time.time()
+                # Per-file attributes travel with the batch (no files.update call per file)
+                batch = client.vector_stores.file_batches.create_and_poll(
+                    vector_store_id=vector_store_id,
+                    files=[
+                        {'file_id': item['file_id'], 'attributes': item['attributes']} if item['attributes'] else {'file_id': item['file_id']}
+                        for item in items if item.get('file_id')
+                    ]
+                )
+                print(f"Vector store file batch {batch.id} {batch.status}: {len(file_ids)} files ({time.time() - start_time:.2f} seconds)")
+
+                if batch.file_counts.completed == len(file_ids):
+                    completed_ids = set(file_ids)
+                else:
+                    completed_ids = {completed_file.id for completed_file in client.vector_stores.file_batches.list_files(
+                        vector_store_id=vector_store_id, batch_id=batch.id, filter="completed"
+                    )}
+
+                for item in items:
+                    if not item.get('file_id'):
+                        continue
+                    if item['file_id'] not in completed_ids:
+                        item['error'] = f"Vector store file processing failed (batch {batch.status})"
+                        continue
+                    item['result'] = item['file_id']
+
+                bump_corpus_version()
+    except Exception as e:
+        for item in items:
+            if not item.get('result'):
+                item['error'] = f"Vector store batch upload error: {str(e)}"
+    finally:
+        for item in items:
+            item['done'].set()
+
+def _flush(vector_store_id: str, batch_key: object = None):
+    """Send the pending uploads of a vector store (batch_key ignores timers of already sent batches)"""
+    with _PENDING_LOCK:
+        items = _PENDING.get(vector_store_id)
+        if not items or (batch_key is not None and items[0]['batch_key'] is not batch_key):
+            return
+        del _PENDING[vector_store_id]
+    _upload_batch(vector_store_id, items)
+
+def submit_upload(client, vector_store_id: str, upload_name: str, content: bytes,
+                  attributes: Dict = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Add a file to the next vector store file batch and wait until the batch is processed.
+
+    Args:
+        client: OpenAI client
+        vector_store_id: Vector store ID
+        upload_name: File name sent to the API
+        content: File content
+        attributes: Vector store file attributes
+
+    Returns:
+        Tuple of (file ID, None) on success, (None, error) on failure
+    """
+    item = {
+        'client': client,
+        'upload_name': upload_name,
+        'content': content,
+        'attributes': attributes or {},
+        'done': threading.Event()
+    }
+
+    send_now = False
+    with _PENDING_LOCK:
+        items = _PENDING.setdefault(vector_store_id, [])
+        if not items:
+            # First item of a new batch starts the window timer
+            item['batch_key'] = object()
+            timer = threading.Timer(BATCH_WINDOW_SECONDS, _flush, args=(vector_store_id, item['batch_key']))
+            timer.daemon = True
+            timer.start()
+        else:
+            item['batch_key'] = items[0]['batch_key']
+        items.append(item)
+        # Uploads outside ingestion jobs (no running job) are sent immediately
+        send_now = len(items) >= min(MAX_BATCH_FILES, max(get_running_job_count(), 1))
+
+    if send_now:
+        _flush(vector_store_id)
+
+    if not item['done'].wait(BATCH_WAIT_TIMEOUT):
+        return None, "Vector store batch upload timed out"
+    if item.get('result'):
+        return item['result'], None
+    return None, item.get('error', "Unknown error")
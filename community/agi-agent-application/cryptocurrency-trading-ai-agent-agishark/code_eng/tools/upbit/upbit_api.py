@@ -807,41 +807,3 @@ CHECK_ORDER_STATUS_SCHEMA = {
     "required": ["order_id"],
     "additionalProperties": False
 }
-
-# Wrapper for tool functions
-async def tool_wrapper(func, ctx, args, retries=2):
-    """
-    Wrapper for tool function calls - provides error handling and retry functionality
-    """
-    function_name = func.__name__
-    attempt = 0
-    last_error = None
-    
-    while attempt <= retries:
-        try:
-            if attempt > 0:
-                log_info(f"{function_name}: Retry {attempt}/{retries}")
-                
-            return await func(ctx, args)
-        except Exception as e:
-            last_error = e
-            log_error(e, f"Error during {function_name} function execution (attempt {attempt+1}/{retries+1})")
-            attempt += 1
-            
-            # Wait briefly before retry if this isn't the last attempt
-            if attempt <= retries:
-                await asyncio.sleep(1)  # Wait 1 second
-    
-    # When all retries fail
-    log_error(last_error, f"{function_name} function execution failed - maximum retry count exceeded")
-    
-    # Default error response
-    error_response = {
-        'success': False,
-        'message': f"Function execution failed: {str(last_error)} (maximum retry count exceeded)",
-        'error': str(last_error)
-    }
-    return json.dumps(error_response, ensure_ascii=False)
-
-
-
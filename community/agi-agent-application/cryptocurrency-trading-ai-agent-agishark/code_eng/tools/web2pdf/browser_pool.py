@@ -0,0 +1,191 @@
+import asyncio
+import atexit
+import threading
+import time
+from typing import Any, Awaitable, Callable, List
+from playwright.async_api import async_playwright
+
+# Browser contexts in the pool (= maximum pages rendered at the same time)
+MAX_RENDER_CONCURRENCY = 4
+
+# Pages rendered by a context before it is closed and replaced (releases memory, cookies and caches)
+CONTEXT_MAX_PAGES = 20
+
+# Navigation timeout in milliseconds
+NAVIGATION_TIMEOUT_MS = 30000
+
+# Readiness after DOMContentLoaded: network quiet or DOM without mutations for DOM_STABLE_MS,
+# whichever comes first, but never longer than READY_TIMEOUT_MS
+READY_TIMEOUT_MS = 8000
+DOM_STABLE_MS = 500
+
+# Resolves once the DOM had no mutations for the given number of milliseconds
+_DOM_STABLE_SCRIPT = """
+(quietMs) => new Promise((resolve) => {
+    let timer = null;
+    const observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(done, quietMs);
+    });
+    function done() {
+        observer.disconnect();
+        resolve(true);
+    }
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    timer = setTimeout(done, quietMs);
+})
+"""
+
+# The browser lives on its own event loop thread; callers on any thread (or inside another
+# running loop) submit coroutines to it and block on the result
+_LOOP = None
+_LOOP_LOCK = threading.Lock()
+_POOL = None
+
+class BrowserPool:
+    """Long-lived headless Chromium with a pool of isolated contexts (used on the pool loop only)"""
+
+    def __init__(self, size: int = MAX_RENDER_CONCURRENCY, context_max_pages: int = CONTEXT_MAX_PAGES):
+        self.size = size
+        self.context_max_pages = context_max_pages
+        self._playwright = None
+        self._browser = None
+        self._contexts = None
+        self._start_lock = asyncio.Lock()
+        self.stats = {'pages': 0, 'contexts_created': 0, 'browser_launches': 0}
+
+    async def _ensure_browser(self):
+        """Launch the browser on first use and again if it crashed or was disconnected"""
+        async with self._start_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self.stats['browser_launches'] += 1
+            # Contexts of a previous browser are dropped and recreated lazily
+            self._contexts = asyncio.Queue()
+            for _ in range(self.size):
+                self._contexts.put_nowait({'context': None, 'browser': None, 'pages': 0})
+
+    async def _new_context(self):
+        context = await self._browser.new_context()
+        context.set_default_navigation_timeout(NAVIGATION_TIMEOUT_MS)
+        self.stats['contexts_created'] += 1
+        return context
+
+    async def _wait_until_ready(self, page):
+        """Adaptive readiness instead of a fixed sleep"""
+        waiters = [
+            asyncio.ensure_future(page.wait_for_load_state('networkidle', timeout=READY_TIMEOUT_MS)),
+            asyncio.ensure_future(page.evaluate(_DOM_STABLE_SCRIPT, DOM_STABLE_MS))
+        ]
+        try:
+            await asyncio.wait(waiters, timeout=READY_TIMEOUT_MS / 1000, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+            # Retrieve cancelled/failed waiters so their exceptions are not reported as unhandled
+            await asyncio.gather(*waiters, return_exceptions=True)
+
+    async def run(self, url: str, action: Callable[[Any], Awaitable[Any]]) -> Any:
+        """
+        Load a URL in a fresh page of a pooled context and run an action on the ready page.
+
+        Args:
+            url: URL to load
+            action: Coroutine function receiving the page (e.g. lambda page: page.pdf())
+
+        Returns:
+            Result of the action
+        """
+        await self._ensure_browser()
+        contexts = self._contexts
+        slot = await contexts.get()
+        try:
+            # Recycle contexts after context_max_pages pages or when they belong to another (crashed) browser;
+            # a slot taken from the queue of a replaced browser still holds a context of the old one
+            if slot['context'] is not None and (slot['pages'] >= self.context_max_pages or slot['browser'] is not self._browser
+                                                or not self._browser.is_connected()):
+                try:
+                    await slot['context'].close()
+                except Exception:
+                    pass
+                slot['context'] = None
+            if slot['context'] is None:
+                await self._ensure_browser()
+                slot['context'] = await self._new_context()
+                slot['browser'] = self._browser
+                slot['pages'] = 0
+
+            page = await slot['context'].new_page()
+            try:
+                await page.goto(url, wait_until='domcontentloaded')
+                await self._wait_until_ready(page)
+                return await action(page)
+            finally:
+                slot['pages'] += 1
+                self.stats['pages'] += 1
+                await page.close()
+        finally:
+            contexts.put_nowait(slot)
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = None
+        self._playwright = None
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Event loop of the browser thread (started once per process)"""
+    global _LOOP, _POOL
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True)
+            thread.start()
+            _POOL = asyncio.run_coroutine_threadsafe(_create_pool(), loop).result()
+            _LOOP = loop
+        return _LOOP
+
+async def _create_pool() -> BrowserPool:
+    return BrowserPool()
+
+async def _run_all(urls: List[str], action: Callable[[Any], Awaitable[Any]]) -> List[Any]:
+    return await asyncio.gather(*(_POOL.run(url, action) for url in urls), return_exceptions=True)
+
+def run_on_pages(urls: List[str], action: Callable[[Any], Awaitable[Any]]) -> List[Any]:
+    """
+    Load URLs concurrently in the shared browser pool and run an action on each ready page.
+
+    Args:
+        urls: URLs to load
+        action: Coroutine function receiving the page
+
+    Returns:
+        One entry per URL (in the order of urls): the action result, or the exception raised for that URL
+    """
+    if not urls:
+        return []
+    loop = _get_loop()
+    start_time = time.time()
+    results = asyncio.run_coroutine_threadsafe(_run_all(urls, action), loop).result()
+    print(f"Rendered {len(urls)} pages in {time.time() - start_time:.2f} seconds")
+    return results
+
+def get_browser_pool_stats() -> dict:
+    """Pages rendered, contexts created and browser launches of the shared pool"""
+    return dict(_POOL.stats) if _POOL is not None else {'pages': 0, 'contexts_created': 0, 'browser_launches': 0}
+
+def _shutdown():
+    """Close the browser when the process exits"""
+    if _LOOP is not None and _POOL is not None:
+        try:
+            asyncio.run_coroutine_threadsafe(_POOL.close(), _LOOP).result(timeout=10)
+        except Exception:
+            pass
+        _LOOP.call_soon_threadsafe(_LOOP.stop)
+
+atexit.register(_shutdown)
@@ -0,0 +1,332 @@
+import re
+import hashlib
+import threading
+import time
+from html.parser import HTMLParser
+from typing import Any, Dict, List
+import requests
+from requests.adapters import HTTPAdapter
+from tools.web2pdf.url_cache import load_entry, update_entry, conditional_headers, record_lookup
+
+# Pooled HTTP connections for HTML fetches (one per extract worker of the web pipeline)
+MAX_FETCH_WORKERS = 8
+
+# Timeout of one HTML fetch in seconds (connect, read)
+FETCH_TIMEOUT = (3, 10)
+
+# Pages larger than this are not extracted (escalated to rendering)
+MAX_HTML_BYTES = 5 * 1024 * 1024
+
+# Escalation thresholds: too little main text, script-driven shells and image-heavy pages are rendered instead
+MIN_TEXT_CHARS = 500
+MAX_SCRIPT_RATIO = 3.0
+MAX_IMAGE_RATIO = 1.5
+
+# Browser-like headers (many news sites reject the default requests user agent)
+FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9,ko;q=0.8"
+}
+
+# Elements whose content is never main text
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form", "button", "iframe"}
+
+# Elements that produce a text block
+BLOCK_TAGS = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "pre", "blockquote", "td", "th", "figcaption"}
+
+# Void elements never get an end tag
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+# class/id names of boilerplate containers (comments, share bars, related articles, ads...)
+BOILERPLATE_PATTERN = re.compile(
+    r"comment|share|social|related|recommend|promo|sponsor|advert|\bads?\b|banner|sidebar|subscribe|newsletter|cookie|popup|modal|breadcrumb|menu|footer|header|nav",
+    re.IGNORECASE
+)
+
+_HTTP_SESSION = None
+_HTTP_SESSION_LOCK = threading.Lock()
+
+def get_http_session() -> requests.Session:
+    """Returns the pooled HTTP session used for HTML fetches"""
+    global _HTTP_SESSION
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_FETCH_WORKERS, pool_maxsize=MAX_FETCH_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(FETCH_HEADERS)
+            _HTTP_SESSION = session
+        return _HTTP_SESSION
+
+class _MainContentParser(HTMLParser):
+    """Collects text blocks with their container path, plus page signals used for escalation"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.skip_depth = 0
+        self.blocks = []
+        self.block_parts = None
+        self.block_tag = None
+        self.block_depth = 0
+        self.title_parts = []
+        self.in_title = False
+        self.script_count = 0
+        self.image_count = 0
+        self.node_count = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "script":
+            self.script_count += 1
+        elif tag == "img":
+            self.image_count += 1
+        elif tag == "title":
+            self.in_title = True
+        if tag in VOID_TAGS:
+            if tag == "br" and self.block_parts is not None:
+                self.block_parts.append("\n")
+            return
+
+        # An open paragraph (or a sibling block of the same tag) is implicitly closed by the next block
+        if tag in BLOCK_TAGS and self.block_parts is not None and (self.block_tag == "p" or tag == self.block_tag):
+            self.handle_endtag(self.block_tag)
+
+        self.node_count += 1
+        attributes = dict(attrs)
+        names = f"{attributes.get('class') or ''} {attributes.get('id') or ''}"
+        boilerplate = tag in SKIPPED_TAGS or (tag in {"div", "section", "ul", "aside"} and BOILERPLATE_PATTERN.search(names))
+        if attributes.get('hidden') is not None or attributes.get('aria-hidden') == "true":
+            boilerplate = True
+        self.stack.append((tag, self.node_count, boilerplate))
+        if boilerplate:
+            self.skip_depth += 1
+
+        if tag in BLOCK_TAGS and self.block_parts is None and not self.skip_depth:
+            self.block_parts = []
+            self.block_tag = tag
+            self.block_depth = len(self.stack)
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+        if tag in VOID_TAGS or not any(open_tag == tag for open_tag, _, _ in self.stack):
+            return
+        # Close unclosed children as well (HTML in the wild is rarely balanced)
+        while self.stack:
+            open_tag, _, boilerplate = self.stack.pop()
+            if boilerplate:
+                self.skip_depth -= 1
+            if self.block_parts is not None and len(self.stack) < self.block_depth:
+                self._finish_block()
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title_parts.append(data)
+        elif self.block_parts is not None and not self.skip_depth:
+            self.block_parts.append(data)
+
+    def _finish_block(self):
+        text = re.sub(r"[ \t\r\f\v]+", " ", "".join(self.block_parts))
+        text = re.sub(r"\s*\n\s*", "\n", text).strip()
+        if text:
+            # Container path: node ids of the ancestors of the block
+            self.blocks.append({
+                'tag': self.block_tag,
+                'text': text,
+                'path': [node_id for _, node_id, _ in self.stack]
+            })
+        self.block_parts = None
+        self.block_tag = None
+
+    def close(self):
+        super().close()
+        if self.block_parts is not None:
+            self._finish_block()
+
+def _select_main_blocks(blocks: List[Dict]) -> List[Dict]:
+    """
+    Readability-style selection: each paragraph scores its parent fully and its grandparent half,
+    the best scoring container wins and its blocks are kept in document order
+    """
+    scores = {}
+    for block in blocks:
+        if block['tag'] != "p" or len(block['text']) < 25:
+            continue
+        score = 1 + block['text'].count(",") + min(len(block['text']) // 100, 3)
+        for distance, node_id in enumerate(reversed(block['path'][-2:])):
+            scores[node_id] = scores.get(node_id, 0) + score / (1 + distance)
+    if not scores:
+        return blocks
+
+    best_container = max(scores, key=scores.get)
+    return [block for block in blocks if best_container in block['path']]
+
+def extract_main_text(html: str) -> Dict[str, Any]:
+    """
+    Extract the main content of an HTML page.
+
+    Args:
+        html: HTML source
+
+    Returns:
+        Dictionary with 'text', 'title' and the signals 'script_count', 'image_count', 'paragraph_count'
+    """
+    parser = _MainContentParser()
+    parser.feed(html)
+    parser.close()
+
+    main_blocks = _select_main_blocks(parser.blocks)
+    title = re.sub(r"\s+", " ", "".join(parser.title_parts)).strip()
+    # Article headers are skipped as boilerplate, so the page title stands in for a missing h1
+    lines = [f"# {title}"] if title and not any(block['tag'] == "h1" for block in main_blocks) else []
+    for block in main_blocks:
+        if block['tag'].startswith("h") and len(block['tag']) == 2:
+            lines.append(f"{'#' * int(block['tag'][1])} {block['text']}")
+        elif block['tag'] == "li":
+            lines.append(f"- {block['text']}")
+        else:
+            lines.append(block['text'])
+
+    return {
+        'text': "\n\n".join(lines),
+        'title': title,
+        'script_count': parser.script_count,
+        'image_count': parser.image_count,
+        'paragraph_count': sum(1 for block in main_blocks if block['tag'] == "p")
+    }
+
+def _escalation_reason(extracted: Dict[str, Any]) -> str:
+    """Reason the page needs rendering ('' if the extracted text is usable)"""
+    paragraphs = max(extracted['paragraph_count'], 1)
+    if len(extracted['text']) - len(extracted['title']) < MIN_TEXT_CHARS:
+        if extracted['script_count'] / paragraphs > MAX_SCRIPT_RATIO:
+            return "script-driven page"
+        if extracted['image_count'] / paragraphs > MAX_IMAGE_RATIO:
+            return "image-heavy page"
+        return "too little text"
+    return ""
+
+def fetch_html(url: str, headers: Dict[str, str] = None) -> requests.Response:
+    """GET a page over the pooled session (raises for HTTP errors, 304 is returned as is)"""
+    response = get_http_session().get(url, headers=headers, timeout=FETCH_TIMEOUT)
+    response.raise_for_status()
+    return response
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _validator_version(validators: Dict[str, Any]) -> str:
+    """Content version from the ETag / Last-Modified of a response ('' if the server sends neither)"""
+    if validators.get('etag'):
+        return f"etag:{validators['etag']}"
+    if validators.get('last_modified'):
+        return f"last-modified:{validators['last_modified']}"
+    return ""
+
+def _is_unchanged(entry: Dict[str, Any], content_version: str) -> bool:
+    """Whether the cached text of an entry belongs to this content version"""
+    return bool(entry and content_version and entry.get('text') and entry.get('content_version') == content_version)
+
+def _cached_result(url: str, entry: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+    """Result of a page whose text is cached (extracted from HTML or parsed from the rendered PDF)"""
+    return {
+        'success': True,
+        'text': entry['text'],
+        'metadata': {
+            'source_url': url,
+            'title': entry.get('title', ''),
+            'method': entry.get('method', 'html'),
+            'cached': True,
+            'extract_time': round(time.time() - start_time, 3)
+        }
+    }
+
+def extract_webpage(url: str) -> Dict[str, Any]:
+    """
+    Fast path of webpage parsing: use the cached text of the page while it is fresh, the server
+    confirms it is unchanged (304, same ETag/Last-Modified) or the refetched page has the same main text,
+    otherwise extract the main text of the fetched HTML without rendering.
+
+    Args:
+        url: URL of the webpage
+
+    Returns:
+        Dict: {'success': True, 'text', 'metadata': {'source_url', 'title', 'method', 'cached', 'extract_time'}}
+            or {'success': False, 'escalate': True, 'reason', 'source_url'} when the page has to be rendered
+    """
+    start_time = time.time()
+    entry = load_entry(url)
+    if entry and entry.get('text') and entry['fresh']:
+        record_lookup('fresh_hits')
+        return _cached_result(url, entry, start_time)
+
+    # Validators are only sent when the cached text can stand in for a 304
+    headers = conditional_headers(entry) if entry and entry.get('text') else None
+    try:
+        response = fetch_html(url, headers)
+    except requests.exceptions.RequestException as e:
+        # Blocked or failing fetches may still render in a browser
+        return {'success': False, 'escalate': True, 'reason': f"fetch failed: {str(e)}", 'source_url': url}
+
+    if response.status_code == 304:
+        record_lookup('revalidated')
+        update_entry(url, validated_at=time.time())
+        return _cached_result(url, entry, start_time)
+
+    cache_fields = {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'validated_at': time.time()
+    }
+    # Servers that ignore conditional requests: identical validators still mean an unchanged page
+    validator_version = _validator_version(cache_fields)
+    if _is_unchanged(entry, validator_version):
+        record_lookup('revalidated')
+        update_entry(url, **cache_fields)
+        return _cached_result(url, entry, start_time)
+
+    content_type = response.headers.get('Content-Type', '')
+    if 'html' not in content_type or len(response.content) > MAX_HTML_BYTES:
+        record_lookup('misses')
+        # New content: previously cached text is dropped
+        update_entry(url, **cache_fields, content_version=validator_version or _digest(response.content), text=None, method=None)
+        reason = f"not HTML ({content_type or 'unknown'})" if 'html' not in content_type else "page too large"
+        return {'success': False, 'escalate': True, 'reason': reason, 'source_url': url}
+
+    # requests falls back to ISO-8859-1 for text/html without a charset
+    if response.encoding is None or response.encoding.lower() == "iso-8859-1":
+        response.encoding = response.apparent_encoding
+    html = response.text
+    extracted = extract_main_text(html)
+
+    # Without validators the page is versioned by its main text (raw HTML of dynamic pages
+    # differs on every fetch: timestamps, nonces, ads), so the rendered PDF and parsed text stay reusable
+    content_version = validator_version or f"text:{_digest(extracted['text'].encode('utf-8'))}"
+    if _is_unchanged(entry, content_version):
+        record_lookup('revalidated')
+        update_entry(url, html=html, **cache_fields)
+        return _cached_result(url, entry, start_time)
+    record_lookup('misses')
+    cache_fields['content_version'] = content_version
+
+    reason = _escalation_reason(extracted)
+    if reason:
+        update_entry(url, html=html, **cache_fields, text=None, method=None)
+        return {'success': False, 'escalate': True, 'reason': reason, 'source_url': url}
+
+    update_entry(url, html=html, **{**cache_fields, 'text': extracted['text'], 'method': 'html', 'title': extracted['title']})
+    return {
+        'success': True,
+        'text': extracted['text'],
+        'metadata': {
+            'source_url': url,
+            'title': extracted['title'],
+            'method': 'html',
+            'cached': False,
+            'extract_time': round(time.time() - start_time, 3)
+        }
+    }
@@ -0,0 +1,215 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Directory of cached pages: per normalized URL a metadata file (validators, extracted/parsed text),
+# the fetched HTML and the rendered PDF
+URL_CACHE_DIR = os.environ.get("URL_CACHE_DIR", "data/url_cache")
+
+# Total size of the cache directory before the least recently used files are evicted
+MAX_URL_CACHE_BYTES = int(os.environ.get("URL_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+# Seconds a cached page is used without revalidation
+DEFAULT_TTL = int(os.environ.get("URL_CACHE_TTL", 900))
+
+# TTL per domain (subdomains included); URL_CACHE_DOMAIN_TTLS="example.com=60,other.org=3600" overrides
+DOMAIN_TTLS = {
+    "coindesk.com": 600,
+    "cointelegraph.com": 600,
+    "bitcoin.com": 1800
+}
+for _item in filter(None, os.environ.get("URL_CACHE_DOMAIN_TTLS", "").split(",")):
+    _domain, _, _ttl = _item.partition("=")
+    if _ttl.strip().isdigit():
+        DOMAIN_TTLS[_domain.strip().lower()] = int(_ttl)
+
+# Query parameters that never change the page content
+TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src"}
+
+_CACHE_LOCK = threading.Lock()
+
+# Process-wide counters
+_URL_CACHE_STATS = {'fresh_hits': 0, 'revalidated': 0, 'misses': 0, 'evictions': 0}
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL for cache keys: lowercase scheme/host, default ports, fragments and
+    tracking parameters removed, query parameters sorted, trailing slash dropped
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "https"
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, host, path, query, ""))
+
+def get_ttl(url: str) -> int:
+    """TTL of a URL (longest matching domain suffix, DEFAULT_TTL otherwise)"""
+    host = (urlsplit(url).hostname or "").lower()
+    matches = [domain for domain in DOMAIN_TTLS if host == domain or host.endswith(f".{domain}")]
+    return DOMAIN_TTLS[max(matches, key=len)] if matches else DEFAULT_TTL
+
+def _entry_paths(url: str) -> Dict[str, str]:
+    key = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+    base = os.path.join(URL_CACHE_DIR, key[:2], key)
+    return {'meta': f"{base}.json.gz", 'html': f"{base}.html.gz", 'pdf': f"{base}.pdf"}
+
+def _iter_files():
+    """Yield (path, size, last access time) of every cached file"""
+    if not os.path.isdir(URL_CACHE_DIR):
+        return
+    for directory, _, file_names in os.walk(URL_CACHE_DIR):
+        for file_name in file_names:
+            if file_name.endswith((".json.gz", ".html.gz", ".pdf")):
+                path = os.path.join(directory, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+def _evict(required_bytes: int):
+    """Remove least recently used files until required_bytes fit (caller holds the lock)"""
+    files = sorted(_iter_files(), key=lambda entry: entry[2])
+    total_size = sum(size for _, size, _ in files)
+    for path, size, _ in files:
+        if total_size + required_bytes <= MAX_URL_CACHE_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total_size -= size
+        _URL_CACHE_STATS['evictions'] += 1
+
+def _write_file(path: str, data: bytes):
+    """Atomic write (caller holds the lock)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def load_entry(url: str) -> Optional[Dict[str, Any]]:
+    """
+    Cached metadata of a URL.
+
+    Args:
+        url: Page URL (normalized internally)
+
+    Returns:
+        Dictionary with 'url', 'etag', 'last_modified', 'validated_at', 'content_version', 'pdf_version',
+        'text', 'method', 'title' and 'fresh' (validated within the domain TTL), or None
+    """
+    path = _entry_paths(url)['meta']
+    try:
+        with open(path, "rb") as f:
+            entry = json.loads(gzip.decompress(f.read()).decode("utf-8"))
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"URL cache read error ({url}): {str(e)}")
+        return None
+    entry['fresh'] = time.time() - entry.get('validated_at', 0) < get_ttl(url)
+    return entry
+
+def update_entry(url: str, html: Optional[str] = None, pdf_binary: Optional[bytes] = None, **fields):
+    """
+    Merge fields into the cached entry of a URL and store the fetched HTML / rendered PDF.
+
+    Args:
+        url: Page URL
+        html: Fetched HTML
+        pdf_binary: Rendered PDF
+        **fields: Metadata such as etag, last_modified, validated_at, content_version, pdf_version, text, method, title
+    """
+    paths = _entry_paths(url)
+    try:
+        files = {}
+        if html is not None:
+            files['html'] = gzip.compress(html.encode("utf-8"))
+        if pdf_binary is not None:
+            files['pdf'] = pdf_binary
+
+        with _CACHE_LOCK:
+            entry = load_entry(url) or {}
+            entry.pop('fresh', None)
+            entry.update(fields)
+            entry['url'] = normalize_url(url)
+            files['meta'] = gzip.compress(json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+
+            required_bytes = sum(len(data) for data in files.values())
+            if required_bytes > MAX_URL_CACHE_BYTES:
+                return
+            _evict(required_bytes)
+            for name, data in files.items():
+                _write_file(paths[name], data)
+    except Exception as e:
+        print(f"URL cache write error ({url}): {str(e)}")
+
+def load_pdf(url: str) -> Optional[bytes]:
+    """Cached rendered PDF of a URL (None if absent, stale, or rendered from an older version of the page)"""
+    entry = load_entry(url)
+    if not entry or not entry['fresh'] or entry.get('pdf_version') != entry.get('content_version'):
+        return None
+    path = _entry_paths(url)['pdf']
+    try:
+        with open(path, "rb") as f:
+            pdf_binary = f.read()
+        os.utime(path)
+        return pdf_binary
+    except OSError:
+        return None
+
+def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since headers from the validators of a cached entry"""
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+def record_lookup(outcome: str):
+    """Count a cache lookup ('fresh_hits', 'revalidated' or 'misses')"""
+    with _CACHE_LOCK:
+        _URL_CACHE_STATS[outcome] += 1
+
+def get_url_cache_stats() -> Dict:
+    """
+    Returns URL cache statistics.
+
+    Returns:
+        Dictionary with fresh hit/revalidation/miss/eviction counts, file count and size
+    """
+    with _CACHE_LOCK:
+        files = list(_iter_files())
+        return {
+            **_URL_CACHE_STATS,
+            'entries': sum(1 for path, _, _ in files if path.endswith(".json.gz")),
+            'size_bytes': sum(size for _, size, _ in files),
+            'max_bytes': MAX_URL_CACHE_BYTES
+        }
+
+def clear_url_cache():
+    """Remove every cached page"""
+    with _CACHE_LOCK:
+        for path, _, _ in list(_iter_files()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,21 +1,74 @@
-import asyncio
-from playwright.async_api import async_playwright
 import os
 import time
-import nest_asyncio
+from typing import Any, Dict, List
+from tools.web2pdf.browser_pool import run_on_pages
+from tools.web2pdf.url_cache import load_entry, load_pdf, update_entry
 
-# Configure asyncio to work in Jupyter/IPython environments
-nest_asyncio.apply()
+def _pdf_file_name(url: str) -> str:
+    """PDF file name for a URL (timestamp and domain)"""
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    domain = url.split('/')[2] if len(url.split('/')) > 2 else 'webpage'
+    return f'{timestamp}_{domain}.pdf'
 
-async def _save_webpage_as_pdf(url: str) -> str:
+async def _page_pdf(page) -> bytes:
+    # Without a path the PDF is returned in memory
+    return await page.pdf()
+
+def _store_rendered_pdf(url: str, pdf_binary: bytes):
+    """
+    Cache a rendered PDF as a rendering of the currently cached version of the page.
+    Freshness is only moved forward by a successful fetch in extract_webpage; a page whose entry is
+    not fresh (e.g. the HTML fetch failed) has no known version, so its PDF is not cached.
+    """
+    entry = load_entry(url)
+    if not entry or not entry['fresh'] or not entry.get('content_version'):
+        return
+    update_entry(url, pdf_binary=pdf_binary, pdf_version=entry['content_version'])
+
+def _render_webpages(urls: List[str]) -> List[Dict[str, Any]]:
+    """Render URLs as PDF bytes concurrently in the shared browser pool (fresh cached PDFs are reused)"""
+    pdf_binaries = {url: load_pdf(url) for url in urls}
+    render_urls = [url for url in urls if pdf_binaries[url] is None]
+    if len(render_urls) < len(urls):
+        print(f"Reusing {len(urls) - len(render_urls)} cached PDFs")
+    for url, pdf_binary in zip(render_urls, run_on_pages(render_urls, _page_pdf)):
+        pdf_binaries[url] = pdf_binary
+        if not isinstance(pdf_binary, Exception):
+            _store_rendered_pdf(url, pdf_binary)
+
+    results = []
+    for url in urls:
+        pdf_binary = pdf_binaries[url]
+        if isinstance(pdf_binary, Exception):
+            print(f"Error rendering PDF for {url}: {pdf_binary}")
+            results.append({
+                'success': False,
+                'error': str(pdf_binary),
+                'source_url': url
+            })
+        else:
+            results.append({
+                'success': True,
+                'pdf_binary': pdf_binary,
+                'file_name': _pdf_file_name(url),
+                'source_url': url
+            })
+    return results
+
+def save_webpage_as_pdf(url: str) -> str:
     """
-    Internal asynchronous function to save a webpage as PDF
+    Function to save a webpage as PDF
 
     Args:
         url (str): URL of the webpage to save as PDF
 
     Returns:
         str: Path to the saved PDF file. None if failed.
+
+    Example:
+        >>> pdf_path = save_webpage_as_pdf('https://example.com')
+        >>> print(pdf_path)
+        'always_see_doc_storage/20240220-123456_example.com.pdf'
     """
     try:
         # Fixed output directory
@@ -23,44 +76,49 @@ async def _save_webpage_as_pdf(url: str) -> str:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            
-            # Load page and wait
-            await page.goto(url, wait_until='networkidle')
-            await page.wait_for_load_state('domcontentloaded')
-            await page.wait_for_load_state('load')
-            await page.wait_for_timeout(3000)
-            
-            # Generate PDF filename
-            timestamp = time.strftime("%Y%m%d-%H%M%S")
-            domain = url.split('/')[2] if len(url.split('/')) > 2 else 'webpage'
-            pdf_path = os.path.join(output_dir, f'{timestamp}_{domain}.pdf')
-            
-            # Save as PDF
-            await page.pdf(path=pdf_path)
-            await browser.close()
-            
-            return pdf_path
-                
+        result = _render_webpages([url])[0]
+        if not result['success']:
+            return None
+
+        # Save as PDF
+        pdf_path = os.path.join(output_dir, result['file_name'])
+        with open(pdf_path, 'wb') as f:
+            f.write(result['pdf_binary'])
+
+        return pdf_path
+
     except Exception as e:
         print(f"Error saving PDF: {e}")
         return None
 
-def save_webpage_as_pdf(url: str) -> str:
+def get_webpages_as_pdf_binary(urls: List[str]) -> List[Dict[str, Any]]:
     """
-    Function to save a webpage as PDF
+    Function to render webpages as PDF binary data without writing files
+    (concurrently, at most MAX_RENDER_CONCURRENCY pages at a time)
 
     Args:
-        url (str): URL of the webpage to save as PDF
+        urls (List[str]): URLs of the webpages to render
 
     Returns:
-        str: Path to the saved PDF file. None if failed.
+        List[Dict]: One result per URL (in the order of urls):
+            {'success': True, 'pdf_binary', 'file_name', 'source_url'} or {'success': False, 'error', 'source_url'}
+    """
+    if not urls:
+        return []
+    try:
+        return _render_webpages(urls)
+    except Exception as e:
+        print(f"Error rendering PDFs: {e}")
+        return [{'success': False, 'error': str(e), 'source_url': url} for url in urls]
 
-    Example:
-        >>> pdf_path = save_webpage_as_pdf('https://example.com')
-        >>> print(pdf_path)
-        'always_see_doc_storage/20240220-123456_example.com.pdf'
+def get_webpage_as_pdf_binary(url: str) -> Dict[str, Any]:
+    """
+    Function to render a webpage as PDF binary data without writing a file
+
+    Args:
+        url (str): URL of the webpage to render
+
+    Returns:
+        Dict: {'success': True, 'pdf_binary', 'file_name', 'source_url'} or {'success': False, 'error', 'source_url'}
     """
-    return asyncio.get_event_loop().run_until_complete(_save_webpage_as_pdf(url))
+    return get_webpages_as_pdf_binary([url])[0]
@@ -1,4 +1,4 @@
-from tools.web2pdf.web2pdf import get_webpage_as_pdf_binary
+from tools.web2pdf.web_pipeline import run_web_pipeline
 from agents import function_tool
 from typing import Dict, List, Any, Optional
 import os
@@ -9,7 +9,8 @@ from openai import OpenAI
 @function_tool
 def search_parse_webpage_direct(search_query: str, max_results: int) -> Dict[str, Any]:
     """
-    Performs web search, converts search result pages to PDF, and parses documents directly without local storage.
+    Performs web search and extracts the text of the result pages directly without local storage.
+    Ordinary HTML pages are extracted from their HTML; JS-heavy, image-heavy and non-HTML pages are converted to PDF and parsed.
     An integrated tool that processes web search, PDF conversion, and document parsing at once, skipping the local storage step.
     
     Args:
@@ -23,6 +24,8 @@ def search_parse_webpage_direct(search_query: str, max_results: int) -> Dict[str
             - query (str): The search query used
             - total_processed (int): Number of URLs processed
             - total_success (int): Number of documents successfully parsed
+            - stage_timings (Dict): Search time and per-stage (extract/render/parse) item counts, busy time,
+              slowest item and start/finish offsets, plus the pipeline wall time
             - error (str): Error message in case of failure
     """
     from tools.document_parser.document_parser import DocumentParser
@@ -50,6 +53,7 @@ def search_parse_webpage_direct(search_query: str, max_results: int) -> Dict[str
             }
         
         # Perform web search
+        search_start = time.time()
         urls = []
         try:
             print(f"Starting web search with OpenAI API: query='{search_query}'")
@@ -135,6 +139,7 @@ def search_parse_webpage_direct(search_query: str, max_results: int) -> Dict[str
             # Limit number of results
             urls = urls[:max_results] if len(urls) > max_results else urls
             print(f"Web search successful: Found {len(urls)} URLs, URLs: {urls}")
+            search_seconds = time.time() - search_start
             
             # Add hardcoded test URLs (temporary)
             if not urls:
@@ -169,56 +174,21 @@ def search_parse_webpage_direct(search_query: str, max_results: int) -> Dict[str
                 'message': "No search results found."
             }
         
-        # 2. Convert each URL to PDF binary (without saving)
-        pdf_binary_list = []
-        processed_count = 0
-        
-        for url in urls:
-            print(f"Converting URL to PDF (not saving): {url}")
-            pdf_result = get_webpage_as_pdf_binary(url)
-            
-            if pdf_result['success']:
-                pdf_binary_list.append(pdf_result)
-                processed_count += 1
-            else:
-                print(f"PDF conversion failed: {url}, error: {pdf_result.get('error', 'Unknown error')}")
-        
-        if not pdf_binary_list:
-            return {
-                'success': False,
-                'results': [],
-                'query': search_query,
-                'total_processed': len(urls),
-                'total_success': 0,
-                'error': "Failed to convert all URLs to PDF."
-            }
-        
-        # 3. Pass PDF binary data directly to DocumentParser
-        print(f"Starting direct parsing of binary data: {len(pdf_binary_list)} documents")
+        # 2. Pipelined stages: HTML fast path (cached or extracted text) -> render to PDF binary -> parse,
+        # connected by bounded queues so rendered pages are parsed while later pages are still rendering
         parser = DocumentParser()
-        parse_result = parser.parse_binary_data(pdf_binary_list)
-        
-        # 4. Combine results
-        parsed_docs = []
-        total_success = 0
+        documents, stage_timings = run_web_pipeline(urls, parser)
+        stage_timings['search_seconds'] = round(search_seconds, 3)
+        print(f"Web pipeline stage timings: {stage_timings}")
+        processed_count = len(urls) - sum(
+            1 for document in documents.values() if not document['success'] and document['error'].startswith("PDF conversion failed")
+        )
         
-        if parse_result['success']:
-            for result in parse_result.get('results', []):
-                if result.get('success', False):
-                    parsed_docs.append({
-                        'success': True,
-                        'source_url': result.get('metadata', {}).get('source_url', ''),
-                        'text': result.get('text', ''),
-                    })
-                    total_success += 1
-                else:
-                    parsed_docs.append({
-                        'success': False,
-                        'source_url': result.get('source_url', ''),
-                        'error': result.get('error', 'Document parsing failed')
-                    })
+        # 3. Combine results (in search result order)
+        parsed_docs = [documents[url] for url in urls if url in documents]
+        total_success = sum(1 for document in parsed_docs if document['success'])
         
-        print(f"search_parse_webpage_direct completed: {total_success}/{len(pdf_binary_list)} parsing successful")
+        print(f"search_parse_webpage_direct completed: {total_success}/{len(urls)} parsing successful")
         
         return {
             'success': total_success > 0,
@@ -226,6 +196,7 @@ def search_parse_webpage_direct(search_query: str, max_results: int) -> Dict[str
             'query': search_query,
             'total_processed': processed_count,
             'total_success': total_success,
+            'stage_timings': stage_timings,
             'message': f"Successfully parsed {total_success} out of {processed_count} documents"
         }
         
@@ -0,0 +1,185 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from tools.web2pdf.browser_pool import MAX_RENDER_CONCURRENCY
+from tools.web2pdf.html_extract import extract_webpage
+from tools.web2pdf.url_cache import update_entry
+from tools.web2pdf.web2pdf import get_webpage_as_pdf_binary
+
+# Workers per stage
+EXTRACT_WORKERS = 8
+RENDER_WORKERS = MAX_RENDER_CONCURRENCY
+PARSE_WORKERS = 4
+
+# Capacity of the queues between stages (a full queue makes the upstream stage wait)
+STAGE_QUEUE_SIZE = 4
+
+# Marks the end of a stage's input
+_END = object()
+
+class _StageTimer:
+    """Busy time, item count and slowest item of one stage"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.max_seconds = 0.0
+        self.first_start = None
+        self.last_end = None
+
+    def record(self, start_time: float, end_time: float):
+        with self.lock:
+            self.items += 1
+            self.busy_seconds += end_time - start_time
+            self.max_seconds = max(self.max_seconds, end_time - start_time)
+            self.first_start = start_time if self.first_start is None else min(self.first_start, start_time)
+            self.last_end = end_time if self.last_end is None else max(self.last_end, end_time)
+
+    def summary(self, pipeline_start: float) -> Dict[str, Any]:
+        return {
+            'items': self.items,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'max_item_seconds': round(self.max_seconds, 3),
+            'started_at': round(self.first_start - pipeline_start, 3) if self.first_start else None,
+            'finished_at': round(self.last_end - pipeline_start, 3) if self.last_end else None
+        }
+
+def _run_stage(input_queue: queue.Queue, handle: Callable[[Any], None], timer: _StageTimer,
+               on_error: Callable[[Any, Exception], None]):
+    """Worker loop of a stage: handle items until the end marker (a failing item is reported to on_error)"""
+    while True:
+        item = input_queue.get()
+        if item is _END:
+            return
+        start_time = time.time()
+        try:
+            handle(item)
+        except Exception as e:
+            # A failing item must not stop the worker (upstream stages would block on the full queue)
+            print(f"Web pipeline stage error: {str(e)}")
+            on_error(item, e)
+        finally:
+            timer.record(start_time, time.time())
+
+def _start_workers(count: int, input_queue: queue.Queue, handle: Callable[[Any], None],
+                   timer: _StageTimer, name: str, on_error: Callable[[Any, Exception], None]) -> List[threading.Thread]:
+    workers = [
+        threading.Thread(target=_run_stage, args=(input_queue, handle, timer, on_error), name=f"web-pipeline-{name}-{index}", daemon=True)
+        for index in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
+
+def _finish_stage(workers: List[threading.Thread], next_queue: queue.Queue = None, next_worker_count: int = 0):
+    """Wait for a stage's workers, then send one end marker per worker of the next stage"""
+    for worker in workers:
+        worker.join()
+    for _ in range(next_worker_count):
+        next_queue.put(_END)
+
+def run_web_pipeline(urls: List[str], parser) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    Extract, render and parse webpages as overlapping stages connected by bounded queues:
+    a page escalated by the HTML fast path is rendered while other pages are still being fetched,
+    and its PDF is parsed while later pages are still rendering.
+
+    Args:
+        urls: URLs of the webpages
+        parser: DocumentParser used for rendered pages
+
+    Returns:
+        Tuple of ({url: document result}, stage timings)
+    """
+    pipeline_start = time.time()
+    documents = {}
+    documents_lock = threading.Lock()
+    timers = {'extract': _StageTimer(), 'render': _StageTimer(), 'parse': _StageTimer()}
+
+    url_queue = queue.Queue()
+    render_queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE)
+    parse_queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE)
+
+    def set_document(url: str, document: Dict[str, Any]):
+        with documents_lock:
+            documents[url] = {'source_url': url, **document}
+
+    def fail(item: Any, error: Exception):
+        # Items are URLs (extract, render) or rendered PDF results (parse)
+        url = item['source_url'] if isinstance(item, dict) else item
+        set_document(url, {'success': False, 'error': f"Web pipeline error: {str(error)}"})
+
+    def extract(url: str):
+        try:
+            extract_result = extract_webpage(url)
+        except Exception as e:
+            extract_result = {'success': False, 'escalate': True, 'reason': f"extraction error: {str(e)}"}
+        if extract_result['success']:
+            set_document(url, {
+                'success': True,
+                'text': extract_result['text'],
+                'method': extract_result['metadata']['method'],
+                'cached': extract_result['metadata']['cached']
+            })
+        else:
+            print(f"HTML fast path skipped: {url} ({extract_result['reason']})")
+            render_queue.put(url)
+
+    def render(url: str):
+        if not parser.api_key:
+            # Rendering is pointless when the PDF cannot be parsed
+            set_document(url, {
+                'success': False,
+                'error': 'Upstage API key is not set. Please enter the API key in the API settings tab.'
+            })
+            return
+        pdf_result = get_webpage_as_pdf_binary(url)
+        if pdf_result['success']:
+            parse_queue.put(pdf_result)
+        else:
+            print(f"PDF conversion failed: {url}, error: {pdf_result.get('error', 'Unknown error')}")
+            set_document(url, {
+                'success': False,
+                'error': f"PDF conversion failed: {pdf_result.get('error', 'Unknown error')}"
+            })
+
+    def parse(pdf_result: Dict[str, Any]):
+        url = pdf_result['source_url']
+        try:
+            result = parser.parse_binary_item(pdf_result)
+        except Exception as e:
+            result = {'success': False, 'error': f"Document parsing error: {str(e)}"}
+        if result.get('success', False):
+            set_document(url, {
+                'success': True,
+                'text': result.get('text', ''),
+                'method': 'document_parse',
+                'cached': False
+            })
+            # Parsed text is reused until the page changes (no rendering or parsing on repeated searches)
+            update_entry(url, text=result.get('text', ''), method='document_parse')
+        else:
+            set_document(url, {
+                'success': False,
+                'error': result.get('error', 'Document parsing failed')
+            })
+
+    for url in urls:
+        url_queue.put(url)
+    extract_count = min(EXTRACT_WORKERS, len(urls))
+    for _ in range(extract_count):
+        url_queue.put(_END)
+
+    extract_workers = _start_workers(extract_count, url_queue, extract, timers['extract'], "extract", fail)
+    render_workers = _start_workers(RENDER_WORKERS, render_queue, render, timers['render'], "render", fail)
+    parse_workers = _start_workers(PARSE_WORKERS, parse_queue, parse, timers['parse'], "parse", fail)
+
+    _finish_stage(extract_workers, render_queue, RENDER_WORKERS)
+    _finish_stage(render_workers, parse_queue, PARSE_WORKERS)
+    _finish_stage(parse_workers)
+
+    stage_timings = {name: timer.summary(pipeline_start) for name, timer in timers.items()}
+    stage_timings['pipeline_seconds'] = round(time.time() - pipeline_start, 3)
+    return documents, stage_timings
@@ -0,0 +1,137 @@
+import asyncio
+import collections.abc
+import queue
+import threading
+import time
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# One long-lived event loop per process, shared by every chat and auto-think request
+_LOOP = None
+_LOOP_THREAD = None
+_LOOP_LOCK = threading.Lock()
+
+# Marker put on the chunk queue when a stream is finished
+_STREAM_END = object()
+
+class ScriptContextCoroutine(collections.abc.Coroutine):
+    """
+    Coroutine wrapper that attaches the Streamlit script context of the requesting session
+    to the loop thread while each step runs.
+    Tasks of different sessions interleave on the shared loop, so the context is
+    re-attached on every step (tools read API keys etc. from st.session_state).
+    """
+    def __init__(self, coro, ctx):
+        self._coro = coro
+        self._ctx = ctx
+
+    def _run_step(self, method, *args):
+        thread = threading.current_thread()
+        previous_ctx = get_script_run_ctx(suppress_warning=True)
+        add_script_run_ctx(thread, self._ctx)
+        try:
+            return method(*args)
+        finally:
+            add_script_run_ctx(thread, previous_ctx)
+
+    def send(self, value):
+        return self._run_step(self._coro.send, value)
+
+    def throw(self, *args):
+        return self._run_step(self._coro.throw, *args)
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+def _script_context_task_factory(loop, coro, **kwargs):
+    """Task factory that propagates the script context of the creating task to new tasks"""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is not None and not isinstance(coro, ScriptContextCoroutine):
+        coro = ScriptContextCoroutine(coro, ctx)
+    return asyncio.Task(coro, loop=loop, **kwargs)
+
+def _run_loop(loop):
+    """Loop thread body"""
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+def get_background_loop():
+    """
+    Returns the process-wide background event loop, starting its thread on first use.
+
+    Returns:
+        Running asyncio event loop
+    """
+    global _LOOP, _LOOP_THREAD
+
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP_THREAD is None or not _LOOP_THREAD.is_alive():
+            loop = asyncio.new_event_loop()
+            loop.set_task_factory(_script_context_task_factory)
+            thread = threading.Thread(target=_run_loop, args=(loop,), name="background-event-loop", daemon=True)
+            thread.start()
+            _LOOP = loop
+            _LOOP_THREAD = thread
+            print("Background event loop started")
+        return _LOOP
+
+def iter_background_stream(async_gen, timeout=60):
+    """
+    Runs an async generator on the background loop and yields its chunks in the calling thread.
+    Chunks are passed back through a thread-safe queue, so the Streamlit script can update
+    placeholders while the loop keeps serving other sessions.
+
+    Args:
+        async_gen: Async generator to consume (e.g. stream_openai_response(...))
+        timeout: Maximum seconds for the whole stream
+
+    Yields:
+        Chunks produced by the generator
+
+    Raises:
+        TimeoutError: If the stream does not finish within the timeout
+    """
+    chunk_queue = queue.Queue()
+
+    async def pump():
+        try:
+            async for chunk in async_gen:
+                chunk_queue.put(chunk)
+        except Exception as e:
+            chunk_queue.put(e)
+        finally:
+            chunk_queue.put(_STREAM_END)
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    coro = ScriptContextCoroutine(pump(), ctx) if ctx is not None else pump()
+    future = asyncio.run_coroutine_threadsafe(coro, get_background_loop())
+
+    deadline = time.time() + timeout
+    try:
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError(f"Stream did not finish within {timeout} seconds")
+
+            try:
+                item = chunk_queue.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError(f"Stream did not finish within {timeout} seconds")
+
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Stop the stream if the consumer stopped early (timeout, error or script rerun)
+        if not future.done():
+            future.cancel()
@@ -1,8 +1,14 @@
 import functools
+import inspect
+import sys
 import time
 import threading
 import streamlit as st
 
+# Registry of tracked st.cache_data functions (shared by all sessions, like st.cache_data itself)
+_CACHE_REGISTRY = {}
+_CACHE_REGISTRY_LOCK = threading.Lock()
+
 # Cache clearing functionality - used to initialize the entire app cache
 def clear_all_caches():
     """Clears all caches. Can be used to connect to a refresh button."""
@@ -118,4 +124,234 @@ def background_cache(ttl=300):
         wrapper.invalidate_cache = cached_func.invalidate_cache
         return wrapper
     
-    return decorator 
\ No newline at end of file
+    return decorator
+
+def _estimate_size(value) -> int:
+    """Cheap in-memory size estimate of a cached result (DataFrame/Series buffers, containers walked shallowly)"""
+    memory_usage = getattr(value, 'memory_usage', None)
+    if callable(memory_usage):
+        try:
+            usage = memory_usage(index=True)
+            return int(usage.sum() if hasattr(usage, 'sum') else usage)
+        except Exception:
+            pass
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+# Tracked st.cache_data decorator - used by the diagnostics page
+def tracked_cache_data(ttl=None, scope="market"):
+    """
+    st.cache_data decorator that records hit/miss statistics per cached entry.
+    
+    Args:
+        ttl: Lifetime of the cache item (seconds)
+        scope: Cache group used for targeted invalidation (e.g. 'market', 'portfolio', 'orders')
+        
+    Returns:
+        Cached function with the same call signature as st.cache_data
+    """
+    def decorator(func):
+        func_name = func.__name__
+        signature = inspect.signature(func)
+        stats = {
+            'name': func_name,
+            'scope': scope,
+            'ttl': ttl,
+            'calls': 0,
+            'misses': 0,
+            'errors': 0,
+            'last_latency': None,
+            'last_refresh': None,
+            'entries': {}
+        }
+        
+        def make_entry_key(args, kwargs):
+            # Same rule as st.cache_data: arguments starting with '_' are not part of the key
+            try:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                items = bound.arguments.items()
+            except TypeError:
+                items = list(enumerate(args)) + list(kwargs.items())
+            key_parts = [f"{name}={value!r}" for name, value in items if not str(name).startswith('_')]
+            return ", ".join(key_parts) or "(no arguments)"
+        
+        @functools.wraps(func)
+        def load(*args, **kwargs):
+            # Only runs when st.cache_data has no valid entry (cache miss)
+            key = make_entry_key(args, kwargs)
+            
+            start_time = time.time()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                with _CACHE_REGISTRY_LOCK:
+                    stats['errors'] += 1
+                raise
+            latency = time.time() - start_time
+            
+            # Estimated without serializing the result a second time (st.cache_data already pickles it)
+            try:
+                size_bytes = _estimate_size(result)
+            except Exception:
+                size_bytes = 0
+            
+            with _CACHE_REGISTRY_LOCK:
+                stats['misses'] += 1
+                stats['last_latency'] = latency
+                stats['last_refresh'] = time.time()
+                stats['entries'][key] = {
+                    'args': args,
+                    'kwargs': kwargs,
+                    'created_at': time.time(),
+                    'size_bytes': size_bytes,
+                    'latency': latency
+                }
+            return result
+        
+        cached_func = st.cache_data(ttl=ttl)(load)
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _CACHE_REGISTRY_LOCK:
+                stats['calls'] += 1
+            return cached_func(*args, **kwargs)
+        
+        def clear(*args, **kwargs):
+            """Clear every entry of this function, or only the entry for the given arguments."""
+            if args or kwargs:
+                cached_func.clear(*args, **kwargs)
+                with _CACHE_REGISTRY_LOCK:
+                    stats['entries'].pop(make_entry_key(args, kwargs), None)
+            else:
+                cached_func.clear()
+                with _CACHE_REGISTRY_LOCK:
+                    stats['entries'].clear()
+        
+        def cache_version(*args, **kwargs):
+            """Returns the fill time of the entry for the given arguments, or None if missing or expired."""
+            with _CACHE_REGISTRY_LOCK:
+                entry = stats['entries'].get(make_entry_key(args, kwargs))
+            if entry is None:
+                return None
+            if ttl is not None and time.time() - entry['created_at'] > ttl:
+                return None
+            return entry['created_at']
+        
+        wrapper.clear = clear
+        wrapper.cache_version = cache_version
+        wrapper.cache_stats = stats
+        
+        with _CACHE_REGISTRY_LOCK:
+            _CACHE_REGISTRY[func_name] = {'func': wrapper, 'stats': stats}
+        return wrapper
+    
+    return decorator
+
+def get_cache_stats():
+    """
+    Returns a snapshot of the statistics of every tracked cached function.
+    
+    Returns:
+        List of dictionaries (one per cached function) with per-entry details
+    """
+    now = time.time()
+    snapshot = []
+    with _CACHE_REGISTRY_LOCK:
+        for name, registered in sorted(_CACHE_REGISTRY.items()):
+            stats = registered['stats']
+            hits = max(stats['calls'] - stats['misses'] - stats['errors'], 0)
+            entries = []
+            for key, entry in stats['entries'].items():
+                age = now - entry['created_at']
+                entries.append({
+                    'key': key,
+                    'age': age,
+                    'size_bytes': entry['size_bytes'],
+                    'latency': entry['latency'],
+                    'expired': stats['ttl'] is not None and age > stats['ttl']
+                })
+            snapshot.append({
+                'name': name,
+                'scope': stats['scope'],
+                'ttl': stats['ttl'],
+                'calls': stats['calls'],
+                'hits': hits,
+                'misses': stats['misses'],
+                'errors': stats['errors'],
+                'hit_rate': (hits / stats['calls'] * 100) if stats['calls'] else 0,
+                'last_latency': stats['last_latency'],
+                'last_refresh_age': (now - stats['last_refresh']) if stats['last_refresh'] else None,
+                'total_size_bytes': sum(entry['size_bytes'] for entry in entries),
+                'entries': entries
+            })
+    return snapshot
+
+def invalidate_cache_entry(func_name, entry_key=None):
+    """
+    Invalidates one entry (or every entry) of a tracked cached function.
+    
+    Args:
+        func_name: Name of the cached function
+        entry_key: Entry key shown on the diagnostics page (None invalidates every entry)
+        
+    Returns:
+        Whether something was invalidated
+    """
+    with _CACHE_REGISTRY_LOCK:
+        registered = _CACHE_REGISTRY.get(func_name)
+        if not registered:
+            return False
+        entry = registered['stats']['entries'].get(entry_key) if entry_key is not None else None
+    
+    if entry_key is None:
+        registered['func'].clear()
+        return True
+    if entry is None:
+        return False
+    
+    registered['func'].clear(*entry['args'], **entry['kwargs'])
+    return True
+
+def invalidate_cache_scope(*scopes):
+    """
+    Invalidates every tracked cached function belonging to the given scopes.
+    Use this instead of st.cache_data.clear() so unrelated caches stay warm.
+    
+    Args:
+        scopes: Cache groups to invalidate (e.g. 'portfolio', 'orders')
+    """
+    with _CACHE_REGISTRY_LOCK:
+        targets = [registered['func'] for registered in _CACHE_REGISTRY.values()
+                   if registered['stats']['scope'] in scopes]
+    
+    for cached_func in targets:
+        cached_func.clear()
+
+def get_versioned_view(view_key, version, build_view):
+    """
+    Returns a derived view (filtered frame, aggregates, ...) stored in session state,
+    rebuilding it only when the underlying data version changes.
+    
+    Args:
+        view_key: Unique key of the view (include filter values in the key)
+        version: Version of the source data (e.g. cache_version() of a tracked function)
+        build_view: Function that builds the view
+        
+    Returns:
+        Derived view for the given version
+    """
+    if 'versioned_views' not in st.session_state:
+        st.session_state.versioned_views = {}
+    
+    views = st.session_state.versioned_views
+    cached_view = views.get(view_key)
+    if version is not None and cached_view is not None and cached_view['version'] == version:
+        return cached_view['view']
+    
+    view = build_view()
+    views[view_key] = {'version': version, 'view': view}
+    return view
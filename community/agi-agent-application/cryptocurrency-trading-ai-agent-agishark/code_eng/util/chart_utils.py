@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from typing import Tuple
+
+# Maximum number of candles sent to the browser per chart
+MAX_CHART_POINTS = 200
+
+# Maximum number of candles fetched from Upbit per chart (pyupbit pages by 200)
+MAX_FETCH_CANDLES = 500
+
+# Upbit candle intervals and their length in seconds (finest first)
+UPBIT_INTERVALS = [
+    ("minute1", 60),
+    ("minute3", 180),
+    ("minute5", 300),
+    ("minute10", 600),
+    ("minute15", 900),
+    ("minute30", 1800),
+    ("minute60", 3600),
+    ("minute240", 14400),
+    ("day", 86400),
+    ("week", 604800),
+    ("month", 2592000),
+]
+
+# Selectable chart ranges (zoom levels) in seconds
+CHART_RANGES = {
+    "1 Day": 86400,
+    "1 Week": 604800,
+    "1 Month": 2592000,
+    "6 Months": 15552000,
+    "1 Year": 31536000,
+    "3 Years": 94608000,
+}
+
+def select_interval(range_seconds: int, max_candles: int = MAX_FETCH_CANDLES) -> Tuple[str, int]:
+    """
+    Selects the finest Upbit interval that covers the range within the candle limit.
+
+    Args:
+        range_seconds: Length of the displayed range in seconds
+        max_candles: Maximum number of candles to fetch
+
+    Returns:
+        Tuple of (Upbit interval, number of candles to fetch)
+    """
+    for interval, interval_seconds in UPBIT_INTERVALS:
+        count = -(-range_seconds // interval_seconds)
+        if count <= max_candles:
+            return interval, max(count, 1)
+
+    # Range too long even for monthly candles
+    return UPBIT_INTERVALS[-1][0], max_candles
+
+def downsample_ohlcv(df: pd.DataFrame, max_points: int = MAX_CHART_POINTS) -> Tuple[pd.DataFrame, int]:
+    """
+    Aggregates consecutive candles into buckets so that at most max_points candles remain.
+    Each bucket keeps the first open, highest high, lowest low, last close and summed volume,
+    so price extremes are preserved.
+
+    Args:
+        df: OHLCV DataFrame indexed by time (sorted ascending)
+        max_points: Maximum number of candles to keep
+
+    Returns:
+        Tuple of (downsampled DataFrame, number of source candles per bucket)
+    """
+    if df is None or len(df) <= max_points or max_points <= 0:
+        return df, 1
+
+    bucket_size = -(-len(df) // max_points)
+    starts = np.arange(0, len(df), bucket_size)
+    ends = np.append(starts[1:], len(df)) - 1
+
+    aggregated = {
+        'open': df['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(df['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(df['low'].to_numpy(), starts),
+        'close': df['close'].to_numpy()[ends],
+    }
+    if 'volume' in df.columns:
+        aggregated['volume'] = np.add.reduceat(df['volume'].to_numpy(), starts)
+
+    # Bucket is labeled with the time of its first candle
+    return pd.DataFrame(aggregated, index=df.index[starts]), bucket_size
@@ -0,0 +1,252 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Upstream services guarded by a breaker
+UPSTREAMS = {
+    "upbit_quotation": "Upbit Quotation API",
+    "upbit_exchange": "Upbit Exchange API",
+    "openai": "OpenAI API",
+    "upstage": "Upstage API",
+    "x": "X (Twitter) API",
+}
+
+# Breaker settings
+FAILURE_THRESHOLD = 5         # Consecutive failures that open the breaker
+RECOVERY_TIMEOUT = 30         # Seconds before the first half-open probe
+MAX_RECOVERY_TIMEOUT = 300    # Upper bound when probes keep failing
+PROBE_TIMEOUT = 120           # Seconds after which an unfinished probe no longer blocks a new one
+
+# Retry settings
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+# Error classes that are worth retrying and that count as upstream failures
+RETRYABLE_ERRORS = {"rate_limit", "timeout", "network", "server"}
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the upstream breaker is open"""
+    def __init__(self, upstream: str, retry_after: float):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        super().__init__(f"{UPSTREAMS.get(upstream, upstream)} is temporarily unavailable (retry in {retry_after:.0f} seconds)")
+
+class CircuitBreaker:
+    """Per-upstream circuit breaker (closed -> open -> half-open -> closed)"""
+    def __init__(self, name: str):
+        self.name = name
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.total_successes = 0
+        self.rejected_calls = 0
+        self.recovery_timeout = RECOVERY_TIMEOUT
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.probe_started_at = None
+        self.last_error = None
+        self.last_error_class = None
+        self.last_failure_time = None
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Check whether a call may go to the upstream (one probe is let through when half-open)"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+
+            if self.state == "open" and time.time() - self.opened_at >= self.recovery_timeout:
+                self.state = "half_open"
+                self.probe_in_flight = False
+
+            # A probe that never reported back (cancelled or hung caller) expires
+            if self.state == "half_open" and self.probe_in_flight and time.time() - self.probe_started_at >= PROBE_TIMEOUT:
+                print(f"Circuit breaker probe expired: {self.name}")
+                self.probe_in_flight = False
+
+            if self.state == "half_open" and not self.probe_in_flight:
+                self.probe_in_flight = True
+                self.probe_started_at = time.time()
+                return True
+
+            self.rejected_calls += 1
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe is allowed"""
+        with self._lock:
+            if self.state != "open" or self.opened_at is None:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.time() - self.opened_at))
+
+    def release_probe(self):
+        """Free the half-open probe slot of a call that ended without an outcome (e.g. cancelled)"""
+        with self._lock:
+            if self.state == "half_open":
+                self.probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.total_successes += 1
+            self.consecutive_failures = 0
+            if self.state != "closed":
+                print(f"Circuit breaker closed: {self.name}")
+            self.state = "closed"
+            self.recovery_timeout = RECOVERY_TIMEOUT
+            self.probe_in_flight = False
+
+    def record_failure(self, error_class: str, error_message: str = None):
+        """Record a failure (only upstream failure classes count toward opening the breaker)"""
+        with self._lock:
+            self.last_error = error_message
+            self.last_error_class = error_class
+            self.last_failure_time = time.time()
+
+            if error_class not in RETRYABLE_ERRORS:
+                # Auth/client errors say nothing about upstream health
+                self.probe_in_flight = False
+                return
+
+            self.total_failures += 1
+            self.consecutive_failures += 1
+
+            if self.state == "half_open":
+                # Failed probe: open again and wait longer
+                self.recovery_timeout = min(self.recovery_timeout * 2, MAX_RECOVERY_TIMEOUT)
+                self._open()
+            elif self.state == "closed" and self.consecutive_failures >= FAILURE_THRESHOLD:
+                self._open()
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.time()
+        self.probe_in_flight = False
+        print(f"Circuit breaker opened: {self.name} (retry in {self.recovery_timeout} seconds)")
+
+    def reset(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.recovery_timeout = RECOVERY_TIMEOUT
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'name': self.name,
+                'label': UPSTREAMS.get(self.name, self.name),
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'total_failures': self.total_failures,
+                'total_successes': self.total_successes,
+                'rejected_calls': self.rejected_calls,
+                'recovery_timeout': self.recovery_timeout,
+                'retry_after': max(0.0, self.recovery_timeout - (time.time() - self.opened_at)) if self.state == "open" else 0.0,
+                'last_error': self.last_error,
+                'last_error_class': self.last_error_class,
+                'last_failure_age': time.time() - self.last_failure_time if self.last_failure_time else None
+            }
+
+# Breaker registry (one per upstream, shared by every session)
+_BREAKERS = {name: CircuitBreaker(name) for name in UPSTREAMS}
+_BREAKERS_LOCK = threading.Lock()
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    """
+    Returns the breaker of an upstream.
+
+    Args:
+        upstream: Upstream name (see UPSTREAMS)
+
+    Returns:
+        CircuitBreaker instance
+    """
+    with _BREAKERS_LOCK:
+        if upstream not in _BREAKERS:
+            _BREAKERS[upstream] = CircuitBreaker(upstream)
+        return _BREAKERS[upstream]
+
+def get_breaker_states() -> List[Dict]:
+    """Returns a snapshot of every breaker"""
+    with _BREAKERS_LOCK:
+        breakers = list(_BREAKERS.values())
+    return [breaker.snapshot() for breaker in breakers]
+
+def reset_breaker(upstream: str = None):
+    """Reset one breaker or all breakers"""
+    with _BREAKERS_LOCK:
+        breakers = list(_BREAKERS.values()) if upstream is None else [_BREAKERS[upstream]] if upstream in _BREAKERS else []
+    for breaker in breakers:
+        breaker.reset()
+
+def _get_status_code(error) -> Optional[int]:
+    """Extract an HTTP status code from common exception types"""
+    for attr in ("status_code", "status", "http_status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+def classify_error(error) -> str:
+    """
+    Classifies an error (exception or error message) for retry and breaker decisions.
+
+    Args:
+        error: Exception or error message
+
+    Returns:
+        One of 'auth', 'rate_limit', 'timeout', 'network', 'server', 'client', 'unknown'
+    """
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return "timeout"
+
+    status_code = None if isinstance(error, str) else _get_status_code(error)
+    if status_code is not None:
+        if status_code in (401, 403):
+            return "auth"
+        if status_code == 429:
+            return "rate_limit"
+        if status_code in (408, 504):
+            return "timeout"
+        if status_code >= 500:
+            return "server"
+        if status_code >= 400:
+            return "client"
+
+    error_name = "" if isinstance(error, str) else type(error).__name__.lower()
+    message = f"{error_name} {error}".lower()
+
+    if any(word in message for word in ("timeout", "timed out")):
+        return "timeout"
+    if any(word in message for word in ("429", "too many requests", "rate limit", "ratelimit")):
+        return "rate_limit"
+    if any(word in message for word in ("401", "403", "unauthorized", "forbidden", "invalid_access_key", "jwt", "api key", "authentication")):
+        return "auth"
+    if any(word in message for word in ("connection", "network", "name resolution", "max retries", "ssl", "remotedisconnected")):
+        return "network"
+    if any(word in message for word in ("500", "502", "503", "internal server error", "bad gateway", "service unavailable")):
+        return "server"
+    if any(word in message for word in ("400", "404", "422", "invalid", "not found")):
+        return "client"
+    return "unknown"
+
+def backoff_delay(attempt: int, error_class: str = None) -> float:
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        attempt: Retry attempt (0 for the first retry)
+        error_class: Error class (rate limits wait longer)
+
+    Returns:
+        Delay in seconds
+    """
+    base = BACKOFF_BASE * 2 if error_class == "rate_limit" else BACKOFF_BASE
+    return random.uniform(0, min(BACKOFF_CAP, base * (2 ** attempt)))
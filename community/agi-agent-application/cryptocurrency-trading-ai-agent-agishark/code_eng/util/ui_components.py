@@ -40,17 +40,17 @@ def loading_spinner(loading_text="Loading data..."):
     """
     return st.spinner(loading_text)
 
-def create_pagination(items, items_per_page=10, key_prefix="pagination"):
+def get_page_window(total_items, items_per_page=10, key_prefix="pagination"):
     """
-    Provides pagination functionality for a list of items.
+    Calculates the visible window of the current page without touching the items themselves.
     
     Args:
-        items: List of items to paginate
+        total_items: Total number of items
         items_per_page: Number of items to display per page
         key_prefix: Unique key prefix for pagination components
         
     Returns:
-        List of items to display on the current page
+        Tuple of (start index, end index, total number of pages)
     """
     # Initialize pagination state
     page_key = f"{key_prefix}_page"
@@ -58,7 +58,6 @@ def create_pagination(items, items_per_page=10, key_prefix="pagination"):
         st.session_state[page_key] = 0
         
     # Calculate total number of pages
-    total_items = len(items)
     total_pages = (total_items + items_per_page - 1) // items_per_page
     
     if total_pages <= 0:
@@ -68,33 +67,98 @@ def create_pagination(items, items_per_page=10, key_prefix="pagination"):
     if st.session_state[page_key] >= total_pages:
         st.session_state[page_key] = total_pages - 1
     
-    # Calculate items for the current page
+    # Calculate window for the current page
     start_idx = st.session_state[page_key] * items_per_page
     end_idx = min(start_idx + items_per_page, total_items)
+    
+    return start_idx, end_idx, total_pages
+
+def render_pagination_controls(total_pages, key_prefix="pagination", caption=None):
+    """
+    Renders previous/next controls for a paginated view.
+    
+    Args:
+        total_pages: Total number of pages
+        key_prefix: Unique key prefix for pagination components
+        caption: Additional text displayed next to the page number
+    """
+    if total_pages <= 1:
+        return
+    
+    page_key = f"{key_prefix}_page"
+    cols = st.columns([1, 3, 1])
+    
+    with cols[0]:
+        if st.button("◀️ Previous", key=f"{key_prefix}_prev", 
+                   disabled=st.session_state[page_key] <= 0):
+            st.session_state[page_key] -= 1
+            st.rerun()
+            
+    with cols[1]:
+        page_text = f"{st.session_state[page_key] + 1} / {total_pages}"
+        if caption:
+            page_text += f" ({caption})"
+        st.markdown(f"<div style='text-align:center; margin-top:8px;'>{page_text}</div>", 
+                  unsafe_allow_html=True)
+        
+    with cols[2]:
+        if st.button("Next ▶️", key=f"{key_prefix}_next", 
+                   disabled=st.session_state[page_key] >= total_pages - 1):
+            st.session_state[page_key] += 1
+            st.rerun()
+
+def create_pagination(items, items_per_page=10, key_prefix="pagination"):
+    """
+    Provides pagination functionality for a list of items.
+    
+    Args:
+        items: List of items to paginate
+        items_per_page: Number of items to display per page
+        key_prefix: Unique key prefix for pagination components
+        
+    Returns:
+        List of items to display on the current page
+    """
+    start_idx, end_idx, total_pages = get_page_window(len(items), items_per_page, key_prefix)
     current_items = items[start_idx:end_idx]
     
     # Render pagination controls
-    if total_pages > 1:
-        cols = st.columns([1, 3, 1])
-        
-        with cols[0]:
-            if st.button("◀️ Previous", key=f"{key_prefix}_prev", 
-                       disabled=st.session_state[page_key] <= 0):
-                st.session_state[page_key] -= 1
-                st.rerun()
-                
-        with cols[1]:
-            st.markdown(f"<div style='text-align:center; margin-top:8px;'>{st.session_state[page_key] + 1} / {total_pages}</div>", 
-                      unsafe_allow_html=True)
-            
-        with cols[2]:
-            if st.button("Next ▶️", key=f"{key_prefix}_next", 
-                       disabled=st.session_state[page_key] >= total_pages - 1):
-                st.session_state[page_key] += 1
-                st.rerun()
+    render_pagination_controls(total_pages, key_prefix)
     
     return current_items
 
+def windowed_dataframe(df, items_per_page=10, key_prefix="pagination", format_page=None, 
+                       style_page=None, height=400, caption=None):
+    """
+    Displays only the visible page of a DataFrame.
+    Formatting and styling are applied to the visible slice only, so the cost of a page
+    change does not depend on the total number of rows.
+    
+    Args:
+        df: Source DataFrame (already filtered and sorted)
+        items_per_page: Number of rows to display per page
+        key_prefix: Unique key prefix for pagination components
+        format_page: Function that formats the visible slice (receives a copy)
+        style_page: Function that returns a Styler for the formatted slice
+        height: Table height
+        caption: Additional text displayed next to the page number
+        
+    Returns:
+        Visible slice of the DataFrame (before formatting)
+    """
+    start_idx, end_idx, total_pages = get_page_window(len(df), items_per_page, key_prefix)
+    page_df = df.iloc[start_idx:end_idx]
+    
+    display_df = format_page(page_df.copy()) if format_page else page_df
+    st.dataframe(
+        style_page(display_df) if style_page else display_df,
+        use_container_width=True,
+        height=height
+    )
+    
+    render_pagination_controls(total_pages, key_prefix, caption)
+    return page_df
+
 def status_indicator(status, custom_css=None):
     """
     Creates a status indicator icon.
@@ -5,6 +5,7 @@ import base64
 import json
 from dotenv import load_dotenv
 from flask_cors import CORS
+from parse_cache import get_or_parse
 
 # 환경변수 로드
 load_dotenv()
@@ -38,47 +39,59 @@ def upload_pdf():
     save_path = os.path.join(INPUT_DIR, file.filename)
     file.save(save_path)
 
-    with open(save_path, 'rb') as f:
-        files = {'document': (file.filename, f, 'application/pdf')}
-        data = {
-            'ocr': 'force',
-            'model': 'document-parse',
-            'key_extraction': 'true'
-        }
-        headers = {'Authorization': f'Bearer {API_KEY}'}
-        response = requests.post(DIGITIZE_URL, headers=headers, files=files, data=data)
-        response2 = requests.post(EXTRACT_URL, headers=headers, files=files, data=data)
+    data = {
+        'ocr': 'force',
+        'model': 'document-parse',
+        'key_extraction': 'true'
+    }
 
-    if response.status_code == 200:
-        result = response.json()
-        result2 = response2.json()
-        html_output = result.get("content", {}).get("html", "")
-        html_filename = os.path.splitext(file.filename)[0] + '.html'
-        html_path = os.path.join(OUTPUT_HTML_DIR, html_filename)
+    # 같은 PDF + 같은 옵션이면 캐시된 응답 사용 (요청마다 파일을 새로 열어 전송)
+    def request_api(url):
+        with open(save_path, 'rb') as f:
+            files = {'document': (file.filename, f, 'application/pdf')}
+            headers = {'Authorization': f'Bearer {API_KEY}'}
+            response = requests.post(url, headers=headers, files=files, data=data)
+        if response.status_code != 200:
+            raise RuntimeError(response.text)
+        return response.json()
 
-        key_values = result2.get("key_value", [])
-        json_filename = os.path.splitext(file.filename)[0] + '.json'
-        json_path = os.path.join(OUTPUT_JSON_DIR, json_filename)
-
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write(html_output)
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(key_values, f, ensure_ascii=False, indent=2)
-
-        return jsonify({
-            "filename": file.filename,
-            "html_file": html_filename,
-            "json_file": json_filename,
-            "key_value": key_values,
-            "status": "success"
-        })
-    else:
+    try:
+        result = get_or_parse(save_path, {'url': DIGITIZE_URL, **data}, lambda: request_api(DIGITIZE_URL))
+    except Exception as e:
         return jsonify({
             "filename": file.filename,
-            "error": response.text,
+            "error": str(e),
             "status": "failed"
         })
 
+    # 정보 추출 실패 시 빈 key_value로 진행
+    try:
+        result2 = get_or_parse(save_path, {'url': EXTRACT_URL, **data}, lambda: request_api(EXTRACT_URL))
+    except Exception as e:
+        print(f"정보 추출 오류: {e}")
+        result2 = {}
+
+    html_output = result.get("content", {}).get("html", "")
+    html_filename = os.path.splitext(file.filename)[0] + '.html'
+    html_path = os.path.join(OUTPUT_HTML_DIR, html_filename)
+
+    key_values = result2.get("key_value", [])
+    json_filename = os.path.splitext(file.filename)[0] + '.json'
+    json_path = os.path.join(OUTPUT_JSON_DIR, json_filename)
+
+    with open(html_path, 'w', encoding='utf-8') as f:
+        f.write(html_output)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(key_values, f, ensure_ascii=False, indent=2)
+
+    return jsonify({
+        "filename": file.filename,
+        "html_file": html_filename,
+        "json_file": json_filename,
+        "key_value": key_values,
+        "status": "success"
+    })
+
 # 서버 실행
 if __name__ == '__main__':
     app.run(debug=True, port=8000, host='0.0.0.0')
@@ -11,6 +11,7 @@ from openai import OpenAI
 import base64
 import json
 from bs4 import BeautifulSoup
+from parse_cache import get_or_parse
 
 app = Flask(__name__)
 
@@ -512,51 +513,59 @@ def extract_text_and_id_maps(elements):
         }
     return text_to_id, id_to_coord
 
-def process_pdf(file_path):
-    print("process_pdf Call")
-    filename = os.path.basename(file_path)
+def request_document_parse(file_path, filename, data):
+    """Document Parse API 호출 (실패 시 예외 발생)"""
     with open(file_path, 'rb') as f:
         files = {
             'document': (filename, f, 'application/pdf')
         }
-        data = {
-            'ocr': 'force',
-            'base64_encoding': "['table']",
-            'model': 'document-parse'
-        }
         headers = {'Authorization': f'Bearer {API_KEY}'}
-
         response = requests.post(API_URL, headers=headers, files=files, data=data)
 
-        if response.status_code == 200:
-            result = response.json()
+    if response.status_code != 200:
+        raise RuntimeError(response.text)
+    return response.json()
+
+def process_pdf(file_path):
+    print("process_pdf Call")
+    filename = os.path.basename(file_path)
+    data = {
+        'ocr': 'force',
+        'base64_encoding': "['table']",
+        'model': 'document-parse'
+    }
+
+    # 같은 PDF + 같은 옵션이면 캐시된 파싱 결과 사용
+    try:
+        result = get_or_parse(file_path, {'url': API_URL, **data},
+                              lambda: request_document_parse(file_path, filename, data))
+    except Exception as e:
+        return {
+            "filename": filename,
+            "error": str(e),
+            "status": "failed"
+        }
 
-            # 결과에서 필요한 매핑 정보 추출
-            text_to_id, id_to_coord = extract_text_and_id_maps(result.get("elements", []))
+    # 결과에서 필요한 매핑 정보 추출
+    text_to_id, id_to_coord = extract_text_and_id_maps(result.get("elements", []))
 
-            # JSON 파일로 저장
-            with open(os.path.join(HIGHLIGHT_DIR, "text_to_id.json"), 'w', encoding='utf-8') as f:
-                json.dump(text_to_id, f, ensure_ascii=False, indent=2)
+    # JSON 파일로 저장
+    with open(os.path.join(HIGHLIGHT_DIR, "text_to_id.json"), 'w', encoding='utf-8') as f:
+        json.dump(text_to_id, f, ensure_ascii=False, indent=2)
 
-            with open(os.path.join(HIGHLIGHT_DIR, "id_to_coord.json"), 'w', encoding='utf-8') as f:
-                json.dump(id_to_coord, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(HIGHLIGHT_DIR, "id_to_coord.json"), 'w', encoding='utf-8') as f:
+        json.dump(id_to_coord, f, ensure_ascii=False, indent=2)
 
-            # 업로드된 PDF를 static 폴더로 복사
-            target_pdf_path = os.path.join(STATIC_PDF_DIR, filename)
-            if not os.path.exists(target_pdf_path):
-                with open(file_path, 'rb') as src, open(target_pdf_path, 'wb') as dst:
-                    dst.write(src.read())
+    # 업로드된 PDF를 static 폴더로 복사
+    target_pdf_path = os.path.join(STATIC_PDF_DIR, filename)
+    if not os.path.exists(target_pdf_path):
+        with open(file_path, 'rb') as src, open(target_pdf_path, 'wb') as dst:
+            dst.write(src.read())
 
-            return {
-                "filename": filename,
-                "status": "success"
-            }
-        else:
-            return {
-                "filename": filename,
-                "error": response.text,
-                "status": "failed"
-            }
+    return {
+        "filename": filename,
+        "status": "success"
+    }
 
 
 
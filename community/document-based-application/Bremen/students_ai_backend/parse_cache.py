@@ -0,0 +1,112 @@
+# 이 모듈은 students_ai_app/parse_cache.py 와 동일한 복사본입니다.
+# students_ai_backend 와 students_ai_app 는 각각 따로 배포되므로 공유 모듈 대신 복사본을 둡니다.
+# 수정할 때는 두 파일을 함께 바꿔 주세요.
+import os
+import gzip
+import json
+import hashlib
+import threading
+
+# 파싱 결과 캐시 디렉토리 (키마다 gzip 압축 JSON 파일 하나)
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", "parse_cache")
+
+# 캐시 최대 용량 (초과 시 가장 오래 사용하지 않은 항목부터 삭제)
+MAX_PARSE_CACHE_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", 500 * 1024 * 1024))
+
+_cache_lock = threading.Lock()
+
+
+def compute_document_hash(document):
+    """문서 바이트의 SHA-256 (bytes, 파일 경로, 바이너리 파일 객체 지원)"""
+    digest = hashlib.sha256()
+    if isinstance(document, (bytes, bytearray)):
+        digest.update(document)
+    elif isinstance(document, str):
+        with open(document, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    else:
+        document.seek(0)
+        for block in iter(lambda: document.read(1024 * 1024), b""):
+            digest.update(block)
+        document.seek(0)
+    return digest.hexdigest()
+
+
+def compute_cache_key(document, options):
+    """문서 내용 + 요청 옵션(ocr, output_formats, coordinates, model, URL)으로 캐시 키 생성"""
+    options_json = json.dumps(options, sort_keys=True, default=str)
+    return hashlib.sha256(f"{compute_document_hash(document)}:{options_json}".encode("utf-8")).hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(PARSE_CACHE_DIR, key[:2], f"{key}.json.gz")
+
+
+def _list_entries():
+    """캐시 항목 목록: (경로, 크기, 마지막 사용 시각)"""
+    entries = []
+    if not os.path.isdir(PARSE_CACHE_DIR):
+        return entries
+    for directory, _, file_names in os.walk(PARSE_CACHE_DIR):
+        for file_name in file_names:
+            if file_name.endswith(".json.gz"):
+                path = os.path.join(directory, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+    return entries
+
+
+def _evict(required_bytes):
+    """용량이 넘치면 오래된 항목부터 삭제"""
+    entries = _list_entries()
+    total_size = sum(size for _, size, _ in entries)
+    for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+        if total_size + required_bytes <= MAX_PARSE_CACHE_BYTES:
+            break
+        try:
+            os.remove(path)
+            total_size -= size
+        except OSError:
+            pass
+
+
+def get_or_parse(document, options, parse):
+    """
+    같은 파일 + 같은 옵션이면 저장된 응답을 바로 반환하고, 없으면 parse()로 API를 호출한 뒤 저장합니다.
+    parse는 응답 JSON을 반환하고 실패 시 예외를 발생시켜야 합니다 (실패한 응답은 저장하지 않음).
+    """
+    key = compute_cache_key(document, options)
+    path = _entry_path(key)
+
+    # 캐시 조회
+    try:
+        with open(path, "rb") as f:
+            result = json.loads(gzip.decompress(f.read()).decode("utf-8"))
+        os.utime(path)
+        print(f"파싱 캐시 적중: {key[:12]}")
+        return result
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"파싱 캐시 읽기 오류: {e}")
+
+    result = parse()
+
+    # 압축 저장 (임시 파일에 쓴 뒤 교체)
+    try:
+        data = gzip.compress(json.dumps(result, ensure_ascii=False).encode("utf-8"))
+        with _cache_lock:
+            _evict(len(data))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+    except Exception as e:
+        print(f"파싱 캐시 저장 오류: {e}")
+
+    return result